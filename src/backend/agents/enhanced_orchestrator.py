@@ -1,16 +1,32 @@
 from agents.food_agent import FoodAgent
 from agents.exercise_agent import ExerciseAgent
 from agents.lifestyle_agent import LifestyleAgent
-from schemas.summary import DailySummary
+from schemas.summary import DailySummary, PersonalizedSummary
+from services.scoring_engine import scoring_engine
 from schemas.user import User, UserGoal
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from services.llm_gateway import llm_gateway, response_format
+from services.token_budget import token_budget
+import asyncio
+import hashlib
+import json
+import logging
 import os
 from dotenv import load_dotenv
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Bump whenever an agent or orchestrator prompt (or its output shape) changes;
+# stored summaries stamped with another version are recomputed on read
+PROMPT_VERSION = "2"
+
+# The overall score is computed locally; the model writes the narrative fields
+REPLY_FORMAT = response_format(PersonalizedSummary, "summary", "recommendations", "goal_progress", "motivation")
+
 class EnhancedOrchestrator:
     def __init__(self):
         self.food_agent = FoodAgent()
@@ -19,82 +35,138 @@ class EnhancedOrchestrator:
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.4,
+            max_tokens=token_budget.output_cap("enhanced_orchestrator"),
             api_key=os.getenv("OPENAI_API_KEY")
         )
     
-    def generate_personalized_summary(self, user: User, user_data: Dict[str, Any]) -> Dict[str, Any]:
+    def analysis_stamp(self, user: User, user_data: Dict[str, Any]) -> Dict[str, str]:
+        """Version stamp stored with a summary: prompt version, models and a hash of everything it was built from"""
+        inputs = {
+            "meals": user_data.get("meals", []),
+            "exercises": user_data.get("exercises", []),
+            "lifestyle": user_data.get("lifestyle", {}),
+            "profile": user.profile.model_dump(mode='json'),
+            "goal": user.goal.model_dump(mode='json'),
+        }
+        models = sorted({agent.llm.model_name for agent in (self.food_agent, self.exercise_agent, self.lifestyle_agent, self)})
+        return {
+            "prompt_version": PROMPT_VERSION,
+            "model": ",".join(models),
+            "input_hash": hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest(),
+        }
+    
+    def is_current(self, analysis: Optional[Dict[str, Any]], stamp: Dict[str, str]) -> bool:
+        """Whether a stored analysis was built by the current prompts and models from the same inputs"""
+        return bool(analysis) and all(analysis.get(key) == value for key, value in stamp.items())
+    
+    def generate_personalized_summary(self, user: User, user_data: Dict[str, Any],
+                                      history: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
         """
-        Generate personalized daily summary considering user's goals and progress
+        Generate personalized daily summary considering user's goals and progress.
+        history holds the precomputed "7d" and "30d" rolling windows from the rollup store.
         """
         # Get agent outputs
         food_output = self.food_agent.analyze_meals(user_data.get("meals", []))
-        exercise_output = self.exercise_agent.analyze_exercises(user_data.get("exercises", []))
+        exercise_output = self.exercise_agent.analyze_exercises(user_data.get("exercises", []), user.profile.weight)
         lifestyle_output = self.lifestyle_agent.analyze_lifestyle(user_data.get("lifestyle", {}))
         
-        # Generate goal-aligned summary and recommendations
-        goal_alignment = self._analyze_goal_alignment(user, food_output, exercise_output, lifestyle_output)
+        goal_alignment, overall_score, prompt = self._summary_prompt(user, history, food_output, exercise_output, lifestyle_output)
         
         # Use AI to generate personalized summary
         try:
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", """You are a personalized health coach AI. Based on the user's profile, goals, and today's data, generate a comprehensive daily summary with:
-                - overall_health_score: overall score from 0-10 (float)
-                - summary: personalized daily summary (string)
-                - recommendations: list of 3 personalized recommendations (list of strings)
-                - goal_progress: how well they're doing toward their goal (string)
-                - motivation: personalized motivational message (string)
-                
-                Consider the user's specific goals, current progress, and today's performance.
-                
-                Return ONLY valid JSON in this format:
-                {{"overall_health_score": number, "summary": "string", "recommendations": ["string1", "string2", "string3"], "goal_progress": "string", "motivation": "string"}}"""),
-                ("human", f"""Generate personalized summary for {user.profile.name}:
-                
-                User Profile:
-                - Age: {user.profile.age}, Gender: {user.profile.gender}
-                - Weight: {user.profile.weight}kg, Height: {user.profile.height}cm
-                - Activity Level: {user.profile.activity_level}
-                
-                User Goal: {user.goal.goal_description}
-                Goal Type: {user.goal.goal_type}
-                Target Weight: {user.goal.target_weight}kg
-                Target Calories: {user.goal.target_calories_per_day}/day
-                Target Exercise: {user.goal.target_exercise_minutes_per_week}min/week
-                
-                Today's Data:
-                - Nutrition: {food_output.nutrition_score}/10, {food_output.calories} calories
-                - Exercise: {exercise_output.calories_burned} calories burned
-                - Lifestyle: {lifestyle_output.wellness_score}/10 wellness score
-                
-                Goal Alignment: {goal_alignment}""")
-            ])
+            result = llm_gateway.invoke_json("enhanced_orchestrator", prompt, self.llm, REPLY_FORMAT)
+        except Exception as e:
+            logger.warning("Enhanced orchestrator LLM call failed, using fallback: %s", e)
+            result = None
+        
+        return self._summary(user, food_output, exercise_output, lifestyle_output, goal_alignment, overall_score, result)
+    
+    async def generate_personalized_summary_async(self, user: User, user_data: Dict[str, Any],
+                                                  history: Optional[Dict[str, Dict[str, Any]]] = None,
+                                                  hedge: bool = True) -> Dict[str, Any]:
+        """
+        Async generate_personalized_summary: the three agents run concurrently and
+        every LLM call may be hedged
+        """
+        food_output, exercise_output, lifestyle_output = await asyncio.gather(
+            self.food_agent.analyze_meals_async(user_data.get("meals", []), hedge=hedge),
+            self.exercise_agent.analyze_exercises_async(user_data.get("exercises", []), user.profile.weight, hedge=hedge),
+            self.lifestyle_agent.analyze_lifestyle_async(user_data.get("lifestyle", {}), hedge=hedge)
+        )
+        
+        goal_alignment, overall_score, prompt = self._summary_prompt(user, history, food_output, exercise_output, lifestyle_output)
+        
+        try:
+            result = await llm_gateway.ainvoke_json("enhanced_orchestrator", prompt, self.llm, hedge=hedge, schema=REPLY_FORMAT)
+        except Exception as e:
+            logger.warning("Enhanced orchestrator LLM call failed, using fallback: %s", e)
+            result = None
+        
+        return self._summary(user, food_output, exercise_output, lifestyle_output, goal_alignment, overall_score, result)
+    
+    def _summary_prompt(self, user: User, history, food_output, exercise_output, lifestyle_output):
+        """Goal alignment, overall score and the orchestrator prompt built from the agent outputs"""
+        # Generate goal-aligned summary and recommendations
+        goal_alignment = self._analyze_goal_alignment(user, food_output, exercise_output, lifestyle_output, history)
+        
+        # The overall score is computed locally; the AI only writes the narrative
+        overall_score = scoring_engine.overall_health_score(
+            food_output.nutrition_score,
+            exercise_output.calories_burned,
+            lifestyle_output.wellness_score
+        )
+        
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", """You are a personalized health coach AI. Based on the user's profile, goals, and today's data, generate a comprehensive daily summary with:
+            - summary: personalized daily summary (string)
+            - recommendations: list of 3 personalized recommendations (list of strings)
+            - goal_progress: how well they're doing toward their goal (string)
+            - motivation: personalized motivational message (string)
+            
+            Consider the user's specific goals, current progress, and today's performance.
+            
+            Return ONLY valid JSON in this format:
+            {{"summary": "string", "recommendations": ["string1", "string2", "string3"], "goal_progress": "string", "motivation": "string"}}"""),
+            ("human", f"""Generate personalized summary for {user.profile.name}:
+            
+            User Profile:
+            - Age: {user.profile.age}, Gender: {user.profile.gender}
+            - Weight: {user.profile.weight}kg, Height: {user.profile.height}cm
+            - Activity Level: {user.profile.activity_level}
+            
+            User Goal: {token_budget.truncate(user.goal.goal_description)}
+            Goal Type: {user.goal.goal_type}
+            Target Weight: {user.goal.target_weight}kg
+            Target Calories: {user.goal.target_calories_per_day}/day
+            Target Exercise: {user.goal.target_exercise_minutes_per_week}min/week
             
-            chain = prompt | self.llm
-            response = chain.invoke({})
+            Today's Data:
+            - Nutrition: {food_output.nutrition_score}/10, {food_output.calories} calories
+            - Exercise: {exercise_output.calories_burned} calories burned
+            - Lifestyle: {lifestyle_output.wellness_score}/10 wellness score
+            - Overall: {overall_score}/10 health score
             
-            # Parse AI response
-            import json
-            result = json.loads(response.content)
+            Recent Trends:
+            {self._format_history(history)}
             
+            Goal Alignment: {goal_alignment}""")
+        ])
+        return goal_alignment, overall_score, prompt
+    
+    def _summary(self, user: User, food_output, exercise_output, lifestyle_output, goal_alignment: str,
+                 overall_score: float, result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Response payload; result is the orchestrator's JSON, or None to use the fallback text"""
+        if result is not None:
             orchestrator_summary = {
-                "overall_health_score": result.get("overall_health_score", 5.0),
+                "overall_health_score": overall_score,
                 "summary": result.get("summary", "Daily health analysis completed."),
                 "recommendations": result.get("recommendations", ["Stay hydrated", "Get enough sleep", "Stay active"]),
                 "goal_progress": result.get("goal_progress", "Keep working toward your goals!"),
                 "motivation": result.get("motivation", "You're doing great! Keep it up!")
             }
-            
-        except Exception as e:
-            print(f"Error in enhanced orchestrator: {e}")
-            # Fallback to basic calculation
-            overall_score = (
-                food_output.nutrition_score + 
-                min(10, exercise_output.calories_burned / 50) + 
-                lifestyle_output.wellness_score
-            ) / 3
-            
+        else:
             orchestrator_summary = {
-                "overall_health_score": round(overall_score, 1),
+                "overall_health_score": overall_score,
                 "summary": f"Today shows progress toward your {user.goal.goal_type} goal.",
                 "recommendations": [
                     "Continue following your personalized plan",
@@ -123,34 +195,70 @@ class EnhancedOrchestrator:
             "goal_alignment": goal_alignment
         }
     
-    def _analyze_goal_alignment(self, user: User, food_output, exercise_output, lifestyle_output) -> str:
-        """Analyze how well the user is aligned with their goals"""
+    def _format_history(self, history: Optional[Dict[str, Dict[str, Any]]]) -> str:
+        """One line per rolling window for the prompt"""
+        lines = []
+        for key, window in (history or {}).items():
+            if not window.get("days_logged"):
+                continue
+            averages = window.get("averages", {})
+            parts = [f"logged {window['days_logged']}/{window['days']} days", f"{window['exercise_minutes']} exercise min"]
+            for metric, label in (("sleep_hours", "sleep"), ("screen_time", "screen time"), ("stress_level", "stress")):
+                if metric in averages:
+                    parts.append(f"avg {label} {averages[metric]}")
+            if "overall_health_score" in window.get("scores", {}):
+                parts.append(f"avg health score {window['scores']['overall_health_score']}/10")
+            lines.append(f"- Last {window['days']} days: " + ", ".join(parts))
+        return "\n            ".join(lines) or "- No history yet"
+    
+    def _analyze_goal_alignment(self, user: User, food_output, exercise_output, lifestyle_output,
+                                history: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+        """Analyze how well the user is aligned with their goals, using the last 7 days when logged"""
         goal = user.goal
+        week = (history or {}).get("7d") or {}
+        week_averages = week.get("averages", {}) if week.get("days_logged") else {}
+        week_scores = week.get("scores", {}) if week.get("days_logged") else {}
         alignment_score = 0
         total_checks = 0
         
         # Check calorie alignment
         if goal.target_calories_per_day:
-            calorie_diff = abs(food_output.calories - goal.target_calories_per_day)
+            calories = week_scores.get("calories", food_output.calories)
+            calorie_diff = abs(calories - goal.target_calories_per_day)
             calorie_alignment = max(0, 1 - (calorie_diff / goal.target_calories_per_day))
             alignment_score += calorie_alignment
             total_checks += 1
         
         # Check exercise alignment
         if goal.target_exercise_minutes_per_week:
-            # Estimate weekly exercise from today's data
-            estimated_weekly_exercise = exercise_output.calories_burned * 7 / 300  # Rough estimate
-            exercise_alignment = min(1, estimated_weekly_exercise / goal.target_exercise_minutes_per_week)
+            if week.get("days_logged"):
+                # Minutes actually logged over the last 7 days
+                weekly_exercise = week["exercise_minutes"]
+            else:
+                # No history yet: estimate weekly exercise from today's data
+                weekly_exercise = exercise_output.calories_burned * 7 / 300  # Rough estimate
+            exercise_alignment = min(1, weekly_exercise / goal.target_exercise_minutes_per_week)
             alignment_score += exercise_alignment
             total_checks += 1
         
         # Check sleep alignment
-        if goal.target_sleep_hours and hasattr(lifestyle_output, 'wellness_score'):
+        if goal.target_sleep_hours and week_averages.get("sleep_hours"):
+            sleep_alignment = min(1, week_averages["sleep_hours"] / goal.target_sleep_hours)
+            alignment_score += sleep_alignment
+            total_checks += 1
+        elif goal.target_sleep_hours and hasattr(lifestyle_output, 'wellness_score'):
             # Use wellness score as a proxy for sleep quality
             sleep_alignment = lifestyle_output.wellness_score / 10
             alignment_score += sleep_alignment
             total_checks += 1
         
+        # Screen time and stress are only judged on logged history (lower is better)
+        for target, metric in ((goal.target_screen_time_hours, "screen_time"), (goal.target_stress_level, "stress_level")):
+            average = week_averages.get(metric)
+            if target and average is not None:
+                alignment_score += min(1, target / average) if average > 0 else 1
+                total_checks += 1
+        
         if total_checks == 0:
             return "Goal alignment cannot be determined yet."
         
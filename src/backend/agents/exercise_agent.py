@@ -1,35 +1,92 @@
 from schemas.summary import ExerciseAgentOutput
+from services.scoring_engine import scoring_engine
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from services.llm_gateway import llm_gateway, response_format
+from services.token_budget import token_budget
+from services.similarity_cache import similarity_cache
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# The model only writes the note; calories burned come from the scoring engine
+REPLY_FORMAT = response_format(ExerciseAgentOutput, "note")
+
 class ExerciseAgent:
     def __init__(self):
         self.name = "Exercise Agent"
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.3,
+            max_tokens=token_budget.output_cap("exercise_agent"),
             api_key=os.getenv("OPENAI_API_KEY")
         )
     
-    def analyze_exercises(self, exercises: list) -> ExerciseAgentOutput:
+    def analyze_exercises(self, exercises: list, weight_kg: float = None) -> ExerciseAgentOutput:
         """
         Analyze exercise activities using AI and return fitness insights
         """
+        ready, estimate, prompt = self._start(exercises, weight_kg)
+        if ready is not None:
+            return ready
+        try:
+            result = llm_gateway.invoke_json("exercise_agent", prompt, self.llm, REPLY_FORMAT)
+            return self._finish(exercises, estimate, result)
+        except Exception as e:
+            return self._failed(exercises, estimate, e)
+    
+    async def analyze_exercises_async(self, exercises: list, weight_kg: float = None, hedge: bool = True) -> ExerciseAgentOutput:
+        """Async analyze_exercises; the LLM call may be hedged"""
+        ready, estimate, prompt = self._start(exercises, weight_kg)
+        if ready is not None:
+            return ready
+        try:
+            result = await llm_gateway.ainvoke_json("exercise_agent", prompt, self.llm, hedge=hedge, schema=REPLY_FORMAT)
+            return self._finish(exercises, estimate, result)
+        except Exception as e:
+            return self._failed(exercises, estimate, e)
+    
+    def _start(self, exercises: list, weight_kg: float = None):
+        """(output, estimate, prompt); output is set when no LLM call is needed"""
         if not exercises:
-            return ExerciseAgentOutput(
-                calories_burned=0,
-                note="No exercises recorded today. Consider adding some physical activity to boost your health and energy."
-            )
+            return self._no_exercises(), None, None
+        
+        estimate, prompt = self._prepare(exercises, weight_kg)
+        cached = similarity_cache.lookup("exercise", exercises, estimate["active_minutes"])
+        if cached is not None:
+            return self._output(estimate, cached), estimate, prompt
+        return None, estimate, prompt
+    
+    def _finish(self, exercises: list, estimate: dict, result: dict) -> ExerciseAgentOutput:
+        similarity_cache.store("exercise", exercises, estimate["active_minutes"], result)
+        return self._output(estimate, result)
+    
+    def _failed(self, exercises: list, estimate: dict, error: Exception) -> ExerciseAgentOutput:
+        logger.warning("Exercise agent LLM call failed, using fallback: %s", error)
+        # Fallback to simple analysis
+        return self._fallback_analysis(exercises, estimate)
+    
+    def _no_exercises(self) -> ExerciseAgentOutput:
+        return ExerciseAgentOutput(
+            calories_burned=0,
+            note="No exercises recorded today. Consider adding some physical activity to boost your health and energy."
+        )
+    
+    def _prepare(self, exercises: list, weight_kg: float = None):
+        """Score the exercises locally and build the prompt for the note"""
+        # Numbers come from the local scoring engine; the AI only writes the note
+        estimate = scoring_engine.estimate_exercises(exercises, weight_kg)
         
-        # Create prompt for AI analysis
+        # Create prompt for AI analysis. The note must not cite figures: the similarity cache
+        # reuses it for near-identical entries whose numbers are recomputed
         prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a fitness expert AI. Analyze the provided exercises and return a JSON response with:
-            - calories_burned: estimated total calories burned (integer)
+            ("system", """You are a fitness expert AI. The provided exercises have already been scored. Write a JSON response with:
             - note: motivational and fitness advice (string)
+            Do not quote calorie, minute or score figures in the note; the app shows the numbers next to it
             
             Consider factors like:
             - Exercise type and intensity
@@ -38,31 +95,21 @@ class ExerciseAgent:
             - Motivational tone
             
             Return ONLY valid JSON in this format:
-            {{"calories_burned": number, "note": "string"}}"""),
-            ("human", f"Analyze these exercises: {', '.join(exercises)}")
+            {{"note": "string"}}"""),
+            ("human", f"Analyze these exercises: {', '.join(token_budget.fit_list(exercises))}. Estimated: {estimate['calories_burned']} calories burned over {estimate['active_minutes']} active minutes")
         ])
-        
-        try:
-            chain = prompt | self.llm
-            response = chain.invoke({})
-            
-            # Parse AI response
-            import json
-            result = json.loads(response.content)
-            
-            return ExerciseAgentOutput(
-                calories_burned=result.get("calories_burned", 0),
-                note=result.get("note", "Great job staying active!")
-            )
-            
-        except Exception as e:
-            print(f"Error in exercise agent: {e}")
-            # Fallback to simple analysis
-            return self._fallback_analysis(exercises)
+        return estimate, prompt
+    
+    def _output(self, estimate: dict, result: dict) -> ExerciseAgentOutput:
+        return ExerciseAgentOutput(
+            calories_burned=estimate["calories_burned"],
+            note=result.get("note", "Great job staying active!")
+        )
     
-    def _fallback_analysis(self, exercises: list) -> ExerciseAgentOutput:
+    def _fallback_analysis(self, exercises: list, estimate: dict = None) -> ExerciseAgentOutput:
         """Fallback analysis if AI fails"""
-        total_calories = len(exercises) * 150  # Simple estimate
+        estimate = estimate or scoring_engine.estimate_exercises(exercises)
+        total_calories = estimate["calories_burned"]
         
         if total_calories > 300:
             note = "Excellent workout! You're building great fitness habits."
@@ -1,18 +1,29 @@
 from schemas.summary import FoodAgentOutput
+from services.scoring_engine import scoring_engine
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from services.llm_gateway import llm_gateway, response_format
+from services.token_budget import token_budget
+from services.similarity_cache import similarity_cache
 from langchain_core.messages import HumanMessage
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# The model only writes the comment; calories and score come from the scoring engine
+REPLY_FORMAT = response_format(FoodAgentOutput, "comment")
+
 class FoodAgent:
     def __init__(self):
         self.name = "Food Agent"
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.3,
+            max_tokens=token_budget.output_cap("food_agent"),
             api_key=os.getenv("OPENAI_API_KEY")
         )
     
@@ -20,19 +31,65 @@ class FoodAgent:
         """
         Analyze meals using AI and return nutritional insights
         """
+        ready, estimate, prompt = self._start(meals)
+        if ready is not None:
+            return ready
+        try:
+            result = llm_gateway.invoke_json("food_agent", prompt, self.llm, REPLY_FORMAT)
+            return self._finish(meals, estimate, result)
+        except Exception as e:
+            return self._failed(meals, estimate, e)
+    
+    async def analyze_meals_async(self, meals: list, hedge: bool = True) -> FoodAgentOutput:
+        """Async analyze_meals; the LLM call may be hedged"""
+        ready, estimate, prompt = self._start(meals)
+        if ready is not None:
+            return ready
+        try:
+            result = await llm_gateway.ainvoke_json("food_agent", prompt, self.llm, hedge=hedge, schema=REPLY_FORMAT)
+            return self._finish(meals, estimate, result)
+        except Exception as e:
+            return self._failed(meals, estimate, e)
+    
+    def _start(self, meals: list):
+        """(output, estimate, prompt); output is set when no LLM call is needed"""
         if not meals:
-            return FoodAgentOutput(
-                calories=0,
-                nutrition_score=0.0,
-                comment="No meals recorded today. Consider adding nutritious meals to your day."
-            )
+            return self._no_meals(), None, None
+        
+        estimate, prompt = self._prepare(meals)
+        cached = similarity_cache.lookup("food", meals, estimate["calories"])
+        if cached is not None:
+            return self._output(estimate, cached), estimate, prompt
+        return None, estimate, prompt
+    
+    def _finish(self, meals: list, estimate: dict, result: dict) -> FoodAgentOutput:
+        similarity_cache.store("food", meals, estimate["calories"], result)
+        return self._output(estimate, result)
+    
+    def _failed(self, meals: list, estimate: dict, error: Exception) -> FoodAgentOutput:
+        logger.warning("Food agent LLM call failed, using fallback: %s", error)
+        # Fallback to simple analysis
+        return self._fallback_analysis(meals, estimate)
+    
+    def _no_meals(self) -> FoodAgentOutput:
+        return FoodAgentOutput(
+            calories=0,
+            nutrition_score=0.0,
+            comment="No meals recorded today. Consider adding nutritious meals to your day."
+        )
+    
+    def _prepare(self, meals: list):
+        """Score the meals locally and build the prompt for the comment"""
+        # Numbers come from the local scoring engine; the AI only writes the comment
+        estimate = scoring_engine.estimate_meals(meals)
+        food_groups = ', '.join(estimate["categories"]) or 'unknown'
         
-        # Create prompt for AI analysis
+        # Create prompt for AI analysis. The comment must not cite figures: the similarity cache
+        # reuses it for near-identical entries whose numbers are recomputed
         prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a nutrition expert AI. Analyze the provided meals and return a JSON response with:
-            - calories: estimated total calories (integer)
-            - nutrition_score: score from 0-10 based on nutritional quality (float)
+            ("system", """You are a nutrition expert AI. The provided meals have already been scored. Write a JSON response with:
             - comment: brief nutritional advice (string)
+            Do not quote calorie or score figures in the comment; the app shows the numbers next to it
             
             Consider factors like:
             - Calorie density
@@ -41,38 +98,29 @@ class FoodAgent:
             - Healthiness of ingredients
             
             Return ONLY valid JSON in this format:
-            {{"calories": number, "nutrition_score": number, "comment": "string"}}"""),
-            ("human", f"Analyze these meals: {', '.join(meals)}")
+            {{"comment": "string"}}"""),
+            ("human", f"Analyze these meals: {', '.join(token_budget.fit_list(meals))}. Estimated total: {estimate['calories']} calories, nutrition score {estimate['nutrition_score']}/10, food groups: {food_groups}")
         ])
-        
-        try:
-            chain = prompt | self.llm
-            response = chain.invoke({})
-            
-            # Parse AI response
-            import json
-            result = json.loads(response.content)
-            
-            return FoodAgentOutput(
-                calories=result.get("calories", 0),
-                nutrition_score=result.get("nutrition_score", 0.0),
-                comment=result.get("comment", "Unable to analyze meals.")
-            )
-            
-        except Exception as e:
-            print(f"Error in food agent: {e}")
-            # Fallback to simple analysis
-            return self._fallback_analysis(meals)
+        return estimate, prompt
+    
+    def _output(self, estimate: dict, result: dict) -> FoodAgentOutput:
+        return FoodAgentOutput(
+            calories=estimate["calories"],
+            nutrition_score=estimate["nutrition_score"],
+            comment=result.get("comment", "Unable to analyze meals.")
+        )
     
-    def _fallback_analysis(self, meals: list) -> FoodAgentOutput:
+    def _fallback_analysis(self, meals: list, estimate: dict = None) -> FoodAgentOutput:
         """Fallback analysis if AI fails"""
-        total_calories = len(meals) * 400  # Simple estimate
-        nutrition_score = min(10.0, len(meals) * 2.5)  # Basic scoring
+        estimate = estimate or scoring_engine.estimate_meals(meals)
         
-        comment = f"Analyzed {len(meals)} meals. Consider adding more variety for better nutrition."
+        if estimate["nutrition_score"] >= 7:
+            comment = f"Analyzed {len(meals)} meals. Nicely balanced choices - keep it up!"
+        else:
+            comment = f"Analyzed {len(meals)} meals. Consider adding more variety for better nutrition."
         
         return FoodAgentOutput(
-            calories=total_calories,
-            nutrition_score=nutrition_score,
+            calories=estimate["calories"],
+            nutrition_score=estimate["nutrition_score"],
             comment=comment
         )
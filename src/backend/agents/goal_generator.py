@@ -1,25 +1,61 @@
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from services.llm_gateway import llm_gateway, response_format
+from services.token_budget import token_budget
+import logging
 import os
 from dotenv import load_dotenv
+from typing import Optional
 from schemas.user import UserProfile, UserGoal, GoalType, ActivityLevel, Gender
 from agents.personalization_generator import PersonalizationGenerator
-import json
+from services.goal_template_service import GoalTemplateStore
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Everything the prompt asks for; goal_type is constrained to the GoalType values
+REPLY_FORMAT = response_format(
+    UserGoal, "goal_type", "target_weight", "target_calories_per_day", "target_protein_per_day",
+    "target_exercise_minutes_per_week", "target_sleep_hours", "target_screen_time_hours",
+    "target_stress_level", "goal_description"
+)
+DESCRIPTION_FORMAT = response_format(UserGoal, "goal_description")
+
 class GoalGenerator:
-    def __init__(self):
+    def __init__(self, templates: Optional[GoalTemplateStore] = None):
+        self.templates = templates
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.3,
+            max_tokens=token_budget.output_cap("goal_generator"),
+            api_key=os.getenv("OPENAI_API_KEY")
+        )
+        self.description_llm = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0.5,
+            max_tokens=token_budget.output_cap("goal_personalizer"),
             api_key=os.getenv("OPENAI_API_KEY")
         )
         self.personalization_generator = PersonalizationGenerator()
     
     def generate_goal(self, profile: UserProfile) -> UserGoal:
         """Generate personalized health goal based on user profile"""
-        
+        if self.templates is not None:
+            goal = self.templates.goal_for(profile)
+            if goal is not None:
+                # Served from the profile's bucket; personalize_description writes the description later
+                return goal
+
+        goal = self._ask_model(profile)
+        if goal is None:
+            return self._fallback_goal(profile)
+        if self.templates is not None:
+            self.templates.save(profile, goal)
+        return goal
+
+    def _ask_model(self, profile: UserProfile) -> Optional[UserGoal]:
+        """The LLM's goal for the profile, or None when the call fails"""
         # Create prompt for AI goal generation
         prompt = ChatPromptTemplate.from_messages([
             ("system", """You are a student health and wellness expert AI. Based on the student's profile, generate a personalized health goal that considers their academic lifestyle and study demands.
@@ -48,29 +84,25 @@ class GoalGenerator:
             Activity Level: {profile.activity_level.value}
             
             HEALTH INFO:
-            Medical Conditions: {', '.join(profile.medical_conditions) if profile.medical_conditions else 'None'}
-            Dietary Restrictions: {', '.join(profile.dietary_restrictions) if profile.dietary_restrictions else 'None'}
+            Medical Conditions: {', '.join(token_budget.fit_list(profile.medical_conditions)) if profile.medical_conditions else 'None'}
+            Dietary Restrictions: {', '.join(token_budget.fit_list(profile.dietary_restrictions)) if profile.dietary_restrictions else 'None'}
             
             HEALTH GOALS & MOTIVATION:
-            Primary Health Goal: {profile.primary_health_goal}
-            Motivation: {profile.motivation or 'Not specified'}
-            Lifestyle Vision: {profile.lifestyle_vision or 'Not specified'}
+            Primary Health Goal: {token_budget.truncate(profile.primary_health_goal)}
+            Motivation: {token_budget.truncate(profile.motivation) or 'Not specified'}
+            Lifestyle Vision: {token_budget.truncate(profile.lifestyle_vision) or 'Not specified'}
             
             INTELLECTUAL INTERESTS:
-            Intellectual Interests: {', '.join(profile.intellectual_interests) if profile.intellectual_interests else 'Not specified'}
+            Intellectual Interests: {', '.join(token_budget.fit_list(profile.intellectual_interests)) if profile.intellectual_interests else 'Not specified'}
             Learning Style: {profile.learning_style}
             Time Availability: {profile.time_availability}""")
         ])
         
         try:
-            chain = prompt | self.llm
-            response = chain.invoke({})
-            
-            # Parse AI response
-            result = json.loads(response.content)
+            result = llm_gateway.invoke_json("goal_generator", prompt, self.llm, REPLY_FORMAT)
             
             return UserGoal(
-                goal_type=GoalType(result.get("goal_type", "general_health")),
+                goal_type=self._goal_type(result.get("goal_type"), profile),
                 target_weight=result.get("target_weight"),
                 target_calories_per_day=result.get("target_calories_per_day", 2000),
                 target_protein_per_day=result.get("target_protein_per_day", 50),
@@ -83,9 +115,41 @@ class GoalGenerator:
             )
             
         except Exception as e:
-            print(f"Error in goal generator: {e}")
-            # Fallback to basic goal
-            return self._fallback_goal(profile)
+            logger.warning("Goal generator LLM call failed: %s", e)
+            return None
+
+    def personalize_description(self, profile: UserProfile, goal: UserGoal) -> Optional[str]:
+        """Description of a template goal written for this student, or None when the call fails"""
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", """You are a student health and wellness expert AI. The student's health goal targets are already set; write only the goal_description: 2-3 sentences explaining the goal in terms of their own motivation, lifestyle and study demands. Do not change the targets.
+
+            Return ONLY valid JSON in this format:
+            {{"goal_description": "string"}}"""),
+            ("human", f"""Student: {profile.name}, {profile.age}, {profile.activity_level.value}
+            Primary Health Goal: {token_budget.truncate(profile.primary_health_goal)}
+            Motivation: {token_budget.truncate(profile.motivation) or 'Not specified'}
+            Lifestyle Vision: {token_budget.truncate(profile.lifestyle_vision) or 'Not specified'}
+            Dietary Restrictions: {', '.join(token_budget.fit_list(profile.dietary_restrictions)) if profile.dietary_restrictions else 'None'}
+            Time Availability: {profile.time_availability}
+
+            Goal: {goal.goal_type.value}, {goal.target_calories_per_day} kcal/day, {goal.target_protein_per_day} g protein/day, {goal.target_exercise_minutes_per_week} exercise minutes/week, {goal.target_sleep_hours} h sleep, target weight {goal.target_weight or 'n/a'} kg""")
+        ])
+
+        try:
+            result = llm_gateway.invoke_json("goal_personalizer", prompt, self.description_llm, DESCRIPTION_FORMAT)
+            return str(result.get("goal_description") or "").strip() or None
+        except Exception as e:
+            logger.warning("Goal description LLM call failed, keeping the template text: %s", e)
+            return None
+    
+    def _goal_type(self, value, profile: UserProfile) -> GoalType:
+        """Map the model's goal_type onto GoalType, keeping the AI targets when it is unknown"""
+        normalized = str(value or "general_health").strip().lower().replace("-", "_").replace(" ", "_")
+        try:
+            return GoalType(normalized)
+        except ValueError:
+            logger.info("Unknown goal_type %r from the model, using the profile-based type", value)
+            return self._fallback_goal(profile).goal_type
     
     def _fallback_goal(self, profile: UserProfile) -> UserGoal:
         """Fallback goal generation if AI fails"""
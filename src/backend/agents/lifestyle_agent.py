@@ -1,17 +1,27 @@
 from schemas.summary import LifestyleAgentOutput
+from services.scoring_engine import scoring_engine
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from services.llm_gateway import llm_gateway, response_format
+from services.token_budget import token_budget
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# The model only writes the advice; the wellness score comes from the scoring engine
+REPLY_FORMAT = response_format(LifestyleAgentOutput, "advice")
+
 class LifestyleAgent:
     def __init__(self):
         self.name = "Lifestyle Agent"
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.3,
+            max_tokens=token_budget.output_cap("lifestyle_agent"),
             api_key=os.getenv("OPENAI_API_KEY")
         )
     
@@ -19,14 +29,39 @@ class LifestyleAgent:
         """
         Analyze lifestyle factors using AI and return wellness insights
         """
+        wellness_score, prompt = self._prepare(lifestyle_data)
+        try:
+            result = llm_gateway.invoke_json("lifestyle_agent", prompt, self.llm, REPLY_FORMAT)
+            return self._output(wellness_score, result)
+        except Exception as e:
+            return self._failed(lifestyle_data, e)
+    
+    async def analyze_lifestyle_async(self, lifestyle_data: dict, hedge: bool = True) -> LifestyleAgentOutput:
+        """Async analyze_lifestyle; the LLM call may be hedged"""
+        wellness_score, prompt = self._prepare(lifestyle_data)
+        try:
+            result = await llm_gateway.ainvoke_json("lifestyle_agent", prompt, self.llm, hedge=hedge, schema=REPLY_FORMAT)
+            return self._output(wellness_score, result)
+        except Exception as e:
+            return self._failed(lifestyle_data, e)
+    
+    def _failed(self, lifestyle_data: dict, error: Exception) -> LifestyleAgentOutput:
+        logger.warning("Lifestyle agent LLM call failed, using fallback: %s", error)
+        # Fallback to simple analysis
+        return self._fallback_analysis(lifestyle_data)
+    
+    def _prepare(self, lifestyle_data: dict):
+        """Score the lifestyle data locally and build the prompt for the advice"""
         sleep_hours = lifestyle_data.get("sleep_hours", 8)
         screen_time = lifestyle_data.get("screen_time", 2)
         stress_level = lifestyle_data.get("stress_level", 5)
         
+        # The score comes from the local scoring engine; the AI only writes the advice
+        wellness_score = scoring_engine.wellness_score(lifestyle_data)
+        
         # Create prompt for AI analysis
         prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a wellness expert AI. Analyze the provided lifestyle data and return a JSON response with:
-            - wellness_score: overall wellness score from 0-10 (float)
+            ("system", """You are a wellness expert AI. The provided lifestyle data has already been scored. Write a JSON response with:
             - advice: personalized wellness advice (string)
             
             Consider factors like:
@@ -36,27 +71,16 @@ class LifestyleAgent:
             - Overall lifestyle balance
             
             Return ONLY valid JSON in this format:
-            {{"wellness_score": number, "advice": "string"}}"""),
-            ("human", f"Analyze this lifestyle data: Sleep: {sleep_hours}h, Screen time: {screen_time}h, Stress level: {stress_level}/10")
+            {{"advice": "string"}}"""),
+            ("human", f"Analyze this lifestyle data: Sleep: {sleep_hours}h, Screen time: {screen_time}h, Stress level: {stress_level}/10. Wellness score: {wellness_score}/10")
         ])
-        
-        try:
-            chain = prompt | self.llm
-            response = chain.invoke({})
-            
-            # Parse AI response
-            import json
-            result = json.loads(response.content)
-            
-            return LifestyleAgentOutput(
-                wellness_score=result.get("wellness_score", 5.0),
-                advice=result.get("advice", "Focus on maintaining a balanced lifestyle.")
-            )
-            
-        except Exception as e:
-            print(f"Error in lifestyle agent: {e}")
-            # Fallback to simple analysis
-            return self._fallback_analysis(lifestyle_data)
+        return wellness_score, prompt
+    
+    def _output(self, wellness_score: float, result: dict) -> LifestyleAgentOutput:
+        return LifestyleAgentOutput(
+            wellness_score=wellness_score,
+            advice=result.get("advice", "Focus on maintaining a balanced lifestyle.")
+        )
     
     def _fallback_analysis(self, lifestyle_data: dict) -> LifestyleAgentOutput:
         """Fallback analysis if AI fails"""
@@ -65,11 +89,7 @@ class LifestyleAgent:
         stress_level = lifestyle_data.get("stress_level", 5)
         
         # Calculate wellness score (0-10)
-        sleep_score = min(10, sleep_hours * 1.25)  # Optimal is 8 hours
-        screen_score = max(0, 10 - (screen_time * 1.5))  # Less screen time is better
-        stress_score = max(0, 10 - stress_level)  # Lower stress is better
-        
-        wellness_score = (sleep_score + screen_score + stress_score) / 3
+        wellness_score = scoring_engine.wellness_score(lifestyle_data)
         
         # Generate advice
         advice_parts = []
@@ -86,6 +106,6 @@ class LifestyleAgent:
             advice = " ".join(advice_parts)
         
         return LifestyleAgentOutput(
-            wellness_score=round(wellness_score, 1),
+            wellness_score=wellness_score,
             advice=advice
         )
@@ -1,14 +1,23 @@
 from agents.food_agent import FoodAgent
 from agents.exercise_agent import ExerciseAgent
 from agents.lifestyle_agent import LifestyleAgent
-from schemas.summary import DailySummary
+from schemas.summary import DailySummary, OrchestratorSummary
+from services.scoring_engine import scoring_engine
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from services.llm_gateway import llm_gateway, response_format
+from services.token_budget import token_budget
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# The overall score is computed locally; the model writes the summary and recommendations
+REPLY_FORMAT = response_format(OrchestratorSummary, "summary", "recommendations")
+
 class Orchestrator:
     def __init__(self):
         self.food_agent = FoodAgent()
@@ -17,6 +26,7 @@ class Orchestrator:
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.4,
+            max_tokens=token_budget.output_cap("orchestrator"),
             api_key=os.getenv("OPENAI_API_KEY")
         )
     
@@ -29,48 +39,43 @@ class Orchestrator:
         exercise_output = self.exercise_agent.analyze_exercises(user_data.get("exercises", []))
         lifestyle_output = self.lifestyle_agent.analyze_lifestyle(user_data.get("lifestyle", {}))
         
+        # The overall score is computed locally; the AI only writes the narrative
+        overall_score = scoring_engine.overall_health_score(
+            food_output.nutrition_score,
+            exercise_output.calories_burned,
+            lifestyle_output.wellness_score
+        )
+        
         # Use AI to generate overall summary and recommendations
         try:
             prompt = ChatPromptTemplate.from_messages([
                 ("system", """You are a health and wellness expert AI. Based on the provided agent outputs, generate a comprehensive daily health summary with:
-                - overall_health_score: overall score from 0-10 (float)
                 - summary: brief daily summary (string)
                 - recommendations: list of 3 personalized recommendations (list of strings)
                 
                 Consider the nutrition score, exercise calories burned, and wellness score to provide balanced insights.
                 
                 Return ONLY valid JSON in this format:
-                {{"overall_health_score": number, "summary": "string", "recommendations": ["string1", "string2", "string3"]}}"""),
+                {{"summary": "string", "recommendations": ["string1", "string2", "string3"]}}"""),
                 ("human", f"""Analyze this health data:
                 Nutrition: {food_output.nutrition_score}/10, {food_output.calories} calories, {food_output.comment}
                 Exercise: {exercise_output.calories_burned} calories burned, {exercise_output.note}
-                Lifestyle: {lifestyle_output.wellness_score}/10 wellness score, {lifestyle_output.advice}""")
+                Lifestyle: {lifestyle_output.wellness_score}/10 wellness score, {lifestyle_output.advice}
+                Overall: {overall_score}/10 health score""")
             ])
             
-            chain = prompt | self.llm
-            response = chain.invoke({})
-            
-            # Parse AI response
-            import json
-            result = json.loads(response.content)
+            result = llm_gateway.invoke_json("orchestrator", prompt, self.llm, REPLY_FORMAT)
             
             orchestrator_summary = {
-                "overall_health_score": result.get("overall_health_score", 5.0),
+                "overall_health_score": overall_score,
                 "summary": result.get("summary", "Daily health analysis completed."),
                 "recommendations": result.get("recommendations", ["Stay hydrated", "Get enough sleep", "Stay active"])
             }
             
         except Exception as e:
-            print(f"Error in orchestrator AI: {e}")
-            # Fallback to simple calculation
-            overall_score = (
-                food_output.nutrition_score + 
-                min(10, exercise_output.calories_burned / 50) +  # Convert to 0-10 scale
-                lifestyle_output.wellness_score
-            ) / 3
-            
+            logger.warning("Orchestrator LLM call failed, using fallback: %s", e)
             orchestrator_summary = {
-                "overall_health_score": round(overall_score, 1),
+                "overall_health_score": overall_score,
                 "summary": f"Today shows nutrition score of {food_output.nutrition_score}/10, {exercise_output.calories_burned} calories burned, and wellness score of {lifestyle_output.wellness_score}/10.",
                 "recommendations": [
                     "Maintain balanced nutrition",
@@ -1,20 +1,77 @@
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from services.llm_gateway import llm_gateway, response_format
+from services.token_budget import token_budget
+import logging
 import os
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
-from schemas.user import UserProfile, UserGoal
-import json
+from schemas.user import UserProfile, UserGoal, PersonalizationBatch
+from services.nickname_pool import NicknamePool
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+BATCH_FORMAT = response_format(PersonalizationBatch)
+
 class PersonalizationGenerator:
-    def __init__(self):
+    # Nicknames asked for per pool-filling call
+    BATCH_SIZE = 25
+
+    def __init__(self, pool: Optional[NicknamePool] = None):
+        self.pool = pool
         self.llm = ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.8,
+            max_tokens=token_budget.output_cap("personalization_generator"),
+            api_key=os.getenv("OPENAI_API_KEY")
+        )
+        self.batch_llm = ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=1.0,
+            max_tokens=token_budget.output_cap("personalization_batch"),
             api_key=os.getenv("OPENAI_API_KEY")
         )
     
+    def pick_nickname_and_avatar(self, profile: UserProfile, goal: UserGoal, user_id: str) -> tuple[str, str]:
+        """Nickname and avatar for signup: an unused one from the pool, else the goal type's fallback"""
+        if self.pool is not None:
+            option = self.pool.draw(self.pool.bucket_for(profile, goal), user_id)
+            if option is not None:
+                return option
+        return self._get_fallback_personalization(goal.goal_type)
+    
+    def generate_batch(self, goal_type: str, cluster: str, count: int) -> List[Tuple[str, str]]:
+        """count nickname/avatar options for a pool bucket; empty when the call fails"""
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", """You are a creative AI that generates fun, motivational nicknames and avatar emojis for students.
+
+            Each nickname should be:
+            - Motivational, positive and appropriate for students
+            - 2-3 words, fun and memorable
+            - Related to the health goal and the interests given
+            - Different from every other nickname in the list
+
+            Each avatar is a single emoji that fits its nickname.
+
+            Return ONLY valid JSON in this format:
+            {{"options": [{{"nickname": "string", "avatar": "emoji"}}]}}"""),
+            ("human", f"""Generate {count} nicknames with avatars for students with:
+            Goal Type: {goal_type}
+            Interests: {cluster}""")
+        ])
+
+        try:
+            result = llm_gateway.invoke_json("personalization_batch", prompt, self.batch_llm, BATCH_FORMAT)
+            return [
+                (str(option.get("nickname", "")), str(option.get("avatar", "")))
+                for option in result.get("options") or [] if isinstance(option, dict)
+            ]
+        except Exception as e:
+            logger.warning("Nickname batch generation failed: %s", e)
+            return []
+    
     def generate_nickname_and_avatar(self, profile: UserProfile, goal: UserGoal) -> tuple[str, str]:
         """Generate a personalized nickname and avatar based on user's profile and goal"""
         
@@ -45,15 +102,15 @@ class PersonalizationGenerator:
             Age: {profile.age}
             Gender: {profile.gender.value}
             Goal Type: {goal.goal_type}
-            Goal Description: {goal.goal_description}
+            Goal Description: {token_budget.truncate(goal.goal_description)}
 
             HEALTH & MOTIVATION:
-            Primary Health Goal: {profile.primary_health_goal}
-            Motivation: {profile.motivation or 'Not specified'}
-            Lifestyle Vision: {profile.lifestyle_vision or 'Not specified'}
+            Primary Health Goal: {token_budget.truncate(profile.primary_health_goal)}
+            Motivation: {token_budget.truncate(profile.motivation) or 'Not specified'}
+            Lifestyle Vision: {token_budget.truncate(profile.lifestyle_vision) or 'Not specified'}
 
             INTELLECTUAL INTERESTS:
-            Intellectual Interests: {', '.join(profile.intellectual_interests) if profile.intellectual_interests else 'Not specified'}
+            Intellectual Interests: {', '.join(token_budget.fit_list(profile.intellectual_interests)) if profile.intellectual_interests else 'Not specified'}
             Learning Style: {profile.learning_style}
             Time Availability: {profile.time_availability}
             Activity Level: {profile.activity_level.value}
@@ -61,11 +118,7 @@ class PersonalizationGenerator:
         ])
         
         try:
-            chain = prompt | self.llm
-            response = chain.invoke({})
-            
-            # Parse the JSON response
-            result = json.loads(response.content)
+            result = llm_gateway.invoke_json("personalization_generator", prompt, self.llm)
             
             nickname = result.get("nickname", "Health Warrior")
             avatar = result.get("avatar", "💪")
@@ -73,7 +126,7 @@ class PersonalizationGenerator:
             return nickname, avatar
             
         except Exception as e:
-            print(f"Error generating nickname and avatar: {e}")
+            logger.warning("Nickname/avatar generation failed, using fallback: %s", e)
             # Fallback nicknames and avatars based on goal type
             return self._get_fallback_personalization(goal.goal_type)
     
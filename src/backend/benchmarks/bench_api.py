@@ -0,0 +1,194 @@
+"""
+API hot-path benchmark
+Runs the FastAPI app in-process against deterministic fakes for OpenAI, MongoDB
+and YouTube, then reports p50/p95/p99 latency and requests/sec per endpoint.
+
+Usage (from src/backend):
+    python benchmarks/bench_api.py [--requests 200] [--concurrency 8]
+                                   [--output results.json] [--baseline results.json]
+
+Environment:
+    BENCH_LLM_LATENCY_MS   simulated latency of every LLM call (default 0)
+    BENCH_MONGODB_URL      use a real local mongod instead of mongomock
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes  # noqa: E402
+
+SIGNUP_PAYLOAD = {
+    "email": "bench@mindscroll.dev",
+    "password": "bench-password",
+    "name": "Bench User",
+    "age": 21,
+    "gender": "female",
+    "weight": 62.0,
+    "height": 168.0,
+    "activity_level": "moderately_active",
+    "primary_health_goal": "Have more energy for exams",
+    "motivation": "Finals are coming up",
+    "lifestyle_vision": "Balanced and rested",
+    "intellectual_interests": ["Science", "Art"],
+    "learning_style": "visual",
+    "time_availability": "30 minutes daily"
+}
+
+DAILY_DATA = {
+    "meals": ["breakfast: oatmeal with berries", "lunch: grilled chicken salad", "dinner: salmon, rice and broccoli"],
+    "exercises": ["30 minutes jogging", "20 push-ups"],
+    "lifestyle": {"sleep_hours": 7, "screen_time": 5, "stress_level": 4}
+}
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def make_test_image() -> bytes:
+    """Encode a small deterministic PNG for the image analysis endpoint"""
+    from PIL import Image
+    image = Image.new("RGB", (256, 256), (235, 225, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def build_scenarios(user_id: str) -> Dict[str, Callable[[Any], Any]]:
+    """Map each benchmarked endpoint to a coroutine factory taking an httpx client"""
+    image_bytes = make_test_image()
+    entry = {"user_id": user_id, **DAILY_DATA}
+
+    return {
+        "POST /generate-personalized-summary": lambda client: client.post("/generate-personalized-summary", json=entry),
+        "POST /auth/login": lambda client: client.post("/auth/login", json={
+            "email": SIGNUP_PAYLOAD["email"], "password": SIGNUP_PAYLOAD["password"]
+        }),
+        "POST /daily-entry": lambda client: client.post("/daily-entry", json=entry),
+        "POST /api/food/analyze-image": lambda client: client.post(
+            "/api/food/analyze-image", files={"image": ("meal.png", image_bytes, "image/png")}
+        ),
+        "GET /api/intellectual/recommendations": lambda client: client.get(
+            "/api/intellectual/recommendations", params={"topics": "Science,Art"}
+        ),
+    }
+
+async def run_scenario(client, request_factory, total: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    """Fire total requests with bounded concurrency and collect latencies"""
+    for _ in range(warmup):
+        await request_factory(client)
+
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await request_factory(client)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2)
+    }
+
+async def run_benchmarks(app, args) -> Dict[str, Dict[str, Any]]:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        signup = await client.post("/auth/signup", json=SIGNUP_PAYLOAD)
+        signup.raise_for_status()
+        scenarios = build_scenarios(signup.json()["user_id"])
+
+        results = {}
+        for name, request_factory in scenarios.items():
+            if args.only and args.only not in name:
+                continue
+            results[name] = await run_scenario(client, request_factory, args.requests, args.concurrency, args.warmup)
+        return results
+
+def print_report(results: Dict[str, Dict[str, Any]], environment: Dict[str, Any]):
+    print(f"\nMongo: {environment['mongo']} | LLM latency: {os.getenv('BENCH_LLM_LATENCY_MS', '0')}ms")
+    header = f"{'endpoint':<42}{'n':>6}{'err':>5}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        print(f"{name:<42}{result['requests']:>6}{result['errors']:>5}{result['rps']:>10}"
+              f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}")
+
+def compare_to_baseline(results: Dict[str, Dict[str, Any]], baseline_file: str, max_regression: float) -> List[str]:
+    """List endpoints whose p95 or throughput regressed beyond the allowed fraction"""
+    with open(baseline_file, 'r') as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if result["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result["rps"] < previous["rps"] * (1 - max_regression):
+            regressions.append(f"{name}: req/s {previous['rps']} -> {result['rps']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Mindscroll API hot paths offline")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent in-flight requests")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per endpoint")
+    parser.add_argument("--only", help="Only run endpoints whose name contains this text")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Fail if results regress against this JSON file")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed regression fraction vs baseline")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's INFO logs")
+    args = parser.parse_args()
+
+    environment = fakes.install()
+    os.chdir(BACKEND_DIR)
+
+    # The app logs to stdout through the logging service; keep the report readable unless asked
+    if not args.verbose:
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import main as app_module
+    results = asyncio.run(run_benchmarks(app_module.app, args))
+
+    print_report(results, environment)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"environment": {"mongo": environment["mongo"]}, "results": results}, f, indent=2)
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.max_regression)
+        if regressions:
+            print("\n[REGRESSION] " + "\n[REGRESSION] ".join(regressions))
+            sys.exit(1)
+        print("\n[SUCCESS] No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
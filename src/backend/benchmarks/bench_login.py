@@ -0,0 +1,95 @@
+"""
+Login throughput benchmark
+Runs concurrent logins against scrypt-hashed credentials in three ways:
+verifying inline in the async handler (on the event loop), in the shared
+default threadpool, and in the password hasher's bounded pool. Each login
+awaits a simulated user lookup first. A ticker task runs alongside and
+measures event-loop lag, which is what every other request on the worker
+waits through.
+
+Usage (from src/backend):
+    python benchmarks/bench_login.py [--logins 200] [--concurrency 32] [--db-ms 2]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from services.password_hasher import password_hasher  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+async def ticker(lags: list, stop: asyncio.Event, interval: float = 0.005):
+    """Record how late a 5 ms timer fires while logins run"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+async def run(mode: str, stored: str, logins: int, concurrency: int, db_seconds: float):
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def login():
+        async with limit:
+            started = time.perf_counter()
+            await asyncio.sleep(db_seconds)
+            if mode == "inline":
+                ok = password_hasher.verify(stored, PASSWORD)
+            elif mode == "threadpool":
+                ok = await loop.run_in_executor(None, password_hasher.verify, stored, PASSWORD)
+            else:
+                ok = await password_hasher.run(password_hasher.verify, stored, PASSWORD)
+            assert ok
+            latencies.append(time.perf_counter() - started)
+
+    lags: list = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+
+    latencies.sort()
+    return {
+        "throughput": logins / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "lag_p95": sorted(lags)[int(0.95 * (len(lags) - 1))] if lags else 0.0,
+        "lag_max": max(lags, default=0.0),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare login throughput and event-loop lag with scrypt verification")
+    parser.add_argument("--logins", type=int, default=200, help="Logins per mode")
+    parser.add_argument("--concurrency", type=int, default=32, help="Logins in flight at once")
+    parser.add_argument("--db-ms", type=float, default=2.0, help="Simulated user lookup time")
+    args = parser.parse_args()
+
+    stored = password_hasher.hash(PASSWORD)
+    started = time.perf_counter()
+    password_hasher.verify(stored, PASSWORD)
+    print(f"scrypt n={password_hasher.n} r={password_hasher.r} p={password_hasher.p}: "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms per verify, "
+          f"{password_hasher.workers} pool workers, {os.cpu_count()} CPUs")
+    print()
+
+    header = f"{'mode':<12}{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'loop lag p95':>14}{'lag max':>9}"
+    print(header)
+    print("-" * len(header))
+    for mode in ("inline", "threadpool", "pool"):
+        result = asyncio.run(run(mode, stored, args.logins, args.concurrency, args.db_ms / 1000))
+        print(f"{mode:<12}{result['throughput']:>10.1f}{result['p50'] * 1000:>9.0f}{result['p95'] * 1000:>9.0f}"
+              f"{result['lag_p95'] * 1000:>14.1f}{result['lag_max'] * 1000:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+LLM reply parsing benchmark
+Runs reply shapes seen from free-text JSON prompting (fenced, wrapped in prose,
+truncated, ...) through the previous parser (json.loads on the reply) and the
+gateway's parser (json.loads, then the tolerant extractor), and reports the
+parse-failure rate and cost of each.
+
+Structured-output mode is not simulated here: with a strict json_schema the
+provider only returns schema-valid JSON, which both parsers accept.
+
+Usage (from src/backend):
+    python benchmarks/bench_parsing.py [--repeat 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from langchain_core.messages import AIMessage  # noqa: E402
+from services.llm_gateway import llm_gateway  # noqa: E402
+
+GOAL = ('{"goal_type": "general_health", "target_weight": 70, "target_calories_per_day": 2200, '
+        '"target_sleep_hours": 8, "goal_description": "Steady energy for study: balanced meals {and} sleep."}')
+
+REPLIES = [
+    ("bare", GOAL),
+    ("whitespace", f"\n  {GOAL}\n"),
+    ("fenced", f"```json\n{GOAL}\n```"),
+    ("prose before", f"Here is the personalized goal:\n{GOAL}"),
+    ("prose after", f"{GOAL}\nLet me know if you want changes!"),
+    ("braces in prose", f"Using {{profile}} data: {GOAL}"),
+    ("truncated", GOAL[:-25]),
+    ("no json", "I'm sorry, I can't help with that."),
+]
+
+def old_parse(content: str):
+    return json.loads(content)
+
+def new_parse(content: str):
+    return llm_gateway._parse("bench", AIMessage(content=content), None)
+
+def succeeds(parse, content: str) -> bool:
+    try:
+        return isinstance(parse(content), dict)
+    except ValueError:
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LLM reply parse-failure rates")
+    parser.add_argument("--repeat", type=int, default=2000, help="Parses per timing")
+    args = parser.parse_args()
+
+    header = f"{'reply shape':<18}{'before':>8}{'after':>8}{'µs before':>11}{'µs after':>10}"
+    print(header)
+    print("-" * len(header))
+    failures = {"before": 0, "after": 0}
+    for shape, content in REPLIES:
+        row = []
+        timings = []
+        for name, parse in (("before", old_parse), ("after", new_parse)):
+            ok = succeeds(parse, content)
+            failures[name] += not ok
+            row.append("ok" if ok else "FAIL")
+            timings.append(timeit.timeit(lambda: succeeds(parse, content), number=args.repeat) / args.repeat)
+        print(f"{shape:<18}{row[0]:>8}{row[1]:>8}{timings[0] * 1e6:>11.1f}{timings[1] * 1e6:>10.1f}")
+
+    print()
+    for name, count in failures.items():
+        print(f"parse-failure rate {name}: {count}/{len(REPLIES)} ({count / len(REPLIES):.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Response serialization benchmark
+Compares the previous JSON path (model_dump() dicts -> jsonable_encoder -> json.dumps)
+with model_dump_json()/orjson, and reports bytes on the wire with gzip and Brotli.
+
+Usage (from src/backend):
+    python benchmarks/bench_serialization.py [--entries 7 30 365] [--repeat 200]
+"""
+import argparse
+import gzip
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from schemas.user import DailyEntry, UserGoal, UserProfile, UserProgressResponse, Gender, ActivityLevel, GoalType  # noqa: E402
+from services.json_response import FastJSONResponse  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def make_entries(count: int):
+    start = datetime(2024, 1, 1)
+    return [
+        DailyEntry(
+            date=(start + timedelta(days=index)).strftime("%Y-%m-%d"),
+            meals=["breakfast: oatmeal with berries and honey", "lunch: grilled chicken salad", "dinner: salmon, rice and broccoli"],
+            exercises=["30 minutes jogging", "20 push-ups", "15 minutes stretching"],
+            lifestyle={"sleep_hours": 7.5, "screen_time": 5, "stress_level": 4, "water_glasses": 8},
+            created_at=start + timedelta(days=index, hours=20)
+        )
+        for index in range(count)
+    ]
+
+def make_summary():
+    profile = UserProfile(
+        name="Bench User", age=21, gender=Gender.FEMALE, weight=62.0, height=168.0,
+        activity_level=ActivityLevel.MODERATELY_ACTIVE, primary_health_goal="More energy",
+        intellectual_interests=["Science", "Art"], learning_style="visual", time_availability="30 minutes daily"
+    )
+    goal = UserGoal(goal_type=GoalType.GENERAL_HEALTH, goal_description="Balanced meals, regular movement and consistent sleep.")
+    return {
+        "total_entries": 365, "current_streak": 12, "last_entry_date": "2024-12-30",
+        "goal": goal.model_dump(), "profile": profile.model_dump()
+    }
+
+def old_path(user_id, entries, summary) -> bytes:
+    """What /user/{id}/progress did before: dicts, jsonable_encoder, stdlib json"""
+    content = {
+        "user_id": user_id,
+        "recent_entries": [entry.model_dump() for entry in entries],
+        "progress_summary": summary
+    }
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+def new_path(user_id, entries, summary) -> bytes:
+    """What it does now: pydantic-core serializes the response model straight to bytes"""
+    return UserProgressResponse(user_id=user_id, recent_entries=entries, progress_summary=summary).model_dump_json().encode()
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure JSON serialization cost and compressed size")
+    parser.add_argument("--entries", type=int, nargs="+", default=[7, 30, 365], help="History lengths to measure")
+    parser.add_argument("--repeat", type=int, default=200, help="Serializations per measurement")
+    args = parser.parse_args()
+
+    summary = make_summary()
+    header = f"{'entries':>8}{'path':>10}{'µs/resp':>10}{'raw B':>10}{'gzip B':>10}{'br B':>10}"
+    print(header)
+    print("-" * len(header))
+    for count in args.entries:
+        entries = make_entries(count)
+        for name, path in (("before", old_path), ("after", new_path)):
+            body = path("user-1", entries, summary)
+            seconds = timeit.timeit(lambda: path("user-1", entries, summary), number=args.repeat) / args.repeat
+            gzip_size = len(gzip.compress(body, compresslevel=6))
+            brotli_size = len(brotli.compress(body, quality=4)) if brotli else "-"
+            print(f"{count:>8}{name:>10}{seconds * 1e6:>10.0f}{len(body):>10}{gzip_size:>10}{brotli_size:>10}")
+
+    # Plain dict payloads (food/intellectual routes) through the default response class
+    payload = {"success": True, "videos": [{"id": f"v{i}", "title": f"Video {i}", "description": "x" * 200,
+                                            "publishedAt": datetime(2024, 1, 1)} for i in range(40)]}
+    print()
+    for name, render in (
+        ("jsonable_encoder + JSONResponse", lambda: JSONResponse(content=jsonable_encoder(payload)).body),
+        ("FastJSONResponse", lambda: FastJSONResponse(content=payload).body),
+    ):
+        seconds = timeit.timeit(render, number=args.repeat) / args.repeat
+        print(f"{name:<34} dict payload: {seconds * 1e6:.0f} µs")
+
+if __name__ == "__main__":
+    main()
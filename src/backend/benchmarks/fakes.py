@@ -0,0 +1,130 @@
+"""
+Deterministic stand-ins for the external services used by the API.
+install() must run before main.py (or any agent/service module) is imported.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Canned replies keyed by a phrase from each agent's system prompt.
+# More specific phrases come first.
+CANNED_REPLIES = [
+    ("student health and wellness expert", {
+        "goal_type": "general_health", "target_weight": 70, "target_calories_per_day": 2200,
+        "target_protein_per_day": 110, "target_exercise_minutes_per_week": 180, "target_sleep_hours": 8,
+        "target_screen_time_hours": 5, "target_stress_level": 4,
+        "goal_description": "Build steady energy for study with balanced meals, regular movement and consistent sleep."
+    }),
+    ("creative AI", {"nickname": "Focus Phoenix", "avatar": "🔥"}),
+    ("personalized health coach", {
+        "summary": "A balanced day with good nutrition and solid activity.",
+        "recommendations": ["Add a serving of vegetables", "Keep the evening walk", "Wind down earlier"],
+        "goal_progress": "You're on track for this week.",
+        "motivation": "Consistency is paying off - keep going!"
+    }),
+    ("health and wellness expert", {
+        "summary": "A balanced day with good nutrition and solid activity.",
+        "recommendations": ["Add a serving of vegetables", "Keep the evening walk", "Wind down earlier"]
+    }),
+    ("nutrition expert", {"comment": "Good protein at breakfast; add some greens at lunch."}),
+    ("fitness expert", {"note": "Nice mix of cardio and strength - keep it up!"}),
+    ("wellness expert", {"advice": "Aim for a consistent bedtime and short screen breaks."}),
+]
+
+class FakeChatOpenAI(BaseChatModel):
+    """Drop-in for ChatOpenAI that answers instantly (or after a fixed delay) with canned JSON"""
+
+    model_name: str = "fake-gpt-4o-mini"
+    latency_ms: float = 0.0
+
+    def __init__(self, model: str = "fake-gpt-4o-mini", **kwargs: Any):
+        super().__init__(
+            model_name=model,
+            latency_ms=float(os.getenv("BENCH_LLM_LATENCY_MS", "0"))
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-openai"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        system_prompt = str(messages[0].content) if messages else ""
+        reply = next((payload for phrase, payload in CANNED_REPLIES if phrase in system_prompt), {})
+        content = json.dumps(reply)
+
+        prompt_chars = sum(len(str(message.content)) for message in messages)
+        usage = {
+            "input_tokens": prompt_chars // 4,
+            "output_tokens": len(content) // 4,
+            "total_tokens": prompt_chars // 4 + len(content) // 4
+        }
+        message = AIMessage(content=content, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+def _youtube_items(count: int) -> Dict[str, Any]:
+    """Build a YouTube search response with the fields routes/intellectual.py reads"""
+    items = []
+    for index in range(count):
+        items.append({
+            "id": {"videoId": f"bench{index:04d}"},
+            "snippet": {
+                "title": f"Benchmark video {index}",
+                "thumbnails": {"medium": {"url": f"https://img.example/bench{index}.jpg"}},
+                "description": "A deterministic benchmark video description. " * 6,
+                "channelTitle": "Bench Channel",
+                "publishedAt": "2024-01-01T00:00:00Z"
+            }
+        })
+    return {"items": items}
+
+class _YouTubeStubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps(_youtube_items(5)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_youtube_stub() -> ThreadingHTTPServer:
+    """Serve canned YouTube search results on a free local port"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _YouTubeStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def install() -> Dict[str, Any]:
+    """Patch the LLM, MongoDB and YouTube backends before the app is imported"""
+    import langchain_openai
+    langchain_openai.ChatOpenAI = FakeChatOpenAI
+
+    mongodb_url = os.getenv("BENCH_MONGODB_URL")
+    if mongodb_url:
+        # Benchmark against a real local mongod
+        os.environ["MONGODB_URL"] = mongodb_url
+        mongo_backend = mongodb_url
+    else:
+        import mongomock
+        import pymongo
+        pymongo.MongoClient = mongomock.MongoClient
+        os.environ["MONGODB_URL"] = "mongodb://bench-in-memory"
+        mongo_backend = "mongomock (in-memory)"
+
+    youtube_stub = start_youtube_stub()
+    os.environ["YOUTUBE_API_KEY"] = "bench"
+    os.environ["YOUTUBE_BASE_URL"] = f"http://127.0.0.1:{youtube_stub.server_address[1]}/youtube/v3/search"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    return {"mongo": mongo_backend, "youtube_stub": youtube_stub}
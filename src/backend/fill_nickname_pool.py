@@ -0,0 +1,62 @@
+"""
+Fill the nickname pool
+Tops up every nickname pool bucket (goal type x interest cluster) to a target
+number of unclaimed nicknames, so signups draw from the pool instead of
+falling back to the fixed per-goal nicknames.
+
+Usage:
+    python fill_nickname_pool.py [--per-bucket 500] [--bucket weight_loss|stem]
+"""
+import argparse
+import os
+from dotenv import load_dotenv
+from services.llm_scheduler import llm_scheduler, BACKGROUND
+from services.nickname_pool import all_buckets, bucket_key
+from services.sync_mongodb_user_service import SyncMongoDBUserService
+
+load_dotenv()
+
+DEFAULT_PER_BUCKET = int(os.getenv("NICKNAME_POOL_TARGET", "500"))
+
+def fill_pool(per_bucket: int = DEFAULT_PER_BUCKET, only_bucket: str = None):
+    """Generate nicknames until each bucket holds per_bucket unclaimed ones"""
+    print("=" * 60)
+    print("  FILLING NICKNAME POOL")
+    print("=" * 60)
+
+    try:
+        user_service = SyncMongoDBUserService()
+        print("[SUCCESS] Connected to MongoDB")
+    except Exception as e:
+        print(f"[ERROR] Failed to connect to MongoDB: {e}")
+        print("Make sure MONGODB_URL is set in your .env file")
+        return
+
+    pool = user_service.nickname_pool
+    total = 0
+    # Yield to interactive traffic when run against a live deployment's quota
+    with llm_scheduler.priority(BACKGROUND):
+        for goal_type, cluster in all_buckets():
+            bucket = bucket_key(goal_type, cluster)
+            if only_bucket and bucket != only_bucket:
+                continue
+            missing = per_bucket - pool.unclaimed(bucket)
+            if missing <= 0:
+                print(f"[SKIP] {bucket} already has {per_bucket} nicknames")
+                continue
+            added = pool.refill(bucket, user_service.personalization_generator, missing)
+            total += added
+            level = "[PROGRESS]" if added >= missing else "[WARNING]"
+            print(f"{level} {bucket}: added {added} of {missing} nicknames")
+
+    print("\n" + "=" * 60)
+    print("  FILL COMPLETE")
+    print("=" * 60)
+    print(f"Added: {total} nicknames")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-generate signup nicknames and avatars")
+    parser.add_argument("--per-bucket", type=int, default=DEFAULT_PER_BUCKET, help="Unclaimed nicknames to keep per bucket")
+    parser.add_argument("--bucket", default=None, help="Only fill this bucket (goal_type|cluster)")
+    args = parser.parse_args()
+    fill_pool(args.per_bucket, args.bucket)
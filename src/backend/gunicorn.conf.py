@@ -0,0 +1,104 @@
+"""
+Gunicorn configuration for production (Railway)
+Runs the FastAPI app in several uvicorn worker processes:
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Environment:
+    PORT                      port to bind (default 8000)
+    WEB_CONCURRENCY           worker count (default: 2 x CPU quota + 1)
+    GUNICORN_PRELOAD          import the app once in the master before forking (default true)
+    GUNICORN_MAX_REQUESTS     recycle a worker after this many requests (default 1000, 0 disables)
+    GUNICORN_TIMEOUT          seconds a silent worker is allowed before it is killed (default 120)
+    GUNICORN_GRACEFUL_TIMEOUT seconds to drain in-flight requests on shutdown/restart (default 30)
+    METRICS_MULTIPROC_DIR     where workers share their metrics for /metrics (default <worker tmp dir>/mindscroll-metrics)
+"""
+import math
+import os
+import tempfile
+
+def cpu_quota() -> int:
+    """CPUs this container may actually use (cgroup quota, then affinity, then core count)"""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if quota > 0 and period > 0:
+                return max(1, math.ceil(quota / period))
+        except (OSError, ValueError):
+            pass
+
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", 2 * cpu_quota() + 1))
+
+# Import main.py (agents, food database, scoring tables) once and share it copy-on-write
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# Recycle workers periodically; jitter keeps them from restarting all at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max(1, max_requests // 10) if max_requests else 0
+
+# LLM-backed endpoints can take a while; give them time before the arbiter kills a worker
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Heartbeat files on tmpfs so a slow disk never looks like a hung worker
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# Each worker keeps its own metrics; they meet in this directory so any worker's /metrics covers all of them.
+# Set before the app is imported, since services.metrics_service reads it at import time.
+if workers > 1:
+    os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(worker_tmp_dir or tempfile.gettempdir(), "mindscroll-metrics"))
+
+# Logs go through services.logging_service; uvicorn.access is already routed there
+accesslog = None
+errorlog = "-"
+
+def on_starting(server):
+    """Refuse worker setups that would sign session tokens with a different random key in each worker"""
+    if server.cfg.workers > 1 and not server.cfg.preload_app and not os.getenv("SESSION_SECRET"):
+        raise RuntimeError("Set SESSION_SECRET (or GUNICORN_PRELOAD=true) to run several workers")
+
+    from services.metrics_service import metrics_service
+    metrics_service.reset_multiproc_dir()
+
+def post_fork(server, worker):
+    """Give each worker its own log listener thread, MongoDB connection pool and share of the LLM quota"""
+    from services.logging_service import logging_service
+    logging_service.setup()
+
+    from services.llm_scheduler import llm_scheduler
+    llm_scheduler.configure_share(server.cfg.workers)
+
+    from services.metrics_service import metrics_service
+    metrics_service.start_flusher()
+
+    if preload_app:
+        import main
+        main.user_service.reconnect()
+
+def child_exit(server, worker):
+    """Keep a recycled worker's counters in /metrics so totals never go backwards"""
+    from services.metrics_service import metrics_service
+    metrics_service.mark_process_dead(worker.pid)
+
+def worker_int(worker):
+    worker.log.info("Worker %s interrupted, draining in-flight requests", worker.pid)
+
+def on_exit(server):
+    server.log.info("Mindscroll backend stopped")
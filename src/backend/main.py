@@ -1,36 +1,152 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Query, Header
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+from datetime import date
+import hashlib
 import json
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+from services.logging_service import logging_service
+logging_service.setup()
+logger = logging.getLogger("mindscroll")
+
 # Validate required environment variables
 required_env_vars = ["OPENAI_API_KEY"]
 missing_vars = [var for var in required_env_vars if not os.getenv(var)]
 
 if missing_vars:
-    print(f"[WARNING] Missing environment variables: {missing_vars}")
-    print("   Some features may not work properly on Railway")
-    print("   Set these in Railway Dashboard > Variables tab")
+    logger.warning("Missing environment variables: %s - some features may not work; set them in Railway Dashboard > Variables", missing_vars)
 from agents.orchestrator import Orchestrator
 from agents.enhanced_orchestrator import EnhancedOrchestrator
 from services.sync_mongodb_user_service import SyncMongoDBUserService
-from schemas.user import UserCredentials, UserProfile, Gender, ActivityLevel
+from schemas.user import User, UserCredentials, UserProfile, UserGoal, UserProgressResponse, Gender, ActivityLevel
+from services.profile_diff_service import profile_diff_service
+from services.metrics_service import metrics_service
+from services.json_response import FastJSONResponse, model_response
+from services.request_coalescer import request_coalescer
+from services.llm_scheduler import llm_scheduler, BACKGROUND
+from services.circuit_breaker import circuit_breakers
+from services.token_budget import token_budget, RequestUsage
+from services.session_tokens import session_tokens, InvalidSessionToken, SESSION_REQUIRED
+from services.password_hasher import password_hasher
 from routes.intellectual import router as intellectual_router
 from routes.food import router as food_router
 # Using MongoDB Atlas for data storage
 
-app = FastAPI(title="Mindscroll AI Health Pipeline", version="1.0.0")
+app = FastAPI(title="Mindscroll AI Health Pipeline", version="1.0.0", default_response_class=FastJSONResponse)
+
+# Compress responses above the threshold, Brotli when the client accepts it and brotli-asgi
+# is installed. Added first so it sits inside the @app.middleware wrappers and sees whole
+# bodies; behind them every response arrives re-streamed and the size check never applies.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, quality=4, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=6)
 
 # Health check endpoint for Railway
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "Mindscroll Backend"}
+    # Open LLM circuits degrade answers to local fallbacks but the service stays up
+    circuits = circuit_breakers.snapshot()
+    degraded = any(circuit["state"] != "closed" for circuit in circuits.values())
+    return {"status": "degraded" if degraded else "healthy", "service": "Mindscroll Backend", "llm_circuits": circuits}
+
+# Prometheus scrape endpoint
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(metrics_service.render(), media_type="text/plain; version=0.0.4")
+
+# Total the LLM tokens each request spends; handlers name the user it is charged to
+@app.middleware("http")
+async def record_llm_usage(request: Request, call_next):
+    with token_budget.track() as usage:
+        response = await call_next(request)
+    if usage.calls:
+        route = request.scope.get("route")
+        await run_in_threadpool(_save_llm_usage, usage, route.path if route is not None else "unmatched")
+    return response
+
+def _save_llm_usage(usage: RequestUsage, route: str):
+    """Publish one request's LLM usage and add it to the user's daily total"""
+    token_budget.report(usage, route)
+    if usage.user_id:
+        try:
+            user_service.record_llm_usage(usage.user_id, usage.prompt_tokens, usage.completion_tokens, usage.calls)
+        except Exception as e:
+            logger.warning("Failed to record LLM usage: %s", e, extra={"user_id": usage.user_id})
+
+# Verify the session token once per request; user endpoints check it with _session_for()
+@app.middleware("http")
+async def authenticate_session(request: Request, call_next):
+    request.state.session = None
+    request.state.session_error = None
+    try:
+        request.state.session = session_tokens.authenticate(request.headers.get("authorization"))
+    except InvalidSessionToken as e:
+        request.state.session_error = str(e)
+    return await call_next(request)
+
+def _session_for(request: Request, user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Claims of the request's session token, which must belong to user_id. None when no valid token
+    was sent and SESSION_REQUIRED is off: the caller then has to confirm the user exists itself
+    """
+    session = request.state.session
+    if session is None:
+        if not SESSION_REQUIRED:
+            # Until tokens are required, an expired or invalid one counts as no token at all
+            return None
+        if request.state.session_error:
+            raise HTTPException(status_code=401, detail=f"Invalid session token: {request.state.session_error}")
+        raise HTTPException(status_code=401, detail="Session token required")
+    if session["sub"] != user_id:
+        raise HTTPException(status_code=403, detail="Session token belongs to another user")
+    return session
+
+def _session_response(user: User) -> Dict[str, Any]:
+    return {
+        "session_token": session_tokens.issue(user),
+        "token_type": "bearer",
+        "expires_in": session_tokens.ttl_seconds
+    }
+
+# Tag every log line of a request with one id (taken from X-Request-ID when the caller sends it)
+@app.middleware("http")
+async def bind_request_id(request: Request, call_next):
+    request_id = logging_service.begin_request(request.headers.get("x-request-id"))
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+# Record request latency per route template (not per raw path, to keep label cardinality bounded)
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    if not metrics_service.enabled:
+        return await call_next(request)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        metrics_service.http_request_seconds.observe(
+            time.perf_counter() - started, request.method, route_path, str(status)
+        )
 
 # Add CORS middleware
 app.add_middleware(
@@ -52,7 +168,7 @@ user_service = SyncMongoDBUserService()
 orchestrator = Orchestrator()
 enhanced_orchestrator = EnhancedOrchestrator()
 
-print("[SUCCESS] Connected to MongoDB Atlas - All data will be stored in the cloud!")
+logger.info("Connected to MongoDB Atlas - all data will be stored in the cloud")
 
 # Pydantic models for request/response
 class UserData(BaseModel):
@@ -131,23 +247,25 @@ async def generate_summary_from_user_data(user_data: UserData):
         return summary
         
     except Exception as e:
-        print(f"Error generating summary: {str(e)}")
+        logger.exception("Error generating summary")
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
 
 # User Management Endpoints
 @app.post("/auth/signup")
-async def signup(request: SignupRequest):
+async def signup(request: SignupRequest, background_tasks: BackgroundTasks):
     """
     Create a new user account with AI-generated goal
     """
     try:
         # Check if user already exists
-        existing_user = user_service.get_user_by_email(request.email)
+        existing_user = await run_in_threadpool(user_service.get_user_by_email, request.email, include_entries=False)
         if existing_user:
             raise HTTPException(status_code=400, detail="User already exists")
         
         # Create credentials and profile
-        credentials = UserCredentials(email=request.email, password=request.password)
+        # Hashed in the password pool, off the event loop
+        password_hash = await password_hasher.run(password_hasher.hash, request.password)
+        credentials = UserCredentials(email=request.email, password=password_hash)
         profile = UserProfile(
             name=request.name,
             age=request.age,
@@ -169,18 +287,28 @@ async def signup(request: SignupRequest):
             time_availability=request.time_availability
         )
         
-        # Create user with AI-generated goal
-        user = user_service.create_user(credentials, profile)
+        # Create user with AI-generated goal; the LLM call waits for a scheduler slot, so keep it off the event loop
+        user = await run_in_threadpool(user_service.create_user, credentials, profile)
+        token_budget.attribute(user.id)
         
-        # Generate nickname and avatar
-        from agents.personalization_generator import PersonalizationGenerator
-        personalization_gen = PersonalizationGenerator()
-        nickname, avatar = personalization_gen.generate_nickname_and_avatar(user.profile, user.goal)
+        # Draw a pre-generated nickname and avatar; the pool bucket is topped up off the request path
+        nickname, avatar = await run_in_threadpool(
+            user_service.personalization_generator.pick_nickname_and_avatar, user.profile, user.goal, user.id
+        )
+        nickname_bucket = user_service.nickname_pool.bucket_for(user.profile, user.goal)
+        if await run_in_threadpool(user_service.nickname_pool.start_refill, nickname_bucket):
+            background_tasks.add_task(refill_nickname_pool, nickname_bucket)
         
         # Update user profile with nickname and avatar
         user.profile.nickname = nickname
         user.profile.avatar = avatar
-        user_service.save_user(user)
+        await run_in_threadpool(user_service.save_user, user)
+        
+        # A goal served from a profile template gets its description written off the request path
+        if not user.goal.ai_generated:
+            background_tasks.add_task(
+                personalize_user_goal, user.id, user.profile.model_copy(deep=True), user.goal.model_copy(deep=True)
+            )
         
         return {
             "user_id": user.id,
@@ -188,6 +316,7 @@ async def signup(request: SignupRequest):
             "nickname": user.profile.nickname,
             "avatar": user.profile.avatar,
             "goal": user.goal.model_dump(),
+            **_session_response(user),
             "message": "Account created successfully with personalized goal!"
         }
         
@@ -202,9 +331,15 @@ async def login(request: LoginRequest):
     Authenticate user and return user data
     """
     try:
-        user = user_service.authenticate_user(request.email, request.password)
-        if not user:
+        user = await run_in_threadpool(user_service.get_user_by_email, request.email, include_entries=False)
+        stored = user.credentials.password if user else None
+        # Only the CPU-bound hashing runs in the bounded password pool; database calls stay in the threadpool
+        if not await password_hasher.run(password_hasher.verify, stored, request.password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
+        if password_hasher.needs_rehash(stored):
+            # Plaintext or outdated hash: replace it now that the password is known
+            password_hash = await password_hasher.run(password_hasher.hash, request.password)
+            await run_in_threadpool(user_service.update_password_hash, user.id, stored, password_hash)
         
         return {
             "user_id": user.id,
@@ -220,7 +355,8 @@ async def login(request: LoginRequest):
             "medical_conditions": user.profile.medical_conditions,
             "dietary_restrictions": user.profile.dietary_restrictions,
             "goal": user.goal.model_dump(),
-            "progress": user_service.get_user_progress_summary(user.id)
+            "progress": user_service.get_user_progress_summary(user.id),
+            **_session_response(user)
         }
         
     except HTTPException:
@@ -228,21 +364,40 @@ async def login(request: LoginRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Login failed: {str(e)}")
 
+@app.post("/auth/refresh")
+async def refresh_session(http_request: Request):
+    """
+    Reissue a valid session token with a new expiry, along with the user's current goal
+    """
+    session = http_request.state.session
+    if session is None:
+        raise HTTPException(status_code=401, detail=f"Invalid session token: {http_request.state.session_error or 'missing'}")
+    user = await run_in_threadpool(user_service.get_user_by_id, session["sub"], include_entries=False)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"user_id": user.id, "goal": user.goal.model_dump(), **_session_response(user)}
+
 @app.get("/user/{user_id}")
-async def get_user(user_id: str):
+async def get_user(user_id: str, http_request: Request):
     """
     Get user profile and progress
     """
     try:
-        user = user_service.get_user_by_id(user_id)
-        if not user:
+        if _session_for(http_request, user_id) is None:
+            user = user_service.get_user_by_id(user_id, include_entries=False)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+        
+        # The progress summary is read anyway and holds the profile and goal
+        progress = user_service.get_user_progress_summary(user_id)
+        if not progress:
             raise HTTPException(status_code=404, detail="User not found")
         
         return {
-            "user_id": user.id,
-            "name": user.profile.name,
-            "goal": user.goal.model_dump(),
-            "progress": user_service.get_user_progress_summary(user.id)
+            "user_id": user_id,
+            "name": progress["profile"]["name"],
+            "goal": progress["goal"],
+            "progress": progress
         }
         
     except HTTPException:
@@ -250,12 +405,41 @@ async def get_user(user_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get user: {str(e)}")
 
+async def _run_once(route: str, request: DailyEntryRequest, idempotency_key: Optional[str], work: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run a write once per request: replay the stored response for a retried Idempotency-Key
+    and let concurrent identical requests share one computation and one write
+    """
+    fingerprint = hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+    stored_key = f"{route}:{request.user_id}:{idempotency_key}" if idempotency_key else None
+    if stored_key:
+        stored = user_service.get_idempotent_response(stored_key)
+        if stored:
+            if stored["fingerprint"] != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            metrics_service.idempotent_requests.inc(1, route, "replayed")
+            return stored["response"]
+    
+    async def execute():
+        # Blocking work runs off the event loop, so identical requests arriving meanwhile can join it
+        response = await work()
+        if stored_key:
+            user_service.save_idempotent_response(stored_key, fingerprint, response)
+        return response
+    
+    inflight_key = f"{route}:{fingerprint}"
+    metrics_service.idempotent_requests.inc(1, route, "coalesced" if request_coalescer.is_inflight(inflight_key) else "executed")
+    return await request_coalescer.run(inflight_key, execute)
+
 @app.post("/daily-entry")
-async def add_daily_entry(request: DailyEntryRequest):
+async def add_daily_entry(request: DailyEntryRequest, http_request: Request,
+                          idempotency_key: Optional[str] = Header(None, max_length=255)):
     """
-    Add a daily entry for a user
+    Add or replace today's entry for a user
     """
-    try:
+    _session_for(http_request, request.user_id)
+    
+    def work():
         success = user_service.add_daily_entry(
             request.user_id,
             request.meals,
@@ -267,6 +451,9 @@ async def add_daily_entry(request: DailyEntryRequest):
             raise HTTPException(status_code=404, detail="User not found")
         
         return {"message": "Daily entry added successfully"}
+    
+    try:
+        return await _run_once("daily-entry", request, idempotency_key, lambda: run_in_threadpool(work))
         
     except HTTPException:
         raise
@@ -274,134 +461,291 @@ async def add_daily_entry(request: DailyEntryRequest):
         raise HTTPException(status_code=500, detail=f"Failed to add daily entry: {str(e)}")
 
 @app.post("/generate-personalized-summary")
-async def generate_personalized_summary(request: DailyEntryRequest):
+async def generate_personalized_summary(request: DailyEntryRequest, background_tasks: BackgroundTasks, http_request: Request,
+                                        idempotency_key: Optional[str] = Header(None, max_length=255)):
     """
     Generate personalized daily summary for a user
     """
     try:
-        print(f"[DEBUG] Received request for user_id: {request.user_id}")
+        _session_for(http_request, request.user_id)
+        logger.debug("Received summary request", extra={"user_id": request.user_id})
+        return await _run_once(
+            "generate-personalized-summary", request, idempotency_key,
+            lambda: _personalized_summary(request, background_tasks)
+        )
         
-        # Get user
-        user = user_service.get_user_by_id(request.user_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Exception in generate_personalized_summary", extra={"user_id": request.user_id})
+        raise HTTPException(status_code=500, detail=f"Failed to generate personalized summary: {str(e)}")
+
+async def _personalized_summary(request: DailyEntryRequest, background_tasks: BackgroundTasks) -> Dict[str, Any]:
+    """Upsert today's entry, then serve its stored summary or compute and store a new one"""
+    token_budget.attribute(request.user_id)
+    # Get user
+    user = await run_in_threadpool(user_service.get_user_by_id, request.user_id, include_entries=False)
+    if not user:
+        logger.info("User not found", extra={"user_id": request.user_id})
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # Add daily entry (skip if it fails)
+    try:
+        await run_in_threadpool(
+            user_service.add_daily_entry,
+            request.user_id,
+            request.meals,
+            request.exercises,
+            request.lifestyle
+        )
+        logger.debug("Daily entry added")
+    except Exception as entry_error:
+        logger.warning("Failed to add daily entry: %s", entry_error, extra={"user_id": request.user_id})
+        # Continue anyway - we can still generate summary
+    
+    # Generate personalized summary
+    user_data = {
+        "meals": request.meals,
+        "exercises": request.exercises,
+        "lifestyle": request.lifestyle
+    }
+    
+    entry_date = date.today().isoformat()
+    stamp = enhanced_orchestrator.analysis_stamp(user, user_data)
+    
+    # The same inputs were already analysed today by the current prompts: serve that
+    try:
+        stored = await run_in_threadpool(user_service.get_entry_analysis, request.user_id, entry_date, user_data)
+    except Exception as stored_error:
+        logger.warning("Failed to load stored summary: %s", stored_error, extra={"user_id": request.user_id})
+        stored = None
+    
+    if stored and enhanced_orchestrator.is_current(stored.get("analysis"), stamp):
+        metrics_service.summary_store.inc(1, "hit")
+        return stored["analysis"]["summary"]
+    
+    metrics_service.summary_store.inc(1, "miss")
+    summary = await _compute_summary(user, user_data, entry_date)
+    background_tasks.add_task(user_service.save_entry_analysis, request.user_id, entry_date, user_data, summary, stamp)
+    return summary
+
+async def _compute_summary(user: User, user_data: Dict[str, Any], entry_date: str) -> Dict[str, Any]:
+    """Run the agents (concurrently, with hedged LLM calls when enabled) and the orchestrator for one day's inputs"""
+    # Rolling 7/30-day windows come precomputed from the rollup store
+    try:
+        history = await run_in_threadpool(user_service.get_rolling_windows, user.id, entry_date)
+    except Exception as history_error:
+        logger.warning("Failed to load rolling windows: %s", history_error, extra={"user_id": user.id})
+        history = None
+    
+    logger.debug("Calling enhanced orchestrator")
+    summary = await enhanced_orchestrator.generate_personalized_summary_async(user, user_data, history)
+    logger.debug("Summary generated")
+    return summary
+
+@app.get("/user/{user_id}/summary")
+async def get_daily_summary(
+    user_id: str,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    entry_date: Optional[date] = Query(None, alias="date", description="Day to summarize (YYYY-MM-DD), default today")
+):
+    """
+    Stored summary for the latest entry of a day; recomputed only when its inputs, the user's
+    profile/goal, or the prompt/model version changed since it was stored
+    """
+    try:
+        _session_for(http_request, user_id)
+        token_budget.attribute(user_id)
+        user = user_service.get_user_by_id(user_id, include_entries=False)
         if not user:
-            print(f"[ERROR] User not found: {request.user_id}")
             raise HTTPException(status_code=404, detail="User not found")
         
-        print(f"[DEBUG] User found: {user.profile.name}")
-        
-        # Add daily entry (skip if it fails)
-        try:
-            user_service.add_daily_entry(
-                request.user_id,
-                request.meals,
-                request.exercises,
-                request.lifestyle
-            )
-            print("[DEBUG] Daily entry added successfully")
-        except Exception as entry_error:
-            print(f"[WARNING] Failed to add daily entry: {entry_error}")
-            # Continue anyway - we can still generate summary
-        
-        # Generate personalized summary
-        user_data = {
-            "meals": request.meals,
-            "exercises": request.exercises,
-            "lifestyle": request.lifestyle
-        }
+        day = (entry_date or date.today()).isoformat()
+        stored = user_service.get_entry_analysis(user_id, day)
+        if not stored:
+            raise HTTPException(status_code=404, detail="No entry for this date")
         
-        print("[DEBUG] Calling enhanced orchestrator...")
-        summary = enhanced_orchestrator.generate_personalized_summary(user, user_data)
-        print("[DEBUG] Summary generated successfully")
+        user_data = {field: stored.get(field) for field in ("meals", "exercises", "lifestyle")}
+        stamp = enhanced_orchestrator.analysis_stamp(user, user_data)
+        if enhanced_orchestrator.is_current(stored.get("analysis"), stamp):
+            metrics_service.summary_store.inc(1, "hit")
+            return stored["analysis"]["summary"]
         
+        metrics_service.summary_store.inc(1, "stale" if stored.get("analysis") else "miss")
+        summary = await _compute_summary(user, user_data, day)
+        background_tasks.add_task(user_service.save_entry_analysis, user_id, day, user_data, summary, stamp, stored["entry_id"])
         return summary
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"[ERROR] Exception in generate_personalized_summary: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Failed to generate personalized summary: {str(e)}")
+        logger.exception("Exception in get_daily_summary", extra={"user_id": user_id})
+        raise HTTPException(status_code=500, detail=f"Failed to get summary: {str(e)}")
 
 @app.get("/user/{user_id}/progress")
-async def get_user_progress(user_id: str, days: int = 7):
+async def get_user_progress(user_id: str, http_request: Request, days: int = 7):
     """
     Get user's progress history
     """
     try:
-        user = user_service.get_user_by_id(user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+        # A session token for this user already proves it exists
+        if _session_for(http_request, user_id) is None:
+            user = user_service.get_user_by_id(user_id, include_entries=False)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
         
         recent_entries = user_service.get_recent_entries(user_id, days)
         
-        return {
-            "user_id": user_id,
-            "recent_entries": [entry.model_dump() for entry in recent_entries],
-            "progress_summary": user_service.get_user_progress_summary(user_id)
-        }
+        # Serialized by pydantic-core straight to bytes, no per-entry dicts
+        return model_response(UserProgressResponse(
+            user_id=user_id,
+            recent_entries=recent_entries,
+            progress_summary=user_service.get_user_progress_summary(user_id)
+        ))
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get progress: {str(e)}")
 
+@app.get("/user/{user_id}/history")
+async def get_user_history(
+    user_id: str,
+    http_request: Request,
+    from_date: Optional[date] = Query(None, alias="from", description="First day to include (YYYY-MM-DD)"),
+    to_date: Optional[date] = Query(None, alias="to", description="Last day to include (YYYY-MM-DD)"),
+    limit: int = Query(30, ge=1, le=366),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of meals,exercises,lifestyle,created_at")
+):
+    """
+    Page through a user's entries, newest first, optionally within a date range
+    """
+    try:
+        # A session token for this user already proves it exists
+        if _session_for(http_request, user_id) is None:
+            user = user_service.get_user_by_id(user_id, include_entries=False)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+        
+        page = user_service.get_entries_page(
+            user_id,
+            start_date=from_date.isoformat() if from_date else None,
+            end_date=to_date.isoformat() if to_date else None,
+            limit=limit,
+            cursor=cursor,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        )
+        return {"user_id": user_id, **page}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get history: {str(e)}")
+
+@app.get("/user/{user_id}/aggregates")
+async def get_user_aggregates(
+    user_id: str,
+    http_request: Request,
+    period: str = Query("week", pattern="^(day|week|month)$"),
+    from_date: Optional[date] = Query(None, alias="from", description="First day to include (YYYY-MM-DD)"),
+    to_date: Optional[date] = Query(None, alias="to", description="Last day to include (YYYY-MM-DD)")
+):
+    """
+    Daily, weekly or monthly trend rollups: entry/meal/exercise counts, lifestyle and score averages
+    """
+    try:
+        # A session token for this user already proves it exists
+        if _session_for(http_request, user_id) is None:
+            user = user_service.get_user_by_id(user_id, include_entries=False)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+        
+        buckets = user_service.get_aggregates(
+            user_id,
+            period=period,
+            start_date=from_date.isoformat() if from_date else None,
+            end_date=to_date.isoformat() if to_date else None
+        )
+        return {"user_id": user_id, "period": period, "buckets": buckets}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get aggregates: {str(e)}")
+
+def regenerate_user_goal(user_id: str, profile: UserProfile):
+    """Regenerate the AI goal in the background and store it with a partial update"""
+    try:
+        # Queued behind interactive summaries when the provider quota is tight
+        with llm_scheduler.priority(BACKGROUND), token_budget.track(user_id) as usage:
+            new_goal = user_service.goal_generator.generate_goal(profile)
+            if not new_goal.ai_generated:
+                # Already off the request path, so the template goal is personalised before it is stored
+                description = user_service.goal_generator.personalize_description(profile, new_goal)
+                if description:
+                    new_goal.goal_description = description
+                    new_goal.ai_generated = True
+        _save_llm_usage(usage, "background:regenerate-goal")
+        user_service.update_user_goal(user_id, new_goal)
+    except Exception as e:
+        logger.exception("Background goal regeneration failed", extra={"user_id": user_id})
+
+def refill_nickname_pool(bucket: str):
+    """Top up a nickname pool bucket that is running low"""
+    try:
+        with llm_scheduler.priority(BACKGROUND), token_budget.track() as usage:
+            user_service.nickname_pool.refill(bucket, user_service.personalization_generator)
+        _save_llm_usage(usage, "background:refill-nicknames")
+    except Exception as e:
+        logger.exception("Nickname pool refill failed", extra={"bucket": bucket})
+
+def personalize_user_goal(user_id: str, profile: UserProfile, goal: UserGoal):
+    """Write the description of a goal served from a profile template"""
+    try:
+        with llm_scheduler.priority(BACKGROUND), token_budget.track(user_id) as usage:
+            description = user_service.goal_generator.personalize_description(profile, goal)
+        _save_llm_usage(usage, "background:personalize-goal")
+        if description and not user_service.update_goal_description(user_id, goal.goal_description, description):
+            logger.info("Goal changed before its description was personalised", extra={"user_id": user_id})
+    except Exception as e:
+        logger.exception("Background goal personalisation failed", extra={"user_id": user_id})
+
 @app.put("/user/profile")
-async def update_user_profile(request: ProfileUpdateRequest):
-    """Update user profile and regenerate AI goal"""
+async def update_user_profile(request: ProfileUpdateRequest, background_tasks: BackgroundTasks, http_request: Request):
+    """Update user profile and regenerate AI goal when goal-relevant fields change"""
     try:
+        _session_for(http_request, request.user_id)
         # Get current user
-        user = user_service.get_user_by_id(request.user_id)
+        user = user_service.get_user_by_id(request.user_id, include_entries=False)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Update profile with new data (only non-None values)
-        update_data = {}
-        if request.name is not None:
-            update_data["name"] = request.name
-        if request.age is not None:
-            update_data["age"] = request.age
-        if request.gender is not None:
-            update_data["gender"] = request.gender
-        if request.weight is not None:
-            update_data["weight"] = request.weight
-        if request.height is not None:
-            update_data["height"] = request.height
-        if request.activity_level is not None:
-            update_data["activity_level"] = request.activity_level
-        if request.primary_health_goal is not None:
-            update_data["primary_health_goal"] = request.primary_health_goal
-        if request.motivation is not None:
-            update_data["motivation"] = request.motivation
-        if request.lifestyle_vision is not None:
-            update_data["lifestyle_vision"] = request.lifestyle_vision
-        if request.intellectual_interests is not None:
-            update_data["intellectual_interests"] = request.intellectual_interests
-        if request.learning_style is not None:
-            update_data["learning_style"] = request.learning_style
-        if request.time_availability is not None:
-            update_data["time_availability"] = request.time_availability
-        if request.nickname is not None:
-            update_data["nickname"] = request.nickname
-        if request.avatar is not None:
-            update_data["avatar"] = request.avatar
-        
-        # Update user profile
-        updated_user = user_service.update_user_profile(request.user_id, update_data)
-        if not updated_user:
-            raise HTTPException(status_code=404, detail="User not found")
+        # Only keep fields whose values actually changed
+        update_data = request.model_dump(exclude={"user_id"}, exclude_none=True)
+        changes = profile_diff_service.diff(user.profile, update_data)
         
-        # Regenerate AI goal based on updated profile
-        from agents.goal_generator import GoalGenerator
-        goal_generator = GoalGenerator()
-        new_goal = goal_generator.generate_goal(updated_user.profile)
+        updated_user = user
+        if changes:
+            updated_user = user_service.update_user_profile(request.user_id, changes)
+            if not updated_user:
+                raise HTTPException(status_code=404, detail="User not found")
         
-        # Update user's goal
-        updated_user.goal = new_goal
-        user_service.save_user(updated_user)
+        # Regenerate AI goal off the request path, only if the goal depends on a changed field
+        goal_regenerating = profile_diff_service.affects_goal(changes)
+        if goal_regenerating:
+            background_tasks.add_task(regenerate_user_goal, updated_user.id, updated_user.profile.model_copy(deep=True))
         
         return {
-            "message": "Profile updated successfully with new AI-generated goal!",
+            "message": (
+                "Profile updated successfully! Your AI goal is being regenerated."
+                if goal_regenerating else "Profile updated successfully!"
+            ),
+            "goal_regenerating": goal_regenerating,
+            "updated_fields": list(changes.keys()),
             "user": {
                 "user_id": updated_user.id,
                 "name": updated_user.profile.name,
@@ -1,44 +1,179 @@
 """
 Migrate existing JSON data to MongoDB Atlas
 Run this script to transfer all user data from local files to the cloud database
+
+Users are streamed from users.json, checked against MongoDB one batch at a time
+and written with unordered bulk inserts. Progress is checkpointed after every
+batch so an interrupted migration resumes where it stopped.
+
+Usage:
+    python migrate_to_mongodb.py [--batch-size 500] [--file data/users.json] [--restart]
 """
+import argparse
 import json
 import os
+import time
+from typing import Iterator, Tuple, Dict, Any, List
 from dotenv import load_dotenv
+from pymongo.errors import BulkWriteError
 from services.sync_mongodb_user_service import SyncMongoDBUserService
 
 load_dotenv()
 
-def migrate_users():
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+DEFAULT_JSON_FILE = os.path.join(DATA_DIR, "users.json")
+DEFAULT_CHECKPOINT_FILE = os.path.join(DATA_DIR, ".migration_checkpoint.json")
+DEFAULT_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "500"))
+READ_CHUNK_SIZE = 64 * 1024
+
+def iter_json_object(json_file: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Tuple[str, Any]]:
+    """Yield (key, value) pairs of a top-level JSON object without loading the whole file"""
+    decoder = json.JSONDecoder()
+
+    with open(json_file, 'r') as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            # Drop the consumed prefix so memory stays bounded by one record
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+
+        def next_char() -> str:
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not fill():
+                    return ""
+
+        def decode() -> Any:
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    # A value ending exactly at the buffer edge may be truncated
+                    if end < len(buffer) or eof:
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+        first = next_char()
+        if first == "":
+            return
+        if first != "{":
+            raise ValueError("users.json must contain a JSON object keyed by user id")
+        pos += 1
+
+        while True:
+            char = next_char()
+            if char == "}":
+                return
+            if char == ",":
+                pos += 1
+                continue
+
+            key = decode()
+            if next_char() != ":":
+                raise ValueError(f"Malformed users.json near key {key!r}")
+            pos += 1
+            next_char()
+            yield key, decode()
+
+def load_checkpoint(checkpoint_file: str, json_file: str) -> Dict[str, Any]:
+    """Load migration progress for this source file, or start from scratch"""
+    empty = {"source": os.path.abspath(json_file), "processed": 0, "migrated": 0, "skipped": 0, "errors": 0}
+    if not os.path.exists(checkpoint_file):
+        return empty
+
+    try:
+        with open(checkpoint_file, 'r') as f:
+            checkpoint = json.load(f)
+    except Exception as e:
+        print(f"[WARNING] Ignoring unreadable checkpoint: {e}")
+        return empty
+
+    if checkpoint.get("source") != empty["source"]:
+        print("[INFO] Checkpoint belongs to a different file, starting from scratch")
+        return empty
+    return checkpoint
+
+def save_checkpoint(checkpoint_file: str, checkpoint: Dict[str, Any]):
+    """Atomically persist migration progress"""
+    tmp_file = f"{checkpoint_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_file, checkpoint_file)
+
+def migrate_batch(users_collection, batch: List[Tuple[str, Dict[str, Any]]]) -> Tuple[int, int, int]:
+    """Insert one batch of users, skipping emails already in MongoDB. Returns (migrated, skipped, errors)"""
+    emails = [
+        user_data.get('credentials', {}).get('email')
+        for _, user_data in batch
+    ]
+    existing_emails = {
+        doc['credentials']['email']
+        for doc in users_collection.find(
+            {"credentials.email": {"$in": [email for email in emails if email]}},
+            {"credentials.email": 1}
+        )
+    }
+
+    documents = []
+    skipped_count = 0
+    for (user_id, user_data), email in zip(batch, emails):
+        if email and email in existing_emails:
+            print(f"[SKIP] User {email} already exists in MongoDB")
+            skipped_count += 1
+            continue
+        if email:
+            # Guard against the same email appearing twice in one batch
+            existing_emails.add(email)
+
+        document = dict(user_data)
+        document.setdefault('id', user_id)
+        document.setdefault('user_id', document['id'])
+        document.setdefault('version', 0)
+        documents.append(document)
+
+    if not documents:
+        return 0, skipped_count, 0
+
+    try:
+        result = users_collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids), skipped_count, 0
+    except BulkWriteError as e:
+        write_errors = e.details.get('writeErrors', [])
+        for error in write_errors:
+            print(f"[ERROR] Failed to migrate user at batch index {error.get('index')}: {error.get('errmsg')}")
+        return e.details.get('nInserted', 0), skipped_count, len(write_errors)
+
+def migrate_users(json_file: str = DEFAULT_JSON_FILE, batch_size: int = DEFAULT_BATCH_SIZE,
+                  checkpoint_file: str = DEFAULT_CHECKPOINT_FILE, restart: bool = False):
     """Migrate users from JSON file to MongoDB"""
     print("=" * 60)
     print("  MIGRATING DATA TO MONGODB ATLAS")
     print("=" * 60)
-    
-    # Path to JSON file
-    json_file = os.path.join(os.path.dirname(__file__), "data", "users.json")
-    
-    if not os.path.exists(json_file):
-        print(f"\n[INFO] No users.json file found at: {json_file}")
+
+    if not os.path.exists(json_file) or os.path.getsize(json_file) == 0:
+        print(f"\n[INFO] No users found at: {json_file}")
         print("Starting fresh with MongoDB Atlas!")
         return
-    
-    print(f"\n[INFO] Found users.json file")
-    
-    # Load JSON data
-    try:
-        with open(json_file, 'r') as f:
-            users_data = json.load(f)
-        
-        print(f"[INFO] Loaded {len(users_data)} users from JSON")
-    except Exception as e:
-        print(f"[ERROR] Failed to read JSON file: {e}")
-        return
-    
-    if not users_data:
-        print("[INFO] No users to migrate")
-        return
-    
+
+    print(f"\n[INFO] Found users file: {json_file}")
+
     # Initialize MongoDB service
     try:
         user_service = SyncMongoDBUserService()
@@ -47,44 +182,86 @@ def migrate_users():
         print(f"[ERROR] Failed to connect to MongoDB: {e}")
         print("Make sure MONGODB_URL is set in your .env file")
         return
-    
-    # Migrate each user
-    migrated_count = 0
-    skipped_count = 0
-    error_count = 0
-    
-    for user_id, user_data in users_data.items():
-        try:
-            # Check if user already exists
-            email = user_data.get('credentials', {}).get('email')
-            if email:
-                existing_user = user_service.get_user_by_email(email)
-                if existing_user:
-                    print(f"[SKIP] User {email} already exists in MongoDB")
-                    skipped_count += 1
-                    continue
-            
-            # Insert user into MongoDB
-            user_service.users_collection.insert_one(user_data)
-            
-            name = user_data.get('profile', {}).get('name', 'Unknown')
-            print(f"[SUCCESS] Migrated: {name} ({email})")
-            migrated_count += 1
-            
-        except Exception as e:
-            print(f"[ERROR] Failed to migrate user {user_id}: {e}")
-            error_count += 1
-    
+
+    if restart and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    checkpoint = load_checkpoint(checkpoint_file, json_file)
+    resume_from = checkpoint["processed"]
+    if resume_from:
+        print(f"[INFO] Resuming after {resume_from} already processed users")
+
+    started_at = time.perf_counter()
+    session_processed = 0
+    batch: List[Tuple[str, Dict[str, Any]]] = []
+
+    def flush():
+        nonlocal session_processed
+        migrated, skipped, errors = migrate_batch(user_service.users_collection, batch)
+        checkpoint["processed"] += len(batch)
+        checkpoint["migrated"] += migrated
+        checkpoint["skipped"] += skipped
+        checkpoint["errors"] += errors
+        save_checkpoint(checkpoint_file, checkpoint)
+
+        session_processed += len(batch)
+        elapsed = time.perf_counter() - started_at
+        rate = session_processed / elapsed if elapsed > 0 else 0.0
+        print(f"[PROGRESS] {checkpoint['processed']} users processed ({rate:.0f} docs/sec)")
+        batch.clear()
+
+    try:
+        for index, (user_id, user_data) in enumerate(iter_json_object(json_file)):
+            if index < resume_from:
+                continue
+            batch.append((user_id, user_data))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    except Exception as e:
+        print(f"[ERROR] Migration interrupted: {e}")
+        print("Run the script again to resume from the last checkpoint.")
+        return
+
+    elapsed = time.perf_counter() - started_at
+    rate = session_processed / elapsed if elapsed > 0 else 0.0
+
+    # The migration is finished, so the next run starts from scratch
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
+    # Imported users still carry their history inline; move it to daily_entries
+    moved = user_service.move_embedded_entries()
+
     # Summary
     print("\n" + "=" * 60)
     print("  MIGRATION COMPLETE")
     print("=" * 60)
-    print(f"Migrated: {migrated_count} users")
-    print(f"Skipped: {skipped_count} users (already exist)")
-    print(f"Errors: {error_count} users")
+    print(f"Migrated: {checkpoint['migrated']} users")
+    print(f"Skipped: {checkpoint['skipped']} users (already exist)")
+    print(f"Errors: {checkpoint['errors']} users")
+    print(f"Throughput: {rate:.0f} docs/sec ({session_processed} users in {elapsed:.1f}s)")
+    print(f"Entries moved to daily_entries for {moved} users")
     print("\n[SUCCESS] All data is now in MongoDB Atlas!")
     print("You can safely keep users.json as a backup.")
-    
+
 if __name__ == "__main__":
-    migrate_users()
+    parser = argparse.ArgumentParser(description="Migrate users.json into MongoDB Atlas")
+    parser.add_argument("--file", default=DEFAULT_JSON_FILE, help="Path to users.json")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Users per bulk insert")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_FILE, help="Path to the progress checkpoint")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over")
+    parser.add_argument("--split-entries", action="store_true",
+                        help="Only move entries embedded in existing MongoDB users into daily_entries")
+    parser.add_argument("--merge-duplicate-days", action="store_true",
+                        help="Keep only the latest daily entry per user and day, then enforce it with a unique index")
+    args = parser.parse_args()
 
+    if args.merge_duplicate_days:
+        removed = SyncMongoDBUserService().merge_duplicate_entries()
+        print(f"[SUCCESS] Removed {removed} duplicate daily entries")
+    elif args.split_entries:
+        moved = SyncMongoDBUserService().move_embedded_entries()
+        print(f"[SUCCESS] Moved entries to daily_entries for {moved} users")
+    else:
+        migrate_users(args.file, args.batch_size, args.checkpoint, args.restart)
@@ -4,7 +4,6 @@ Railway-specific startup script for Mindscroll backend
 """
 import os
 import sys
-import subprocess
 from pathlib import Path
 
 def main():
@@ -25,28 +24,25 @@ def main():
     # else:
     #     print("✅ YouTube API key found")
     
-    # # Set environment variables
-    # port = os.getenv('PORT', '8000')
-    # host = '0.0.0.0'
+    # Set environment variables
+    port = os.getenv('PORT', '8000')
+    host = '0.0.0.0'
     
     print(f"📡 Starting server on {host}:{port}")
     print(f"🌐 Health check available at: http://{host}:{port}/health")
     
-    # Start uvicorn server
+    # Replace this process with gunicorn so Railway's SIGTERM reaches the
+    # arbiter directly and in-flight requests are drained before exit
+    os.chdir(Path(__file__).parent)
     try:
-        subprocess.run([
-            sys.executable, '-m', 'uvicorn',
-            'main:app',
-            '--host', host,
-            '--port', port,
-            '--workers', '1'
-        ], check=True)
-    except subprocess.CalledProcessError as e:
+        os.execvp(sys.executable, [
+            sys.executable, '-m', 'gunicorn',
+            '-c', 'gunicorn.conf.py',
+            'main:app'
+        ])
+    except OSError as e:
         print(f"❌ Failed to start server: {e}")
         sys.exit(1)
-    except KeyboardInterrupt:
-        print("🛑 Server stopped by user")
-        sys.exit(0)
 
 if __name__ == "__main__":
     main()
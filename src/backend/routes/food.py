@@ -1,14 +1,17 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
+from services.json_response import FastJSONResponse
 from services.food_vision_service import food_vision_service
 from services.feedback_learning_service import feedback_learning_service
 from pydantic import BaseModel
 from typing import List
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.post("/analyze-image")
@@ -28,10 +31,10 @@ async def analyze_food_image(image: UploadFile = File(...)):
         result = food_vision_service.analyze_food_image(image_bytes)
         
         if result["success"]:
-            return JSONResponse(content=result)
+            return FastJSONResponse(content=result)
         else:
             # Fallback to sample data if model fails
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": True,
                 "foodItems": [
                     "Sample food item 1",
@@ -55,7 +58,7 @@ async def analyze_food_image(image: UploadFile = File(...)):
             })
         
     except Exception as e:
-        print(f"Error analyzing food image: {str(e)}")
+        logger.exception("Error analyzing food image")
         raise HTTPException(status_code=500, detail=f"Failed to analyze image: {str(e)}")
 
 @router.get("/nutrition/{food_name}")
@@ -75,13 +78,13 @@ async def get_food_nutrition(food_name: str):
             "fiber": "Estimated fiber"
         }
         
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "nutrition": nutrition_info
         })
         
     except Exception as e:
-        print(f"Error getting nutrition info: {str(e)}")
+        logger.exception("Error getting nutrition info")
         raise HTTPException(status_code=500, detail=f"Failed to get nutrition info: {str(e)}")
 
 # Pydantic models for feedback
@@ -105,19 +108,19 @@ async def record_feedback(feedback: FeedbackRequest):
         )
         
         if success:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": True,
                 "message": "Feedback recorded successfully",
                 "learning_active": True
             })
         else:
-            return JSONResponse(content={
+            return FastJSONResponse(content={
                 "success": False,
                 "message": "Failed to record feedback"
             })
         
     except Exception as e:
-        print(f"Error recording feedback: {str(e)}")
+        logger.exception("Error recording feedback")
         raise HTTPException(status_code=500, detail=f"Failed to record feedback: {str(e)}")
 
 @router.get("/feedback/stats")
@@ -127,10 +130,10 @@ async def get_feedback_stats():
     """
     try:
         stats = feedback_learning_service.get_feedback_stats()
-        return JSONResponse(content={
+        return FastJSONResponse(content={
             "success": True,
             "stats": stats
         })
     except Exception as e:
-        print(f"Error getting feedback stats: {str(e)}")
+        logger.exception("Error getting feedback stats")
         raise HTTPException(status_code=500, detail=f"Failed to get feedback stats: {str(e)}")
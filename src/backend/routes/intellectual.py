@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Query
 from typing import List, Dict, Any, Optional
 import json
 import httpx
+import logging
 import os
 from dotenv import load_dotenv
 
@@ -10,9 +11,11 @@ load_dotenv()
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 # YouTube API configuration
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-YOUTUBE_BASE_URL = "https://www.googleapis.com/youtube/v3/search"
+YOUTUBE_BASE_URL = os.getenv("YOUTUBE_BASE_URL", "https://www.googleapis.com/youtube/v3/search")
 
 async def fetch_youtube_videos(topic: str, max_results: int = 5, duration: str = "short") -> List[Dict[str, Any]]:
     """
@@ -50,7 +53,7 @@ async def fetch_youtube_videos(topic: str, max_results: int = 5, duration: str =
             if response.status_code != 200:
                 data = response.json()
                 if "error" in data and "quotaExceeded" in str(data.get("error", {}).get("errors", [])):
-                    print("YouTube API quota exceeded - using demo content")
+                    logger.warning("YouTube API quota exceeded - using demo content")
                     return []
                 raise HTTPException(status_code=response.status_code, detail="YouTube API request failed")
             
@@ -77,11 +80,11 @@ async def fetch_youtube_videos(topic: str, max_results: int = 5, duration: str =
             return videos
             
     except httpx.RequestError as e:
-        print(f"YouTube API request failed: {str(e)}")
+        logger.warning("YouTube API request failed: %s", e)
         # Return empty list instead of raising exception
         return []
     except Exception as e:
-        print(f"Error fetching YouTube videos: {str(e)}")
+        logger.exception("Error fetching YouTube videos")
         # Return empty list instead of raising exception
         return []
 
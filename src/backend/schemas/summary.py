@@ -19,6 +19,10 @@ class OrchestratorSummary(BaseModel):
     summary: str
     recommendations: List[str]
 
+class PersonalizedSummary(OrchestratorSummary):
+    goal_progress: str
+    motivation: str
+
 class DailySummary(BaseModel):
     food_agent: FoodAgentOutput
     exercise_agent: ExerciseAgentOutput
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, PrivateAttr
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -26,7 +26,7 @@ class GoalType(str, Enum):
 
 class UserCredentials(BaseModel):
     email: EmailStr
-    password: str  # In production, this should be hashed
+    password: str  # scrypt hash from password_hasher; legacy plaintext until the next login
     created_at: datetime = datetime.now()
 
 class UserProfile(BaseModel):
@@ -55,6 +55,13 @@ class UserProfile(BaseModel):
     
     created_at: datetime = datetime.now()
 
+class PersonalizationOption(BaseModel):
+    nickname: str
+    avatar: str
+
+class PersonalizationBatch(BaseModel):
+    options: List[PersonalizationOption]
+
 class UserGoal(BaseModel):
     goal_type: GoalType
     target_weight: Optional[float] = None
@@ -82,6 +89,11 @@ class UserProgress(BaseModel):
     total_entries: int = 0
     last_entry_date: Optional[str] = None
 
+class UserProgressResponse(BaseModel):
+    user_id: str
+    recent_entries: List[DailyEntry]
+    progress_summary: Dict[str, Any]
+
 class User(BaseModel):
     id: str
     credentials: UserCredentials
@@ -89,9 +101,15 @@ class User(BaseModel):
     goal: UserGoal
     progress: UserProgress
     is_active: bool = True
+    version: int = 0  # Incremented on every write for optimistic concurrency
     created_at: datetime = datetime.now()
     updated_at: datetime = datetime.now()
     
+    # Clean baseline recorded by UserChangeTracker, never serialized
+    _snapshot: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+    # Leading progress.entries already stored (SQLite entries table, MongoDB daily_entries), never serialized
+    _stored_entries: Optional[int] = PrivateAttr(default=None)
+    
     model_config = {"arbitrary_types_allowed": True}
     
     @property
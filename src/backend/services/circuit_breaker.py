@@ -0,0 +1,159 @@
+"""
+Circuit Breaker
+One breaker per model endpoint, shared by every agent that calls it. Calls
+that fail or take longer than LLM_BREAKER_SLOW_CALL_SECONDS count as bad; when
+the bad share of the recent window crosses LLM_BREAKER_FAILURE_RATE the
+breaker opens and calls fail at once, so agents use their local fallbacks.
+After LLM_BREAKER_OPEN_SECONDS a single probe is let through (half-open);
+its outcome closes or re-opens the breaker.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from services.metrics_service import metrics_service
+
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+LLM_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "15"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose breaker is open"""
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self._outcomes: deque = deque(maxlen=LLM_BREAKER_WINDOW)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._publish()
+
+    @contextmanager
+    def guard(self):
+        """Admit one call or raise CircuitOpenError; the body reports its outcome through the guard"""
+        probe = self._admit()
+        if probe is None:
+            metrics_service.llm_short_circuited.inc(1, self.name)
+            raise CircuitOpenError(f"LLM circuit for {self.name} is open")
+        guarded = _GuardedCall(self, probe)
+        try:
+            yield guarded
+        finally:
+            if probe and not guarded.recorded:
+                # The probe never reached the endpoint (e.g. queue timeout); let another one try
+                with self._lock:
+                    self._probing = False
+
+    def _admit(self) -> Optional[bool]:
+        """None when rejected, otherwise whether the call is the half-open probe"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < LLM_BREAKER_OPEN_SECONDS:
+                    return None
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return None
+                self._probing = True
+                return True
+            return False
+
+    def _record(self, failed: bool, probe: bool):
+        with self._lock:
+            if probe:
+                self._probing = False
+                self._transition(OPEN if failed else CLOSED)
+                return
+            if self.state != CLOSED:
+                # Finished after the breaker opened; the probe decides what happens next
+                return
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= LLM_BREAKER_MIN_CALLS and self._failure_rate() >= LLM_BREAKER_FAILURE_RATE:
+                self._transition(OPEN)
+
+    def _failure_rate(self) -> float:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def _transition(self, state: str):
+        """Change state (caller holds the lock)"""
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            logger.warning("LLM circuit for %s opened (failure rate %.0f%%)", self.name, self._failure_rate() * 100)
+        elif state == CLOSED:
+            self._outcomes.clear()
+            if self.state != CLOSED:
+                logger.info("LLM circuit for %s closed", self.name)
+        self.state = state
+        self._publish()
+
+    def _publish(self):
+        if metrics_service.enabled:
+            metrics_service.llm_circuit_state.set(STATE_VALUES[self.state], self.name)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = {
+                "state": self.state,
+                "failure_rate": round(self._failure_rate(), 2),
+                "recent_calls": len(self._outcomes),
+            }
+            if self.state == OPEN:
+                snapshot["retry_in_seconds"] = round(max(0.0, LLM_BREAKER_OPEN_SECONDS - (time.monotonic() - self._opened_at)), 1)
+            return snapshot
+
+class _GuardedCall:
+    def __init__(self, breaker: CircuitBreaker, probe: bool):
+        self.breaker = breaker
+        self.probe = probe
+        self.recorded = False
+
+    @contextmanager
+    def timed(self):
+        """Wrap the endpoint call itself: errors and slow replies count against the breaker"""
+        started = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.recorded = True
+            self.breaker._record(True, self.probe)
+            raise
+        self.recorded = True
+        self.breaker._record(time.monotonic() - started > LLM_BREAKER_SLOW_CALL_SECONDS, self.probe)
+
+class CircuitBreakerRegistry:
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def for_model(self, llm: Any) -> CircuitBreaker:
+        """Breaker for the endpoint a chat model calls (model name, plus base URL when overridden)"""
+        name = getattr(llm, "model_name", None) or type(llm).__name__
+        base_url = getattr(llm, "openai_api_base", None)
+        return self.get(f"{name}@{base_url}" if base_url else name)
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name))
+        return breaker
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.snapshot() for name, breaker in list(self._breakers.items())}
+
+# Global registry
+circuit_breakers = CircuitBreakerRegistry()
@@ -3,22 +3,35 @@ Feedback Learning Service
 Stores user corrections and improves AI predictions over time
 """
 import json
+import logging
 import os
 import hashlib
-from typing import Dict, List, Any
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
 class FeedbackLearningService:
     def __init__(self):
         """Initialize the feedback learning service"""
         self.feedback_file = "backend/data/feedback_learning.json"
+        self._lock = threading.Lock()
+        self._loaded_mtime: Optional[float] = None
         self.feedback_data = self._load_feedback_data()
-        print("[INFO] Feedback learning service initialized")
+        logger.info("Feedback learning service initialized")
     
     def _load_feedback_data(self) -> Dict[str, Any]:
         """Load existing feedback data"""
         try:
             if os.path.exists(self.feedback_file):
+                self._loaded_mtime = os.path.getmtime(self.feedback_file)
                 with open(self.feedback_file, 'r') as f:
                     return json.load(f)
             return {
@@ -28,17 +41,44 @@ class FeedbackLearningService:
                 "total_feedback": 0
             }
         except Exception as e:
-            print(f"Error loading feedback data: {e}")
+            logger.error("Error loading feedback data: %s", e)
             return {"corrections": [], "patterns": {}, "improvements": {}, "total_feedback": 0}
     
+    def _refresh(self):
+        """Reload the data if another worker process has written the file since we read it"""
+        try:
+            mtime = os.path.getmtime(self.feedback_file)
+        except OSError:
+            return
+        if mtime != self._loaded_mtime:
+            with self._lock:
+                self.feedback_data = self._load_feedback_data()
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize read-modify-write cycles across worker processes"""
+        os.makedirs(os.path.dirname(self.feedback_file), exist_ok=True)
+        with open(self.feedback_file + ".lock", 'w') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
     def _save_feedback_data(self):
         """Save feedback data to file"""
         try:
             os.makedirs(os.path.dirname(self.feedback_file), exist_ok=True)
-            with open(self.feedback_file, 'w') as f:
+            # Write a temp file and rename so readers never see a partial file
+            tmp_file = f"{self.feedback_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w') as f:
                 json.dump(self.feedback_data, f, indent=2)
+            os.replace(tmp_file, self.feedback_file)
+            self._loaded_mtime = os.path.getmtime(self.feedback_file)
         except Exception as e:
-            print(f"Error saving feedback data: {e}")
+            logger.error("Error saving feedback data: %s", e)
     
     def record_correction(self, image_hash: str, ai_prediction: List[str], user_correction: str, image_info: Dict[str, Any]):
         """Record a user correction for learning"""
@@ -51,16 +91,19 @@ class FeedbackLearningService:
             "correction_type": "manual_override"
         }
         
-        self.feedback_data["corrections"].append(correction)
-        self.feedback_data["total_feedback"] += 1
-        
-        # Update patterns
-        self._update_patterns(correction)
-        
-        # Save data
-        self._save_feedback_data()
-        
-        print(f"📝 Recorded correction: AI said '{ai_prediction}', user said '{user_correction}'")
+        with self._lock, self._file_lock():
+            # Start from the latest file so corrections from other workers are kept
+            self.feedback_data = self._load_feedback_data()
+            self.feedback_data["corrections"].append(correction)
+            self.feedback_data["total_feedback"] += 1
+            
+            # Update patterns
+            self._update_patterns(correction)
+            
+            # Save data
+            self._save_feedback_data()
+        
+        logger.debug("Recorded correction", extra={"ai_prediction": ai_prediction, "user_correction": user_correction})
         return True
     
     def _update_patterns(self, correction: Dict[str, Any]):
@@ -92,6 +135,7 @@ class FeedbackLearningService:
     def get_learned_suggestions(self, image_hash: str, color_analysis: Dict[str, bool], aspect_ratio: float) -> List[Dict[str, Any]]:
         """Get improved suggestions based on learned patterns"""
         suggestions = []
+        self._refresh()
         
         # Check for learned patterns
         for pattern_key, pattern_data in self.feedback_data["patterns"].items():
@@ -121,6 +165,7 @@ class FeedbackLearningService:
     
     def get_feedback_stats(self) -> Dict[str, Any]:
         """Get feedback learning statistics"""
+        self._refresh()
         total_corrections = len(self.feedback_data["corrections"])
         total_patterns = len(self.feedback_data["patterns"])
         
@@ -0,0 +1,21 @@
+"""
+Shared Food Database
+Food names and categories used by image recognition and local nutrition scoring
+"""
+
+FOOD_DATABASE = {
+    "common_foods": [
+        "pizza", "burger", "pasta", "rice", "chicken", "beef", "fish",
+        "salad", "sandwich", "soup", "bread", "cheese", "eggs",
+        "apple", "banana", "orange", "grapes", "strawberry",
+        "coffee", "tea", "milk", "water", "juice", "boiled egg",
+        "fried egg", "scrambled egg", "omelet", "hard boiled egg"
+    ],
+    "food_categories": {
+        "protein": ["chicken", "beef", "fish", "eggs", "cheese"],
+        "vegetables": ["salad", "carrots", "broccoli", "spinach"],
+        "fruits": ["apple", "banana", "orange", "grapes", "strawberry"],
+        "grains": ["rice", "bread", "pasta"],
+        "dairy": ["milk", "cheese", "yogurt"]
+    }
+}
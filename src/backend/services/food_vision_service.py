@@ -5,48 +5,39 @@ Uses basic computer vision techniques for food classification
 from PIL import Image
 import io
 import json
+import logging
 import os
 import hashlib
 from typing import List, Dict, Any
 from .feedback_learning_service import feedback_learning_service
+from .food_database import FOOD_DATABASE
+from .metrics_service import metrics_service
+
+logger = logging.getLogger(__name__)
 
 class FreeFoodVisionService:
     def __init__(self):
         """Initialize the free food recognition service"""
         self.model_name = "simple-food-analyzer"
         self.food_database = self._load_food_database()
-        print("[INFO] Simple food analyzer initialized")
+        logger.info("Simple food analyzer initialized")
     
     def _load_food_database(self):
         """Load a simple food recognition database"""
-        return {
-            "common_foods": [
-                "pizza", "burger", "pasta", "rice", "chicken", "beef", "fish",
-                "salad", "sandwich", "soup", "bread", "cheese", "eggs",
-                "apple", "banana", "orange", "grapes", "strawberry",
-                "coffee", "tea", "milk", "water", "juice", "boiled egg",
-                "fried egg", "scrambled egg", "omelet", "hard boiled egg"
-            ],
-            "food_categories": {
-                "protein": ["chicken", "beef", "fish", "eggs", "cheese"],
-                "vegetables": ["salad", "carrots", "broccoli", "spinach"],
-                "fruits": ["apple", "banana", "orange", "grapes", "strawberry"],
-                "grains": ["rice", "bread", "pasta"],
-                "dairy": ["milk", "cheese", "yogurt"]
-            }
-        }
+        return FOOD_DATABASE
     
     def analyze_food_image(self, image_bytes: bytes) -> Dict[str, Any]:
         """
         Analyze a food image using simple computer vision techniques
         """
         try:
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
+            with metrics_service.timed("image_decode", "food_vision"):
+                # Convert bytes to PIL Image
+                image = Image.open(io.BytesIO(image_bytes))
+                
+                # Convert to RGB if necessary
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
             
             # Get image properties for analysis
             width, height = image.size
@@ -56,7 +47,8 @@ class FreeFoodVisionService:
             base_food_items = self._analyze_image_properties(image, image_hash)
             
             # Apply learning from user feedback
-            color_analysis = self._analyze_colors(list(image.convert('RGB').getdata()))
+            with metrics_service.timed("color_analysis", "food_vision"):
+                color_analysis = self._analyze_colors(list(image.convert('RGB').getdata()))
             aspect_ratio = width / height
             learned_food_items = feedback_learning_service.apply_learning_to_analysis(
                 image_hash, color_analysis, aspect_ratio, base_food_items
@@ -77,7 +69,7 @@ class FreeFoodVisionService:
             }
             
         except Exception as e:
-            print(f"Error analyzing food image: {str(e)}")
+            logger.exception("Error analyzing food image")
             return {
                 "success": False,
                 "error": str(e),
@@ -100,7 +92,8 @@ class FreeFoodVisionService:
         pixels = list(rgb_image.getdata())
         
         # Analyze dominant colors
-        color_analysis = self._analyze_colors(pixels)
+        with metrics_service.timed("color_analysis", "food_vision"):
+            color_analysis = self._analyze_colors(pixels)
         
         # Simple food recognition based on characteristics
         if self._looks_like_egg(image_hash, color_analysis, aspect_ratio):
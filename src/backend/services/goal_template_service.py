@@ -0,0 +1,187 @@
+"""
+Goal Template Service
+Goal skeletons in the goal_templates collection, one per bucket of quantized
+profile features (age band, BMI band, gender, activity level, normalised
+primary goal and dietary restrictions). Weight, protein and calorie targets
+are stored relative to the profile (body weight, estimated daily energy
+expenditure) so they scale to each new profile. A cached template is turned into a
+UserGoal for a new profile straight away; only its description is written by
+the LLM afterwards. Templates are learned from fresh LLM goals and can be
+warmed offline with warm_goal_templates.py.
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from schemas.user import UserProfile, UserGoal, GoalType, Gender, ActivityLevel
+from services.metrics_service import metrics_service
+
+GOAL_TEMPLATES_ENABLED = os.getenv("GOAL_TEMPLATES_ENABLED", "true").lower() in ("1", "true", "yes")
+# How long a worker serves a template before re-reading it, so other workers' and warm-up writes are picked up
+GOAL_TEMPLATE_CACHE_SECONDS = int(os.getenv("GOAL_TEMPLATE_CACHE_SECONDS", "300"))
+
+# Upper bound (inclusive) of each band
+AGE_BANDS = ((17, "under_18"), (21, "18_21"), (25, "22_25"), (30, "26_30"), (float("inf"), "31_plus"))
+BMI_BANDS = ((18.5, "underweight"), (25.0, "healthy"), (30.0, "overweight"), (float("inf"), "obese"))
+
+# Free-text primary goals mapped onto a goal bucket by whole words and phrases; the bucket
+# matching the most keywords wins, ties go to the earlier bucket
+GOAL_KEYWORDS = (
+    ("weight_loss", ("lose", "losing", "lose weight", "weight loss", "lose fat", "fat loss", "burn fat", "body fat",
+                     "slim", "slimmer", "slim down", "get lean", "leaner", "cut weight", "shed")),
+    ("muscle_gain", ("muscle", "muscles", "muscular", "strong", "stronger", "strength", "tone", "toned")),
+    ("weight_gain", ("gain weight", "weight gain", "gain", "bulk", "bulk up", "put on weight", "put on")),
+    ("endurance", ("endurance", "stamina", "cardio", "marathon", "run", "running", "fit", "fitter", "fitness")),
+    ("stress_reduction", ("stress", "stressed", "anxiety", "anxious", "calm", "calmer", "relax", "relaxed", "mental")),
+    ("better_sleep", ("sleep", "sleeping", "insomnia", "tired", "fatigue")),
+)
+
+# Multiplier from resting to daily energy expenditure
+ACTIVITY_FACTORS = {
+    ActivityLevel.SEDENTARY: 1.2,
+    ActivityLevel.LIGHTLY_ACTIVE: 1.375,
+    ActivityLevel.MODERATELY_ACTIVE: 1.55,
+    ActivityLevel.VERY_ACTIVE: 1.725,
+    ActivityLevel.EXTRA_ACTIVE: 1.9,
+}
+
+_SPACES = re.compile(r"[^a-z0-9]+")
+
+def _band(value: float, bands) -> str:
+    return next(label for upper, label in bands if value <= upper)
+
+def normalize_goal(primary_health_goal: str) -> str:
+    """Goal bucket for a free-text primary goal"""
+    text = " " + _SPACES.sub(" ", (primary_health_goal or "").lower()).strip() + " "
+    best, best_score = "general_health", 0
+    for bucket, keywords in GOAL_KEYWORDS:
+        score = sum(f" {keyword} " in text for keyword in keywords)
+        if score > best_score:
+            best, best_score = bucket, score
+    return best
+
+def profile_features(profile: UserProfile) -> Dict[str, str]:
+    """The quantized features a goal template is shared by"""
+    bmi = profile.weight / ((profile.height / 100) ** 2)
+    restrictions = sorted({_SPACES.sub(" ", item.lower()).strip() for item in profile.dietary_restrictions or []} - {""})
+    return {
+        "age": _band(profile.age, AGE_BANDS),
+        "bmi": _band(bmi, BMI_BANDS),
+        "gender": profile.gender.value,
+        "activity": profile.activity_level.value,
+        "goal": normalize_goal(profile.primary_health_goal),
+        "diet": "+".join(restrictions) or "none",
+    }
+
+def estimated_tdee(profile: UserProfile) -> float:
+    """Daily energy expenditure in kcal (Mifflin-St Jeor, times the activity factor)"""
+    offset = {Gender.MALE: 5, Gender.FEMALE: -161}.get(profile.gender, -78)
+    bmr = 10 * profile.weight + 6.25 * profile.height - 5 * profile.age + offset
+    return bmr * ACTIVITY_FACTORS[profile.activity_level]
+
+def template_key(features: Dict[str, str]) -> str:
+    return "|".join(features[name] for name in ("age", "bmi", "gender", "activity", "goal", "diet"))
+
+def template_description(goal_type: GoalType, calories: Optional[int], exercise_minutes: Optional[int],
+                         sleep_hours: Optional[float]) -> str:
+    """Generic description shown until the personalised one is written"""
+    parts = []
+    if calories:
+        parts.append(f"about {calories} kcal a day")
+    if exercise_minutes:
+        parts.append(f"{exercise_minutes} minutes of exercise a week")
+    if sleep_hours:
+        parts.append(f"{sleep_hours:g} hours of sleep a night")
+    plan = goal_type.value.replace("_", " ").capitalize()
+    return f"{plan} plan: {', '.join(parts)}." if parts else f"{plan} plan."
+
+class GoalTemplateStore:
+    def __init__(self, db, enabled: bool = GOAL_TEMPLATES_ENABLED):
+        self.enabled = enabled
+        self.collection = db.goal_templates
+        # Templates seen by this process with the monotonic time they were read, re-read after GOAL_TEMPLATE_CACHE_SECONDS
+        self._cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def eligible(self, profile: UserProfile) -> bool:
+        """Profiles with medical conditions always get a goal written for them"""
+        return self.enabled and not profile.medical_conditions
+
+    def goal_for(self, profile: UserProfile) -> Optional[UserGoal]:
+        """A goal built from the profile's bucket template (ai_generated=False until personalised), or None"""
+        if not self.eligible(profile):
+            return None
+        features = profile_features(profile)
+        key = template_key(features)
+        cached = self._cache.get(key)
+        if cached and time.monotonic() - cached[0] < GOAL_TEMPLATE_CACHE_SECONDS:
+            template = cached[1]
+        else:
+            with metrics_service.timed("db_read", "mongodb"):
+                template = self.collection.find_one({"_id": key})
+            with self._lock:
+                if template is not None:
+                    self._cache[key] = (time.monotonic(), template)
+                else:
+                    self._cache.pop(key, None)
+        # Templates stored before save() checked the goal type may belong to another bucket's goal
+        if template and template.get("goal_type") != features["goal"]:
+            template = None
+        metrics_service.goal_templates.inc(1, "hit" if template else "miss")
+        return self._instantiate(template, profile) if template else None
+
+    def save(self, profile: UserProfile, goal: UserGoal, source: str = "learned") -> bool:
+        """Store the targets of an LLM goal as the template for the profile's bucket; False when not stored"""
+        if not self.eligible(profile):
+            return False
+        features = profile_features(profile)
+        # A goal of another type would be served to every profile in the bucket
+        if goal.goal_type.value != features["goal"]:
+            return False
+        key = template_key(features)
+        template = {
+            "_id": key,
+            "features": features,
+            "goal_type": goal.goal_type.value,
+            # Weight-based targets are kept relative to body weight
+            "target_weight_ratio": round(goal.target_weight / profile.weight, 3) if goal.target_weight else None,
+            "target_protein_per_kg": round(goal.target_protein_per_day / profile.weight, 2) if goal.target_protein_per_day else None,
+            # Calories relative to estimated expenditure, so a deficit or surplus carries across the BMI band
+            "target_calories_ratio": round(goal.target_calories_per_day / estimated_tdee(profile), 3) if goal.target_calories_per_day else None,
+            "target_exercise_minutes_per_week": goal.target_exercise_minutes_per_week,
+            "target_sleep_hours": goal.target_sleep_hours,
+            "target_screen_time_hours": goal.target_screen_time_hours,
+            "target_stress_level": goal.target_stress_level,
+            "source": source,
+            "updated_at": datetime.now(timezone.utc),
+        }
+        with metrics_service.timed("db_write", "mongodb"):
+            self.collection.replace_one({"_id": key}, template, upsert=True)
+        with self._lock:
+            self._cache[key] = (time.monotonic(), template)
+        return True
+
+    def _instantiate(self, template: Dict[str, Any], profile: UserProfile) -> UserGoal:
+        goal_type = GoalType(template["goal_type"])
+        ratio = template.get("target_weight_ratio")
+        protein_per_kg = template.get("target_protein_per_kg")
+        calories_ratio = template.get("target_calories_ratio")
+        # Templates saved before calories were relative hold an absolute value
+        calories = int(round(calories_ratio * estimated_tdee(profile), -1)) if calories_ratio else template.get("target_calories_per_day")
+        return UserGoal(
+            goal_type=goal_type,
+            target_weight=round(ratio * profile.weight, 1) if ratio else None,
+            target_calories_per_day=calories,
+            target_protein_per_day=round(protein_per_kg * profile.weight, 1) if protein_per_kg else None,
+            target_exercise_minutes_per_week=template.get("target_exercise_minutes_per_week"),
+            target_sleep_hours=template.get("target_sleep_hours"),
+            target_screen_time_hours=template.get("target_screen_time_hours"),
+            target_stress_level=template.get("target_stress_level"),
+            goal_description=template_description(
+                goal_type, calories,
+                template.get("target_exercise_minutes_per_week"), template.get("target_sleep_hours")
+            ),
+            ai_generated=False
+        )
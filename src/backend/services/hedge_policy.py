@@ -0,0 +1,96 @@
+"""
+Hedge Policy
+Opt-in request hedging for async LLM calls. When a call has not returned by
+its component's observed p90 latency, a duplicate is sent; the first reply
+wins and the other is cancelled. Hedges draw from a budget earned as a share
+of primary calls (LLM_HEDGE_BUDGET) so a slow provider never sees more than
+that fraction of extra load.
+"""
+import asyncio
+import os
+import threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+from services.metrics_service import metrics_service
+
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.9"))
+
+# Latencies kept per component, and how many are needed before hedging starts
+LATENCY_SAMPLES = 200
+MIN_SAMPLES = 20
+
+# Unused budget that may accumulate, in hedges
+MAX_CREDITS = 5.0
+
+class HedgePolicy:
+    def __init__(self, enabled: bool = LLM_HEDGING_ENABLED):
+        self.enabled = enabled
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._credits = MAX_CREDITS
+        self._lock = threading.Lock()
+
+    def observe(self, component: str, seconds: float):
+        """Record the latency of a completed provider call"""
+        with self._lock:
+            samples = self._latencies.get(component)
+            if samples is None:
+                samples = self._latencies[component] = deque(maxlen=LATENCY_SAMPLES)
+            samples.append(seconds)
+
+    def delay(self, component: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough latencies are known"""
+        with self._lock:
+            samples = sorted(self._latencies.get(component, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[int(LLM_HEDGE_QUANTILE * (len(samples) - 1))]
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._credits < 1:
+                return False
+            self._credits -= 1
+            return True
+
+    async def run(self, component: str, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        """Run attempt(), sending one hedged duplicate if it outlives the component's p90"""
+        if not self.enabled:
+            return await attempt()
+
+        metrics_service.llm_hedges.inc(1, component, "primary")
+        with self._lock:
+            self._credits = min(MAX_CREDITS, self._credits + LLM_HEDGE_BUDGET)
+
+        primary = asyncio.ensure_future(attempt())
+        hedge = None
+        try:
+            delay = self.delay(component)
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if primary.done() or delay is None or not self._spend():
+                return await primary
+
+            metrics_service.llm_hedges.inc(1, component, "hedged")
+            hedge = asyncio.ensure_future(attempt())
+            pending = {primary, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            metrics_service.llm_hedges.inc(1, component, "hedge_won")
+                        return task.result()
+                    error = task.exception()
+            # Both attempts failed
+            raise error
+        finally:
+            # The loser (or both, if the caller was cancelled) stops here
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+# Global policy instance
+hedge_policy = HedgePolicy()
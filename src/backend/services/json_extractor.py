@@ -0,0 +1,110 @@
+"""
+JSON Extractor
+Recovers the JSON object from an LLM reply that is not bare JSON: markdown
+fences, prose before or after the object, or a reply cut off mid-object.
+Text can be fed in chunks as it streams; scanning resumes where the previous
+chunk ended.
+"""
+import json
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# Agent replies nest a few levels; anything deeper is garbage, and would overflow json.loads' recursion
+MAX_DEPTH = 64
+
+class JSONExtractor:
+    def __init__(self):
+        self.result: Optional[Dict[str, Any]] = None
+        # Text still to scan; a rejected candidate is pushed back to the front to be rescanned
+        self._pending: Deque[str] = deque()
+        self._reset()
+
+    def _reset(self):
+        self._buffer: List[str] = []
+        self._closers: List[str] = []
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Scan more text; returns the first object once its closing brace has arrived"""
+        self._pending.append(chunk)
+        while self._pending and self.result is None:
+            text = self._pending.popleft()
+            rejected = self._scan(text)
+            if rejected is not None:
+                # The candidate was not valid JSON (e.g. braces in prose): rescan from just after its opening brace
+                self._pending.appendleft(text[rejected + 1:])
+                self._pending.appendleft("".join(self._buffer[1:]))
+                self._reset()
+        if self.result is not None:
+            self._pending.clear()
+        return self.result
+
+    def _scan(self, text: str) -> Optional[int]:
+        """Advance over text; returns the index at which the current candidate was rejected"""
+        for index, char in enumerate(text):
+            if self.result is not None:
+                break
+            if not self._closers:
+                # Skip prose and fences until an object starts
+                if char == "{":
+                    self._buffer = ["{"]
+                    self._closers = ["}"]
+                continue
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._closers.append("}" if char == "{" else "]")
+                if len(self._closers) > MAX_DEPTH:
+                    raise ValueError(f"LLM reply nests deeper than {MAX_DEPTH} levels")
+            elif char in "}]":
+                if char != self._closers.pop():
+                    return index
+                if not self._closers and not self._complete():
+                    return index
+        return None
+
+    def finish(self) -> Dict[str, Any]:
+        """The extracted object, closing a truncated one if possible; raises ValueError when there is none"""
+        if self.result is None and self._closers:
+            text = "".join(self._buffer)
+            if self._in_string:
+                text = (text[:-1] if self._escaped else text) + '"'
+            text = text.rstrip()
+            if text.endswith(","):
+                text = text[:-1]
+            elif text.endswith(":"):
+                text += "null"
+            try:
+                self.result = _as_object(json.loads(text + "".join(reversed(self._closers))))
+            except ValueError:
+                pass
+        if self.result is None:
+            raise ValueError("No JSON object found in LLM reply")
+        return self.result
+
+    def _complete(self) -> bool:
+        try:
+            self.result = _as_object(json.loads("".join(self._buffer)))
+        except ValueError:
+            return False
+        return True
+
+def _as_object(value: Any) -> Dict[str, Any]:
+    if not isinstance(value, dict):
+        raise ValueError("LLM reply is not a JSON object")
+    return value
+
+def extract_json(text: str) -> Dict[str, Any]:
+    """First JSON object in text; raises ValueError when none can be recovered"""
+    extractor = JSONExtractor()
+    extractor.feed(text)
+    return extractor.finish()
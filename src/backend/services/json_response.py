@@ -0,0 +1,27 @@
+"""
+Fast JSON responses
+orjson-backed default response class, plus a helper that serializes a
+Pydantic model straight to bytes without building an intermediate dict.
+"""
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+def _default(obj: Any) -> Any:
+    """Serialize types orjson does not know natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (UTF-8, datetimes/enums/UUIDs handled natively)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+def model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """Return a Pydantic model serialized by pydantic-core directly to JSON bytes"""
+    return Response(content=model.model_dump_json(), status_code=status_code, media_type="application/json")
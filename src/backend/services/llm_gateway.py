@@ -0,0 +1,149 @@
+"""
+LLM Gateway
+Single path for agent LLM calls: prompt formatting, the model call and JSON
+parsing, each timed per component and with token usage recorded. Model calls
+go through the endpoint's circuit breaker and the shared outbound scheduler;
+the async path can additionally hedge slow calls.
+
+Callers that pass a schema (see response_format) get the provider's
+structured-output mode, so replies are schema-valid JSON; anything else that
+is not bare JSON goes through the tolerant extractor before it counts as a
+parse failure. Prompts are measured with the local tokenizer, which sizes the
+scheduler's token reservation and the per-request usage totals.
+"""
+import json
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from langchain_core.prompts import ChatPromptTemplate
+from services.metrics_service import metrics_service
+from services.llm_scheduler import llm_scheduler
+from services.circuit_breaker import circuit_breakers
+from services.hedge_policy import hedge_policy
+from services.json_extractor import extract_json
+from services.token_budget import token_budget
+
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+
+def response_format(model: Type[BaseModel], *fields: str) -> Dict[str, Any]:
+    """OpenAI strict json_schema response format for the given fields of a schema model (all fields when none given)"""
+    schema = model.model_json_schema()
+    properties = {name: _strict(schema["properties"][name]) for name in (fields or schema["properties"])}
+    strict_schema: Dict[str, Any] = {
+        "type": "object",
+        "properties": properties,
+        # Strict mode needs every property listed; optional ones are nullable instead
+        "required": list(properties),
+        "additionalProperties": False,
+    }
+    if "$defs" in schema:
+        strict_schema["$defs"] = {name: _strict(definition) for name, definition in schema["$defs"].items()}
+    return {"type": "json_schema", "json_schema": {"name": model.__name__, "schema": strict_schema, "strict": True}}
+
+def _strict(schema: Any) -> Any:
+    """Drop keywords strict mode rejects (defaults) from a pydantic property schema and close nested objects"""
+    if isinstance(schema, dict):
+        strict = {key: _strict(value) for key, value in schema.items() if key != "default"}
+        if "properties" in strict:
+            strict["required"] = list(strict["properties"])
+            strict["additionalProperties"] = False
+        return strict
+    if isinstance(schema, list):
+        return [_strict(value) for value in schema]
+    return schema
+
+class LLMGateway:
+    def __init__(self, structured_output: bool = LLM_STRUCTURED_OUTPUT):
+        self.structured_output = structured_output
+    
+    def invoke(self, component: str, prompt: ChatPromptTemplate, llm, schema: Optional[Dict[str, Any]] = None) -> Any:
+        """Format the prompt and call the model, in structured-output mode when a schema is given"""
+        messages, prompt_tokens = self._format(component, prompt)
+        model = self._model(llm, schema)
+        
+        # Raises CircuitOpenError straight away while the endpoint is failing
+        with circuit_breakers.for_model(llm).guard() as guarded:
+            estimated_tokens = llm_scheduler.estimate_tokens(prompt_tokens, getattr(llm, "max_tokens", None))
+            with llm_scheduler.slot(component, estimated_tokens) as call:
+                started = time.monotonic()
+                with guarded.timed(), metrics_service.timed("llm_call", component):
+                    response = model.invoke(messages)
+                elapsed = time.monotonic() - started
+                hedge_policy.observe(component, elapsed)
+                call.record(response)
+        
+        metrics_service.record_llm_usage(component, response)
+        token_budget.record(component, prompt_tokens, response, elapsed)
+        return response
+    
+    async def ainvoke(self, component: str, prompt: ChatPromptTemplate, llm, hedge: bool = False,
+                      schema: Optional[Dict[str, Any]] = None) -> Any:
+        """Async invoke; with hedge=True a slow call may be duplicated (see hedge_policy)"""
+        messages, prompt_tokens = self._format(component, prompt)
+        model = self._model(llm, schema)
+        if hedge:
+            return await hedge_policy.run(component, lambda: self._acall(component, messages, prompt_tokens, llm, model))
+        return await self._acall(component, messages, prompt_tokens, llm, model)
+    
+    async def _acall(self, component: str, messages: List[Any], prompt_tokens: int, llm, model) -> Any:
+        with circuit_breakers.for_model(llm).guard() as guarded:
+            estimated_tokens = llm_scheduler.estimate_tokens(prompt_tokens, getattr(llm, "max_tokens", None))
+            async with llm_scheduler.aslot(component, estimated_tokens) as call:
+                started = time.monotonic()
+                with guarded.timed(), metrics_service.timed("llm_call", component):
+                    response = await model.ainvoke(messages)
+                elapsed = time.monotonic() - started
+                hedge_policy.observe(component, elapsed)
+                call.record(response)
+        
+        metrics_service.record_llm_usage(component, response)
+        token_budget.record(component, prompt_tokens, response, elapsed)
+        return response
+    
+    def invoke_json(self, component: str, prompt: ChatPromptTemplate, llm,
+                    schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Call the model and parse its reply as a JSON object"""
+        response = self.invoke(component, prompt, llm, schema)
+        return self._parse(component, response, schema)
+    
+    async def ainvoke_json(self, component: str, prompt: ChatPromptTemplate, llm, hedge: bool = False,
+                           schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Async invoke_json"""
+        response = await self.ainvoke(component, prompt, llm, hedge, schema)
+        return self._parse(component, response, schema)
+    
+    def _model(self, llm, schema: Optional[Dict[str, Any]]):
+        """The model bound to the structured-output format, or as-is"""
+        if schema and self.structured_output:
+            return llm.bind(response_format=schema)
+        return llm
+    
+    def _parse(self, component: str, response: Any, schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Parse the reply, recovering JSON wrapped in fences or prose; counts each outcome per output mode"""
+        mode = "json_schema" if schema and self.structured_output else "prompt"
+        content = str(response.content)
+        with metrics_service.timed("parse", component):
+            try:
+                result = json.loads(content)
+                outcome = "ok"
+            except ValueError:
+                result = None
+            if not isinstance(result, dict):
+                try:
+                    result = extract_json(content)
+                    outcome = "extracted"
+                except ValueError:
+                    metrics_service.llm_replies.inc(1, component, mode, "failed")
+                    raise
+        metrics_service.llm_replies.inc(1, component, mode, outcome)
+        return result
+    
+    def _format(self, component: str, prompt: ChatPromptTemplate) -> Tuple[List[Any], int]:
+        """Prompt messages and their size in tokens"""
+        with metrics_service.timed("prompt_build", component):
+            messages = prompt.format_messages()
+            return messages, token_budget.count_messages(messages)
+
+# Global instance
+llm_gateway = LLMGateway()
@@ -0,0 +1,255 @@
+"""
+LLM Scheduler
+Shared throttle for outbound LLM calls. Token buckets keep requests/min and
+tokens/min under the provider quota, an AIMD limit caps calls in flight
+(halved on 429s, shrunk when latency exceeds its target, grown by ~1 per
+window while healthy), and waiting calls are admitted in priority order so
+interactive summaries go ahead of background work.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, List, Optional, Tuple
+from services.metrics_service import metrics_service, token_usage
+
+# Per worker process; post_fork divides them by the number of workers
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "2"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "8"))
+LLM_TARGET_LATENCY_SECONDS = float(os.getenv("LLM_TARGET_LATENCY_SECONDS", "8"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30"))
+
+# Completion tokens assumed for models without a max_tokens cap
+DEFAULT_COMPLETION_TOKENS = 300
+
+# How often a waiting coroutine re-checks for capacity
+ASYNC_POLL_SECONDS = 0.05
+
+# Minimum seconds between two multiplicative decreases, so one burst of 429s halves the limit once
+DECREASE_COOLDOWN_SECONDS = 2.0
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_priority_var: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+class LLMQueueTimeout(Exception):
+    """Raised when a call waited longer than LLM_QUEUE_TIMEOUT_SECONDS for capacity"""
+
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.configure(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def configure(self, per_minute: float):
+        self.capacity = max(1.0, per_minute)
+        self.rate = self.capacity / 60.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (0 when available now)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        """Remove amount; negative amounts give tokens back, and the balance may go into debt"""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+class LLMScheduler:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._waiting: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self.limit = float(max(LLM_MIN_CONCURRENCY, min(LLM_INITIAL_CONCURRENCY, LLM_MAX_CONCURRENCY)))
+        self._last_decrease = 0.0
+        self.requests = TokenBucket(LLM_REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(LLM_TOKENS_PER_MINUTE)
+        self._publish()
+
+    def configure_share(self, workers: int):
+        """Give this process its share of the per-minute quota when several workers call the provider"""
+        workers = max(1, workers)
+        with self._cond:
+            self.requests.configure(LLM_REQUESTS_PER_MINUTE / workers)
+            self.tokens.configure(LLM_TOKENS_PER_MINUTE / workers)
+
+    @contextmanager
+    def priority(self, level: int):
+        """Run the enclosed LLM calls at the given priority"""
+        token = _priority_var.set(level)
+        try:
+            yield
+        finally:
+            _priority_var.reset(token)
+
+    def estimate_tokens(self, prompt_tokens: int, max_tokens: Optional[int] = None) -> int:
+        """Tokens to reserve for a call: the measured prompt plus the reply cap"""
+        return prompt_tokens + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+    @contextmanager
+    def slot(self, component: str, estimated_tokens: int):
+        """Wait for capacity, then hold one in-flight slot around the provider call"""
+        priority = _priority_var.get()
+        queued = time.monotonic()
+        self._acquire(priority, estimated_tokens, queued)
+        with self._held(component, priority, queued, estimated_tokens) as call:
+            yield call
+
+    @asynccontextmanager
+    async def aslot(self, component: str, estimated_tokens: int):
+        """slot() for coroutines: waits without blocking the event loop"""
+        priority = _priority_var.get()
+        queued = time.monotonic()
+        await self._acquire_async(priority, estimated_tokens, queued)
+        with self._held(component, priority, queued, estimated_tokens) as call:
+            yield call
+
+    @contextmanager
+    def _held(self, component: str, priority: int, queued: float, estimated_tokens: int):
+        started = time.monotonic()
+        if metrics_service.enabled:
+            metrics_service.llm_queue_wait_seconds.observe(started - queued, component, PRIORITY_NAMES[priority])
+        call = _ScheduledCall(self, estimated_tokens)
+        try:
+            yield call
+        except Exception as e:
+            if _is_rate_limit(e):
+                metrics_service.llm_rate_limited.inc(1, component)
+                self._on_rate_limited()
+            raise
+        else:
+            self._on_success(time.monotonic() - started)
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._publish()
+                self._cond.notify_all()
+
+    def _acquire(self, priority: int, estimated_tokens: int, queued: float):
+        ticket = (priority, next(self._sequence))
+        deadline = queued + LLM_QUEUE_TIMEOUT_SECONDS
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._try_admit(ticket, estimated_tokens, now)
+                    if delay == 0:
+                        return
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise LLMQueueTimeout(f"No LLM capacity after {LLM_QUEUE_TIMEOUT_SECONDS:.0f}s")
+                    self._cond.wait(remaining if delay is None else min(delay, remaining))
+            except BaseException:
+                self._leave(ticket)
+                raise
+            finally:
+                # The next call in line re-checks whether it can go
+                self._cond.notify_all()
+
+    async def _acquire_async(self, priority: int, estimated_tokens: int, queued: float):
+        ticket = (priority, next(self._sequence))
+        deadline = queued + LLM_QUEUE_TIMEOUT_SECONDS
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+        try:
+            while True:
+                now = time.monotonic()
+                with self._cond:
+                    delay = self._try_admit(ticket, estimated_tokens, now)
+                    if delay == 0:
+                        self._cond.notify_all()
+                        return
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise LLMQueueTimeout(f"No LLM capacity after {LLM_QUEUE_TIMEOUT_SECONDS:.0f}s")
+                # Coroutines are not woken by the condition, so they poll
+                await asyncio.sleep(min(ASYNC_POLL_SECONDS if delay is None else delay, remaining))
+        except BaseException:
+            with self._cond:
+                self._leave(ticket)
+                self._cond.notify_all()
+            raise
+
+    def _try_admit(self, ticket: Tuple[int, int], estimated_tokens: int, now: float) -> Optional[float]:
+        """Admit ticket (returns 0), or return seconds until the buckets allow it, or None while others go first.
+        Caller holds the lock"""
+        # Only the highest-priority, longest-waiting call may take capacity
+        if self._waiting[0] != ticket or self._in_flight >= int(self.limit):
+            return None
+        delay = max(self.requests.wait_time(1, now), self.tokens.wait_time(estimated_tokens, now))
+        if delay > 0:
+            return delay
+        heapq.heappop(self._waiting)
+        self.requests.take(1)
+        self.tokens.take(estimated_tokens)
+        self._in_flight += 1
+        self._publish()
+        return 0
+
+    def _leave(self, ticket: Tuple[int, int]):
+        """Drop a ticket that gave up waiting (caller holds the lock)"""
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+
+    def _on_success(self, latency: float):
+        with self._cond:
+            if latency > LLM_TARGET_LATENCY_SECONDS:
+                self._decrease(0.9)
+            else:
+                # Additive increase: about +1 once a full limit's worth of calls has succeeded
+                self.limit = min(float(LLM_MAX_CONCURRENCY), self.limit + 1.0 / self.limit)
+            self._publish()
+            self._cond.notify_all()
+
+    def _on_rate_limited(self):
+        with self._cond:
+            self._decrease(0.5)
+            # Stop admitting calls until the request bucket refills a little
+            self.requests.tokens = min(self.requests.tokens, 0.0)
+            self._publish()
+
+    def _decrease(self, factor: float):
+        now = time.monotonic()
+        if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+            self.limit = max(float(LLM_MIN_CONCURRENCY), self.limit * factor)
+            self._last_decrease = now
+
+    def _publish(self):
+        if metrics_service.enabled:
+            metrics_service.llm_concurrency.set(int(self.limit), "limit")
+            metrics_service.llm_concurrency.set(self._in_flight, "in_flight")
+
+class _ScheduledCall:
+    def __init__(self, scheduler: LLMScheduler, estimated_tokens: int):
+        self.scheduler = scheduler
+        self.estimated_tokens = estimated_tokens
+
+    def record(self, response: Any):
+        """Settle the token bucket with the usage the provider actually reported"""
+        prompt_tokens, completion_tokens = token_usage(response)
+        if prompt_tokens or completion_tokens:
+            with self.scheduler._cond:
+                self.scheduler.tokens.take(prompt_tokens + completion_tokens - self.estimated_tokens)
+
+def _is_rate_limit(error: Exception) -> bool:
+    """openai.RateLimitError, or any client error carrying HTTP 429"""
+    return type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429
+
+# Global scheduler instance
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,151 @@
+"""
+Logging Service
+Structured JSON logs written off the request path by a background queue listener.
+
+Environment:
+    LOG_LEVEL               minimum level emitted (default INFO)
+    LOG_FORMAT              "json" (default) or "text" for local development
+    LOG_DEBUG_SAMPLE_RATE   fraction of requests whose DEBUG logs (from the app's own
+                            modules) are kept when LOG_LEVEL is above DEBUG (default 0.01)
+    LOG_QUEUE_SIZE          buffered records before new ones are dropped (default 10000)
+"""
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+LOG_LEVEL = logging.getLevelName(os.getenv("LOG_LEVEL", "INFO").upper())
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Loggers of this app's own modules; only these emit sampled DEBUG records, libraries stay at LOG_LEVEL
+APP_LOGGERS = ("main", "__main__", "agents", "services", "routes", "database")
+
+if not isinstance(LOG_LEVEL, int):
+    LOG_LEVEL = logging.INFO
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+debug_sampled_var: contextvars.ContextVar[bool] = contextvars.ContextVar("debug_sampled", default=False)
+
+# Attributes every LogRecord has; anything else was passed via extra= and is logged as a field
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id", "color_message"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", "-")
+        if request_id != "-":
+            payload["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+class RequestContextFilter(logging.Filter):
+    """Stamp the current request id and drop DEBUG records for unsampled requests"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < LOG_LEVEL and not debug_sampled_var.get():
+            return False
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the listener thread without formatting or waiting on a full queue"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the args here; JSON and traceback formatting happen on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LoggingService:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.queue_handler: Optional[NonBlockingQueueHandler] = None
+
+    def setup(self):
+        """Route all logging through the queue; safe to call again (e.g. after a fork)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+
+            stream_handler = logging.StreamHandler(sys.stdout)
+            if LOG_FORMAT == "text":
+                stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(request_id)s %(message)s"))
+            else:
+                stream_handler.setFormatter(JsonFormatter())
+
+            log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+            self.queue_handler = NonBlockingQueueHandler(log_queue)
+            self.queue_handler.addFilter(RequestContextFilter())
+
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(self.queue_handler)
+            root.setLevel(LOG_LEVEL)
+            # Let the app's DEBUG through the level check only when some requests are sampled
+            for name in APP_LOGGERS:
+                logging.getLogger(name).setLevel(logging.DEBUG if LOG_DEBUG_SAMPLE_RATE > 0 else logging.NOTSET)
+            for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "gunicorn.error", "gunicorn.access"):
+                logger = logging.getLogger(name)
+                logger.handlers = []
+                logger.propagate = True
+            for name in ("httpx", "httpcore", "openai", "pymongo", "multipart", "python_multipart", "asyncio"):
+                logging.getLogger(name).setLevel(max(LOG_LEVEL, logging.INFO))
+
+            # A listener inherited through fork has no running thread; replace it
+            self.listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+            self.listener.start()
+
+    def shutdown(self):
+        """Flush queued records and stop the listener thread"""
+        with self._lock:
+            if self.listener and self._pid == os.getpid():
+                self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+    def begin_request(self, request_id: Optional[str] = None) -> str:
+        """Bind a request id and decide once whether this request's DEBUG logs are kept"""
+        request_id = request_id or uuid.uuid4().hex
+        request_id_var.set(request_id)
+        debug_sampled_var.set(LOG_LEVEL <= logging.DEBUG or random.random() < LOG_DEBUG_SAMPLE_RATE)
+        return request_id
+
+# Global instance
+logging_service = LoggingService()
+atexit.register(logging_service.shutdown)
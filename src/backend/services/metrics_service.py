@@ -0,0 +1,375 @@
+"""
+Metrics Service
+In-process latency histograms and counters exposed in Prometheus text format.
+Set METRICS_ENABLED=false to turn every timer into a shared no-op.
+With METRICS_MULTIPROC_DIR set, each gunicorn worker flushes its series to that
+directory and /metrics sums every worker's file, like prometheus_client's multiprocess mode.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Tuple, Any, Optional
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+# Series of workers that exited; counters and histograms must not go backwards when a worker is recycled
+ARCHIVE_FILE = "archived.json"
+
+# Seconds; covers sub-millisecond parsing up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Tokens; from a one-line agent prompt up to a request that calls every agent
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+# Jaccard similarity of cache hits, to tune the thresholds
+SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 0.99, 1.0)
+
+_NOOP = nullcontext()
+
+class Histogram:
+    kept_after_exit = True
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...], buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        """Record one observation; series layout is [bucket counts..., +Inf count, sum]"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def snapshot(self) -> List[List[Any]]:
+        with self._lock:
+            return [[list(labels), list(series)] for labels, series in self._series.items()]
+
+    def combine(self, snapshots: List[List[List[Any]]]) -> Dict[Tuple[str, ...], List[float]]:
+        """Sum bucket counts and sums of the same series across processes"""
+        merged: Dict[Tuple[str, ...], List[float]] = {}
+        for snapshot in snapshots:
+            for labels, series in snapshot:
+                current = merged.get(tuple(labels))
+                merged[tuple(labels)] = list(series) if current is None else [a + b for a, b in zip(current, series)]
+        return merged
+
+    def render(self, merged: Optional[Dict[Tuple[str, ...], List[float]]] = None) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted((self._series if merged is None else merged).items()):
+                base = _format_labels(self.labelnames, labels)
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="+Inf"}} {series[len(self.buckets)]}')
+                lines.append(f"{self.name}_sum{{{base}}} {series[-1]}")
+                lines.append(f"{self.name}_count{{{base}}} {series[len(self.buckets)]}")
+        return lines
+
+class Counter:
+    # Gauges of exited workers are dropped; their last value says nothing about the live ones
+    kept_after_exit = True
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def snapshot(self) -> List[List[Any]]:
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def combine(self, snapshots: List[List[List[Any]]]) -> Dict[Tuple[str, ...], float]:
+        """Sum the same series across processes"""
+        merged: Dict[Tuple[str, ...], float] = {}
+        for snapshot in snapshots:
+            for labels, value in snapshot:
+                merged[tuple(labels)] = self._aggregate(merged[tuple(labels)], value) if tuple(labels) in merged else value
+        return merged
+
+    def _aggregate(self, current: float, value: float) -> float:
+        return current + value
+
+    def render(self, merged: Optional[Dict[Tuple[str, ...], float]] = None) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted((self._values if merged is None else merged).items()):
+                lines.append(f"{self.name}{{{_format_labels(self.labelnames, labels)}}} {value}")
+        return lines
+
+class Gauge(Counter):
+    kept_after_exit = False
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...], aggregate: str = "sum"):
+        super().__init__(name, help_text, labelnames)
+        # "sum" for per-worker shares (limits, calls in flight), "max" for states where the worst worker matters
+        self.aggregate = aggregate
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def _aggregate(self, current: float, value: float) -> float:
+        return max(current, value) if self.aggregate == "max" else current + value
+
+    def render(self, merged: Optional[Dict[Tuple[str, ...], float]] = None) -> List[str]:
+        lines = super().render(merged)
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+def token_usage(response: Any) -> Tuple[int, int]:
+    """(prompt, completion) tokens reported on an LLM response, zeros when absent"""
+    usage: Optional[Dict[str, Any]] = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    metadata = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return metadata.get("prompt_tokens", 0), metadata.get("completion_tokens", 0)
+
+def _format_labels(labelnames: Tuple[str, ...], labels: Tuple[str, ...]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels))
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class MetricsService:
+    def __init__(self, enabled: bool = METRICS_ENABLED, multiproc_dir: str = METRICS_MULTIPROC_DIR):
+        self.enabled = enabled
+        self.multiproc_dir = multiproc_dir
+        self._metrics: List[Any] = []
+        self._flusher: Optional[threading.Thread] = None
+        self.stage_seconds = self.histogram(
+            "mindscroll_stage_duration_seconds",
+            "Time spent in each pipeline stage",
+            ("stage", "component")
+        )
+        self.http_request_seconds = self.histogram(
+            "mindscroll_http_request_duration_seconds",
+            "HTTP request latency by route",
+            ("method", "route", "status")
+        )
+        self.llm_tokens = self.counter(
+            "mindscroll_llm_tokens_total",
+            "LLM tokens used per agent",
+            ("component", "kind")
+        )
+        self.llm_prompt_tokens = self.histogram(
+            "mindscroll_llm_prompt_tokens",
+            "Prompt size of each LLM call per agent",
+            ("component",),
+            TOKEN_BUCKETS
+        )
+        self.llm_request_tokens = self.histogram(
+            "mindscroll_llm_request_tokens",
+            "LLM tokens spent per HTTP request",
+            ("route", "kind"),
+            TOKEN_BUCKETS
+        )
+        self.summary_store = self.counter(
+            "mindscroll_summary_store_total",
+            "Stored summary lookups by result (hit, stale, miss)",
+            ("result",)
+        )
+        self.llm_queue_wait_seconds = self.histogram(
+            "mindscroll_llm_queue_wait_seconds",
+            "Time LLM calls waited in the outbound scheduler",
+            ("component", "priority")
+        )
+        self.llm_concurrency = self.gauge(
+            "mindscroll_llm_concurrency",
+            "Outbound LLM concurrency limit and calls in flight",
+            ("kind",)
+        )
+        self.llm_rate_limited = self.counter(
+            "mindscroll_llm_rate_limited_total",
+            "LLM calls rejected by the provider with HTTP 429",
+            ("component",)
+        )
+        self.llm_circuit_state = self.gauge(
+            "mindscroll_llm_circuit_state",
+            "LLM circuit breaker state per endpoint (0 closed, 1 half-open, 2 open)",
+            ("endpoint",),
+            aggregate="max"
+        )
+        self.llm_short_circuited = self.counter(
+            "mindscroll_llm_short_circuited_total",
+            "LLM calls rejected by an open circuit breaker",
+            ("endpoint",)
+        )
+        self.llm_hedges = self.counter(
+            "mindscroll_llm_hedges_total",
+            "Hedging-eligible LLM calls: primary calls, hedges sent and hedges that won",
+            ("component", "kind")
+        )
+        self.llm_replies = self.counter(
+            "mindscroll_llm_replies_total",
+            "Parsed LLM replies by output mode and outcome (ok, extracted, failed)",
+            ("component", "mode", "outcome")
+        )
+        self.similarity_cache = self.counter(
+            "mindscroll_similarity_cache_total",
+            "Meal/exercise analysis cache lookups by result (exact, near, scale_mismatch, miss)",
+            ("kind", "result")
+        )
+        self.goal_templates = self.counter(
+            "mindscroll_goal_templates_total",
+            "Goal template lookups by result (hit, miss)",
+            ("result",)
+        )
+        self.nickname_pool = self.counter(
+            "mindscroll_nickname_pool_total",
+            "Signup nickname draws by result (hit, empty)",
+            ("result",)
+        )
+        self.session_tokens = self.counter(
+            "mindscroll_session_tokens_total",
+            "Presented session tokens by verification result (valid, invalid, expired)",
+            ("result",)
+        )
+        self.similarity_cache_score = self.histogram(
+            "mindscroll_similarity_cache_score",
+            "Similarity of the cached inputs reused on a hit",
+            ("kind",),
+            SIMILARITY_BUCKETS
+        )
+        self.idempotent_requests = self.counter(
+            "mindscroll_idempotent_requests_total",
+            "Entry writes by outcome (executed, coalesced, replayed)",
+            ("route", "outcome")
+        )
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...], buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...]) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, labelnames: Tuple[str, ...], aggregate: str = "sum") -> Gauge:
+        metric = Gauge(name, help_text, labelnames, aggregate)
+        self._metrics.append(metric)
+        return metric
+
+    def timed(self, stage: str, component: str):
+        """Context manager recording the duration of a pipeline stage"""
+        if not self.enabled:
+            return _NOOP
+        return self._timed(stage, component)
+
+    @contextmanager
+    def _timed(self, stage: str, component: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(time.perf_counter() - started, stage, component)
+
+    def record_llm_usage(self, component: str, response: Any):
+        """Count prompt and completion tokens reported on an LLM response"""
+        if not self.enabled:
+            return
+        prompt_tokens, completion_tokens = token_usage(response)
+        if prompt_tokens:
+            self.llm_tokens.inc(prompt_tokens, component, "prompt")
+        if completion_tokens:
+            self.llm_tokens.inc(completion_tokens, component, "completion")
+
+    def render(self) -> str:
+        """Render every metric in Prometheus text exposition format, summed over all workers in multiprocess mode"""
+        lines: List[str] = []
+        if not self.multiproc_dir:
+            for metric in self._metrics:
+                lines.extend(metric.render())
+            return "\n".join(lines) + "\n"
+
+        self.flush()
+        processes = [data for path in glob.glob(os.path.join(self.multiproc_dir, "*.json")) if (data := _read_json(path)) is not None]
+        for metric in self._metrics:
+            lines.extend(metric.render(metric.combine([data.get(metric.name, []) for data in processes])))
+        return "\n".join(lines) + "\n"
+
+    def reset_multiproc_dir(self):
+        """Clear series left over from a previous run; called once by the gunicorn master before forking"""
+        if not self.multiproc_dir:
+            return
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(self.multiproc_dir, "*.json")):
+            os.remove(path)
+
+    def flush(self):
+        """Write this process's series to the shared directory"""
+        if not self.multiproc_dir:
+            return
+        _write_json(os.path.join(self.multiproc_dir, f"{os.getpid()}.json"),
+                    {metric.name: metric.snapshot() for metric in self._metrics})
+
+    def start_flusher(self):
+        """Flush every METRICS_FLUSH_SECONDS and on exit; called in each worker after forking"""
+        if not self.multiproc_dir or not self.enabled:
+            return
+        atexit.register(self.flush)
+
+        def loop():
+            while True:
+                time.sleep(METRICS_FLUSH_SECONDS)
+                self.flush()
+
+        self._flusher = threading.Thread(target=loop, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    def mark_process_dead(self, pid: int):
+        """Fold an exited worker's counters and histograms into the archive and drop its gauges"""
+        if not self.multiproc_dir:
+            return
+        path = os.path.join(self.multiproc_dir, f"{pid}.json")
+        dead = _read_json(path)
+        if dead is None:
+            return
+        archive_path = os.path.join(self.multiproc_dir, ARCHIVE_FILE)
+        archive = _read_json(archive_path) or {}
+        for metric in self._metrics:
+            if metric.kept_after_exit:
+                merged = metric.combine([archive.get(metric.name, []), dead.get(metric.name, [])])
+                archive[metric.name] = [[list(labels), value] for labels, value in merged.items()]
+        _write_json(archive_path, archive)
+        os.remove(path)
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        # Removed by mark_process_dead between listing and reading
+        return None
+
+def _write_json(path: str, data: Dict[str, Any]):
+    # Replace atomically so a concurrent /metrics never reads half a file
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+# Global instance
+metrics_service = MetricsService()
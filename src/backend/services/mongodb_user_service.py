@@ -3,6 +3,7 @@ from datetime import datetime
 from database.mongodb import get_database
 from models.user import User, UserCredentials, UserProfile, UserGoal, UserProgress, DailyEntry, GoalType, ActivityLevel, Gender
 from agents.goal_generator import GoalGenerator
+from services.password_hasher import password_hasher, is_hashed
 import uuid
 
 class MongoDBUserService:
@@ -15,6 +16,10 @@ class MongoDBUserService:
         """Create a new user with AI-generated goal"""
         user_id = str(uuid.uuid4())
         
+        # Only the password hash is stored
+        if not is_hashed(credentials.password):
+            credentials = credentials.model_copy(update={"password": await password_hasher.run(password_hasher.hash, credentials.password)})
+        
         # Generate AI goal based on profile
         goal = self.goal_generator.generate_goal(profile)
         
@@ -58,9 +63,16 @@ class MongoDBUserService:
     async def authenticate_user(self, email: str, password: str) -> Optional[User]:
         """Authenticate user with email and password"""
         user = await self.get_user_by_email(email)
-        if user and user.credentials.password == password:
-            return user
-        return None
+        stored = user.credentials.password if user else None
+        if not await password_hasher.run(password_hasher.verify, stored, password):
+            return None
+        if password_hasher.needs_rehash(stored):
+            # Plaintext or outdated hash: replace it now that the password is known
+            await self.users_collection.update_one(
+                {"user_id": user.user_id, "credentials.password": stored},
+                {"$set": {"credentials.password": await password_hasher.run(password_hasher.hash, password)}}
+            )
+        return user
     
     async def update_user_profile(self, user_id: str, update_data: Dict[str, Any]) -> Optional[User]:
         """Update user profile with new data"""
@@ -0,0 +1,167 @@
+"""
+Nickname Pool
+Pre-generated nicknames and avatars in the nickname_pool collection, bucketed
+by goal type and interest cluster. Signup claims one with a single indexed
+find_one_and_update, so a nickname is handed out at most once across workers.
+Buckets that run low are refilled in the background; fill_nickname_pool.py
+fills every bucket offline.
+"""
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+from schemas.user import UserProfile, UserGoal, GoalType
+from services.metrics_service import metrics_service
+
+NICKNAME_POOL_ENABLED = os.getenv("NICKNAME_POOL_ENABLED", "true").lower() in ("1", "true", "yes")
+# A bucket with fewer unclaimed nicknames than this is refilled by REFILL_SIZE
+NICKNAME_POOL_LOW_WATER = int(os.getenv("NICKNAME_POOL_LOW_WATER", "50"))
+NICKNAME_POOL_REFILL_SIZE = int(os.getenv("NICKNAME_POOL_REFILL_SIZE", "100"))
+
+# Interests mapped onto a cluster by whole words and phrases, first matching interest wins
+INTEREST_CLUSTERS = (
+    ("stem", ("science", "sciences", "math", "maths", "mathematics", "physics", "chemistry", "biology", "engineering",
+              "tech", "technology", "coding", "programming", "computer", "computers", "computing", "data", "robot",
+              "robots", "robotics", "astronomy", "medicine", "ai", "artificial intelligence", "machine learning")),
+    ("arts", ("art", "arts", "music", "design", "drawing", "painting", "photography", "film", "films", "movies",
+              "theater", "theatre", "writing", "poetry", "dance", "dancing", "fashion")),
+    ("humanities", ("history", "philosophy", "literature", "language", "languages", "psychology", "politics",
+                    "economics", "law", "sociology", "business", "reading")),
+    ("sports", ("sport", "sports", "football", "soccer", "basketball", "tennis", "swimming", "running", "cycling",
+                "gym", "fitness", "yoga", "hiking", "climbing")),
+)
+GENERAL_CLUSTER = "general"
+CLUSTERS = tuple(name for name, _ in INTEREST_CLUSTERS) + (GENERAL_CLUSTER,)
+
+MAX_NICKNAME_WORDS = 3
+MAX_NICKNAME_LENGTH = 30
+MAX_AVATAR_LENGTH = 10
+
+_WORDS = re.compile(r"[^a-z0-9]+")
+
+logger = logging.getLogger(__name__)
+
+def interest_cluster(interests: Optional[List[str]]) -> str:
+    """Cluster of the first interest that matches one"""
+    for interest in interests or []:
+        text = " " + _WORDS.sub(" ", interest.lower()).strip() + " "
+        for cluster, keywords in INTEREST_CLUSTERS:
+            if any(f" {keyword} " in text for keyword in keywords):
+                return cluster
+    return GENERAL_CLUSTER
+
+def bucket_key(goal_type: str, cluster: str) -> str:
+    return f"{goal_type}|{cluster}"
+
+def all_buckets() -> List[Tuple[str, str]]:
+    """Every (goal type, interest cluster) pair"""
+    return [(goal_type.value, cluster) for goal_type in GoalType for cluster in CLUSTERS]
+
+def valid_option(nickname: str, avatar: str) -> bool:
+    """Whether a generated nickname and avatar fit the profile fields"""
+    nickname, avatar = nickname.strip(), avatar.strip()
+    return (
+        0 < len(nickname) <= MAX_NICKNAME_LENGTH
+        and len(nickname.split()) <= MAX_NICKNAME_WORDS
+        and 0 < len(avatar) <= MAX_AVATAR_LENGTH
+        and not avatar.isascii()
+    )
+
+class NicknamePool:
+    def __init__(self, db, enabled: bool = NICKNAME_POOL_ENABLED):
+        self.enabled = enabled
+        # _id is the lowercased nickname, so a nickname is stored (and handed out) once across buckets
+        self.collection = db.nickname_pool
+        self.collection.create_index(
+            [("bucket", ASCENDING), ("claimed_by", ASCENDING)],
+            name="bucket_claimed_by"
+        )
+        # Buckets this process is refilling, so a burst of signups starts one refill
+        self._refilling = set()
+        self._lock = threading.Lock()
+
+    def bucket_for(self, profile: UserProfile, goal: UserGoal) -> str:
+        return bucket_key(GoalType(goal.goal_type).value, interest_cluster(profile.intellectual_interests))
+
+    def draw(self, bucket: str, user_id: str) -> Optional[Tuple[str, str]]:
+        """Claim an unused nickname and avatar from the bucket, or None when it is empty"""
+        if not self.enabled:
+            return None
+        with metrics_service.timed("db_write", "mongodb"):
+            option = self.collection.find_one_and_update(
+                {"bucket": bucket, "claimed_by": None},
+                {"$set": {"claimed_by": user_id, "claimed_at": datetime.now(timezone.utc)}},
+                projection={"nickname": 1, "avatar": 1}
+            )
+        metrics_service.nickname_pool.inc(1, "hit" if option else "empty")
+        return (option["nickname"], option["avatar"]) if option else None
+
+    def start_refill(self, bucket: str) -> bool:
+        """True when the bucket is running low and the caller should refill it (with refill())"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            if bucket in self._refilling:
+                return False
+            self._refilling.add(bucket)
+        running_low = False
+        try:
+            running_low = self.unclaimed(bucket, NICKNAME_POOL_LOW_WATER) < NICKNAME_POOL_LOW_WATER
+        finally:
+            # refill() releases a bucket it was handed; release it here otherwise, also when the count failed
+            if not running_low:
+                with self._lock:
+                    self._refilling.discard(bucket)
+        return running_low
+
+    def unclaimed(self, bucket: str, limit: int = 0) -> int:
+        """Unclaimed nicknames in the bucket, counting at most limit (0 for all)"""
+        with metrics_service.timed("db_read", "mongodb"):
+            return self.collection.count_documents({"bucket": bucket, "claimed_by": None}, limit=limit)
+
+    def refill(self, bucket: str, generator, size: int = NICKNAME_POOL_REFILL_SIZE) -> int:
+        """Generate and store up to size new options for a bucket; returns how many were added"""
+        goal_type, cluster = bucket.split("|", 1)
+        added = 0
+        try:
+            # Duplicates and invalid options are dropped, so allow a few extra rounds
+            for _ in range(max(1, 2 * -(-size // generator.BATCH_SIZE))):
+                if added >= size:
+                    break
+                options = generator.generate_batch(goal_type, cluster, min(generator.BATCH_SIZE, size - added))
+                if not options:
+                    break
+                added += self.add(bucket, options)
+        finally:
+            with self._lock:
+                self._refilling.discard(bucket)
+        logger.info("Nickname pool refilled", extra={"bucket": bucket, "added": added})
+        return added
+
+    def add(self, bucket: str, options: List[Tuple[str, str]]) -> int:
+        """Store options in a bucket, skipping nicknames already in the pool; returns how many were new"""
+        documents = {}
+        for nickname, avatar in options:
+            if valid_option(nickname, avatar):
+                nickname = " ".join(nickname.split())
+                documents.setdefault(nickname.lower(), {
+                    "_id": nickname.lower(),
+                    "bucket": bucket,
+                    "nickname": nickname,
+                    "avatar": avatar.strip(),
+                    "claimed_by": None,
+                    "created_at": datetime.now(timezone.utc),
+                })
+        if not documents:
+            return 0
+        try:
+            with metrics_service.timed("db_write", "mongodb"):
+                result = self.collection.insert_many(list(documents.values()), ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Nicknames already in the pool are duplicate keys; the rest were inserted
+            return e.details.get("nInserted", 0)
@@ -0,0 +1,88 @@
+"""
+Password Hasher
+scrypt password hashes (hashlib, no extra dependency) stored in
+credentials.password as "scrypt$n$r$p$salt$hash". Hashing costs tens of
+milliseconds of CPU, so request handlers run it in a small dedicated thread
+pool (scrypt releases the GIL) instead of on the event loop or in the shared
+threadpool. Records still holding a plaintext password are accepted and
+rehashed on the next successful login, as are hashes made with older cost
+parameters.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+from services.metrics_service import metrics_service
+
+# Cost: n=2^14, r=8 uses 16 MiB and roughly 50 ms of CPU per hash
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+PASSWORD_SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+# Concurrent hashes per worker process; more would only queue for the same CPUs
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+SCHEME = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+def _b64decode(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+def is_hashed(stored: str) -> bool:
+    return stored.startswith(f"{SCHEME}$")
+
+class PasswordHasher:
+    def __init__(self, n: int = PASSWORD_SCRYPT_N, r: int = PASSWORD_SCRYPT_R, p: int = PASSWORD_SCRYPT_P,
+                 workers: int = PASSWORD_HASH_WORKERS):
+        self.n, self.r, self.p = n, r, p
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        # Compared against when the account does not exist, so a miss takes as long as a wrong password
+        self._dummy: Optional[str] = None
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(SALT_BYTES)
+        key = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{SCHEME}${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(key)}"
+
+    def verify(self, stored: Optional[str], password: str) -> bool:
+        """Whether password matches the stored hash (or legacy plaintext); None checks against a dummy hash"""
+        if stored is None:
+            if self._dummy is None:
+                self._dummy = self.hash(os.urandom(SALT_BYTES).hex())
+            self.verify(self._dummy, password)
+            return False
+        if not is_hashed(stored):
+            return hmac.compare_digest(stored.encode(), password.encode())
+        try:
+            _, n, r, p, salt, key = stored.split("$")
+            expected = _b64decode(key)
+            derived = self._derive(password, _b64decode(salt), int(n), int(r), int(p), len(expected))
+        except ValueError:
+            return False
+        return hmac.compare_digest(derived, expected)
+
+    def needs_rehash(self, stored: str) -> bool:
+        """True for plaintext records and hashes made with other cost parameters"""
+        return not stored.startswith(f"{SCHEME}${self.n}${self.r}${self.p}$")
+
+    def run(self, function: Callable[..., Any], *args) -> "asyncio.Future[Any]":
+        """Run hashing work (or a call that hashes) in the password pool; await the result"""
+        return asyncio.get_running_loop().run_in_executor(self._pool, function, *args)
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int, length: int = KEY_BYTES) -> bytes:
+        with metrics_service.timed("password_hash", SCHEME):
+            return hashlib.scrypt(
+                password.encode(), salt=salt, n=n, r=r, p=p,
+                # OpenSSL's default 32 MiB cap is too tight for r=8 with larger n
+                maxmem=256 * n * r * p + 2 ** 20, dklen=length
+            )
+
+# Global instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,54 @@
+"""
+Profile Diff Service
+Detects which profile fields actually changed and whether the AI goal depends on them
+"""
+from enum import Enum
+from typing import Dict, Any
+from schemas.user import UserProfile
+
+# Profile fields that GoalGenerator puts into its prompt. Cosmetic fields such as
+# name, nickname and avatar never change the generated goal, so editing them
+# must not trigger an LLM call.
+GOAL_AFFECTING_FIELDS = frozenset({
+    "age",
+    "gender",
+    "weight",
+    "height",
+    "activity_level",
+    "medical_conditions",
+    "dietary_restrictions",
+    "primary_health_goal",
+    "motivation",
+    "lifestyle_vision",
+    "intellectual_interests",
+    "learning_style",
+    "time_availability",
+})
+
+class ProfileDiffService:
+    def diff(self, profile: UserProfile, update_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Return only the entries of update_data that differ from the current profile"""
+        changes = {}
+        for key, value in update_data.items():
+            if value is None or not hasattr(profile, key):
+                continue
+            if self._normalize(getattr(profile, key)) != self._normalize(value):
+                changes[key] = value
+        return changes
+
+    def affects_goal(self, changes: Dict[str, Any]) -> bool:
+        """Check whether any changed field is used to generate the goal"""
+        return any(key in GOAL_AFFECTING_FIELDS for key in changes)
+
+    def _normalize(self, value: Any) -> Any:
+        """Normalize enums and numbers so equal values compare equal"""
+        if isinstance(value, Enum):
+            return value.value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, (list, tuple)):
+            return [self._normalize(item) for item in value]
+        return value
+
+# Global instance
+profile_diff_service = ProfileDiffService()
@@ -0,0 +1,41 @@
+"""
+Request Coalescer
+Concurrent identical requests within one worker share a single computation
+and a single write instead of each running the agents and storing a copy.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+class RequestCoalescer:
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def is_inflight(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the computation already running for key, or start it"""
+        future = self._inflight.get(key)
+        if future is not None:
+            # shield: a disconnecting follower must not cancel the leader's work
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        # Followers may not exist; keep asyncio from logging an unretrieved exception
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[key] = future
+        try:
+            result = await compute()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+# Global coalescer instance
+request_coalescer = RequestCoalescer()
@@ -0,0 +1,188 @@
+"""
+Rollup Service
+Materialized per-user daily, weekly and monthly aggregates in the user_rollups collection.
+Each add_daily_entry increments its buckets; a full rebuild runs a MongoDB aggregation
+pipeline over daily_entries. Rolling 7/30-day windows are read from the day buckets.
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from pymongo import ASCENDING
+from schemas.user import DailyEntry
+
+PERIODS = ("day", "week", "month")
+
+# Entry field each period is grouped on during a rebuild
+PERIOD_FIELDS = {"day": "date", "week": "week", "month": "month"}
+
+# Rolling windows handed to the orchestrator, in days
+WINDOW_SIZES = (7, 30)
+
+# Lifestyle keys usable as field names (no dots or $ operators)
+_METRIC_KEY = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def entry_buckets(entry_date: str) -> Dict[str, str]:
+    """ISO week ("2024-W03") and month ("2024-01") keys for a YYYY-MM-DD date"""
+    year, week, _ = datetime.strptime(entry_date, "%Y-%m-%d").date().isocalendar()
+    return {"week": f"{year}-W{week:02d}", "month": entry_date[:7]}
+
+def bucket_keys(entry_date: str) -> Dict[str, str]:
+    """Bucket key of a date for every rollup period"""
+    return {"day": entry_date, **entry_buckets(entry_date)}
+
+def numeric_metrics(lifestyle: Dict[str, Any]) -> Dict[str, float]:
+    """Lifestyle values that can be averaged"""
+    return {
+        key: value for key, value in (lifestyle or {}).items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and _METRIC_KEY.match(key)
+    }
+
+class RollupStore:
+    def __init__(self, db):
+        self.collection = db.user_rollups
+        self.collection.create_index(
+            [("user_id", ASCENDING), ("period", ASCENDING), ("bucket", ASCENDING)],
+            unique=True,
+            name="user_period_bucket"
+        )
+
+    def record_entry(self, user_id: str, entry: DailyEntry, exercise_minutes: float = 0, sign: int = 1):
+        """Fold one entry into its day, week and month buckets (sign=-1 takes a replaced entry back out)"""
+        increments: Dict[str, Any] = {
+            "entries": sign,
+            "meal_count": sign * len(entry.meals),
+            "exercise_count": sign * len(entry.exercises),
+            "exercise_minutes": sign * exercise_minutes,
+        }
+        for key, value in numeric_metrics(entry.lifestyle).items():
+            increments[f"metrics.{key}.sum"] = sign * value
+            increments[f"metrics.{key}.count"] = sign
+
+        for period, bucket in bucket_keys(entry.date).items():
+            self.collection.update_one(
+                {"user_id": user_id, "period": period, "bucket": bucket},
+                {
+                    "$inc": increments,
+                    "$min": {"first_date": entry.date},
+                    "$max": {"last_date": entry.date},
+                },
+                upsert=True
+            )
+
+    def record_scores(self, user_id: str, entry_date: str, scores: Dict[str, float], sign: int = 1):
+        """Fold agent scores for a day into its buckets (kept across rebuilds)"""
+        increments: Dict[str, Any] = {}
+        for key, value in numeric_metrics(scores).items():
+            increments[f"scores.{key}.sum"] = sign * value
+            increments[f"scores.{key}.count"] = sign
+        if not increments:
+            return
+        for period, bucket in bucket_keys(entry_date).items():
+            self.collection.update_one(
+                {"user_id": user_id, "period": period, "bucket": bucket},
+                {"$inc": increments},
+                upsert=True
+            )
+
+    def has_rollups(self, user_id: str) -> bool:
+        return self.collection.find_one({"user_id": user_id}, {"_id": 1}) is not None
+
+    def rebuild(self, entries_collection, user_id: str) -> int:
+        """Recompute every bucket for a user from daily_entries. Returns buckets written"""
+        written = 0
+        for period in PERIODS:
+            buckets: Dict[str, Dict[str, Any]] = {}
+            for row in entries_collection.aggregate([
+                {"$match": {"user_id": user_id}},
+                {"$group": {
+                    "_id": f"${PERIOD_FIELDS[period]}",
+                    "entries": {"$sum": 1},
+                    "meal_count": {"$sum": {"$size": {"$ifNull": ["$meals", []]}}},
+                    "exercise_count": {"$sum": {"$size": {"$ifNull": ["$exercises", []]}}},
+                    "exercise_minutes": {"$sum": {"$ifNull": ["$exercise_minutes", 0]}},
+                    "first_date": {"$min": "$date"},
+                    "last_date": {"$max": "$date"},
+                }},
+            ]):
+                bucket = row.pop("_id")
+                if bucket is None:
+                    # Entry written without bucket keys; nothing to group it by
+                    continue
+                buckets[bucket] = {**row, "metrics": {}}
+
+            for row in entries_collection.aggregate([
+                {"$match": {"user_id": user_id}},
+                {"$project": {"bucket": f"${PERIOD_FIELDS[period]}", "kv": {"$objectToArray": {"$ifNull": ["$lifestyle", {}]}}}},
+                {"$unwind": "$kv"},
+                {"$match": {"kv.v": {"$type": "number"}}},
+                {"$group": {
+                    "_id": {"bucket": "$bucket", "key": "$kv.k"},
+                    "sum": {"$sum": "$kv.v"},
+                    "count": {"$sum": 1},
+                }},
+            ]):
+                bucket, key = row["_id"]["bucket"], row["_id"]["key"]
+                if bucket in buckets and _METRIC_KEY.match(key):
+                    buckets[bucket]["metrics"][key] = {"sum": row["sum"], "count": row["count"]}
+
+            for bucket, values in buckets.items():
+                self.collection.update_one(
+                    {"user_id": user_id, "period": period, "bucket": bucket},
+                    {"$set": values},
+                    upsert=True
+                )
+                written += 1
+        return written
+
+    def get_buckets(self, user_id: str, period: str, start_bucket: Optional[str] = None,
+                    end_bucket: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Buckets in chronological order with per-metric averages"""
+        query: Dict[str, Any] = {"user_id": user_id, "period": period}
+        bucket_range = {}
+        if start_bucket:
+            bucket_range["$gte"] = start_bucket
+        if end_bucket:
+            bucket_range["$lte"] = end_bucket
+        if bucket_range:
+            query["bucket"] = bucket_range
+
+        results = []
+        for document in self.collection.find(query, {"_id": 0, "user_id": 0, "period": 0}).sort("bucket", ASCENDING):
+            document["averages"] = _averages([document.pop("metrics", {})])
+            document["scores"] = _averages([document.pop("scores", {})])
+            results.append(document)
+        return results
+
+    def get_windows(self, user_id: str, end_date: str) -> Dict[str, Dict[str, Any]]:
+        """Rolling windows ending on end_date, built from at most max(WINDOW_SIZES) day buckets"""
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        start = (end - timedelta(days=max(WINDOW_SIZES) - 1)).isoformat()
+        days = list(self.collection.find(
+            {"user_id": user_id, "period": "day", "bucket": {"$gte": start, "$lte": end_date}},
+            {"_id": 0, "user_id": 0, "period": 0}
+        ))
+
+        windows = {}
+        for size in WINDOW_SIZES:
+            window_start = (end - timedelta(days=size - 1)).isoformat()
+            in_window = [day for day in days if day["bucket"] >= window_start]
+            windows[f"{size}d"] = {
+                "days": size,
+                "days_logged": sum(1 for day in in_window if day.get("entries")),
+                "entries": sum(day.get("entries", 0) for day in in_window),
+                "exercise_count": sum(day.get("exercise_count", 0) for day in in_window),
+                "exercise_minutes": round(sum(day.get("exercise_minutes", 0) for day in in_window), 1),
+                "averages": _averages([day.get("metrics", {}) for day in in_window]),
+                "scores": _averages([day.get("scores", {}) for day in in_window]),
+            }
+        return windows
+
+def _averages(groups: List[Dict[str, Dict[str, float]]]) -> Dict[str, float]:
+    """Merge {key: {sum, count}} maps and return per-key averages"""
+    totals: Dict[str, List[float]] = {}
+    for group in groups:
+        for key, values in group.items():
+            total = totals.setdefault(key, [0.0, 0])
+            total[0] += values.get("sum", 0)
+            total[1] += values.get("count", 0)
+    return {key: round(total / count, 2) for key, (total, count) in totals.items() if count}
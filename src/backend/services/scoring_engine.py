@@ -0,0 +1,369 @@
+"""
+Local Scoring Engine
+Deterministic, table-driven nutrition, exercise and wellness scoring.
+Numeric fields shown in the UI are computed here so the LLM only writes narrative text.
+"""
+import re
+from typing import Dict, Any, List, Optional, Tuple
+from services.food_database import FOOD_DATABASE
+
+# Per-portion nutrition for every food in FOOD_DATABASE plus common additions.
+# calories in kcal, protein in grams, quality is a 0-10 healthfulness rating.
+FOOD_NUTRITION: Dict[str, Dict[str, float]] = {
+    # FOOD_DATABASE common foods
+    "pizza": {"calories": 285, "protein": 12, "quality": 3},
+    "burger": {"calories": 550, "protein": 25, "quality": 3},
+    "pasta": {"calories": 350, "protein": 12, "quality": 5},
+    "rice": {"calories": 205, "protein": 4, "quality": 5},
+    "chicken": {"calories": 230, "protein": 43, "quality": 8},
+    "beef": {"calories": 250, "protein": 26, "quality": 6},
+    "fish": {"calories": 200, "protein": 30, "quality": 9},
+    "salad": {"calories": 150, "protein": 3, "quality": 9},
+    "sandwich": {"calories": 350, "protein": 15, "quality": 5},
+    "soup": {"calories": 150, "protein": 6, "quality": 7},
+    "bread": {"calories": 80, "protein": 3, "quality": 5},
+    "cheese": {"calories": 110, "protein": 7, "quality": 5},
+    "eggs": {"calories": 78, "protein": 6, "quality": 8},
+    "apple": {"calories": 95, "protein": 0.5, "quality": 9},
+    "banana": {"calories": 105, "protein": 1.3, "quality": 9},
+    "orange": {"calories": 62, "protein": 1.2, "quality": 9},
+    "grapes": {"calories": 104, "protein": 1.1, "quality": 8},
+    "strawberry": {"calories": 50, "protein": 1, "quality": 9},
+    "coffee": {"calories": 5, "protein": 0.3, "quality": 6},
+    "tea": {"calories": 2, "protein": 0, "quality": 7},
+    "milk": {"calories": 150, "protein": 8, "quality": 7},
+    "water": {"calories": 0, "protein": 0, "quality": 10},
+    "juice": {"calories": 110, "protein": 1, "quality": 5},
+    "boiled egg": {"calories": 78, "protein": 6, "quality": 8},
+    "hard boiled egg": {"calories": 78, "protein": 6, "quality": 8},
+    "fried egg": {"calories": 90, "protein": 6, "quality": 6},
+    "scrambled egg": {"calories": 100, "protein": 7, "quality": 7},
+    "omelet": {"calories": 190, "protein": 13, "quality": 7},
+    # Extensions
+    "carrots": {"calories": 50, "protein": 1, "quality": 10},
+    "broccoli": {"calories": 55, "protein": 4, "quality": 10},
+    "spinach": {"calories": 40, "protein": 5, "quality": 10},
+    "vegetables": {"calories": 60, "protein": 2, "quality": 10},
+    "potato": {"calories": 160, "protein": 4, "quality": 6},
+    "sweet potato": {"calories": 115, "protein": 2, "quality": 8},
+    "fries": {"calories": 365, "protein": 4, "quality": 2},
+    "yogurt": {"calories": 150, "protein": 12, "quality": 8},
+    "oatmeal": {"calories": 160, "protein": 6, "quality": 9},
+    "cereal": {"calories": 200, "protein": 4, "quality": 5},
+    "granola": {"calories": 300, "protein": 7, "quality": 6},
+    "toast": {"calories": 80, "protein": 3, "quality": 5},
+    "bagel": {"calories": 280, "protein": 11, "quality": 4},
+    "pancake": {"calories": 175, "protein": 5, "quality": 3},
+    "waffle": {"calories": 220, "protein": 6, "quality": 3},
+    "noodles": {"calories": 220, "protein": 7, "quality": 4},
+    "ramen": {"calories": 380, "protein": 10, "quality": 3},
+    "quinoa": {"calories": 220, "protein": 8, "quality": 9},
+    "tofu": {"calories": 180, "protein": 20, "quality": 9},
+    "beans": {"calories": 225, "protein": 15, "quality": 9},
+    "lentils": {"calories": 230, "protein": 18, "quality": 9},
+    "turkey": {"calories": 190, "protein": 29, "quality": 8},
+    "pork": {"calories": 240, "protein": 27, "quality": 6},
+    "steak": {"calories": 400, "protein": 45, "quality": 6},
+    "salmon": {"calories": 280, "protein": 39, "quality": 10},
+    "tuna": {"calories": 180, "protein": 39, "quality": 9},
+    "shrimp": {"calories": 100, "protein": 20, "quality": 8},
+    "sushi": {"calories": 300, "protein": 12, "quality": 7},
+    "burrito": {"calories": 600, "protein": 25, "quality": 4},
+    "taco": {"calories": 200, "protein": 9, "quality": 4},
+    "curry": {"calories": 450, "protein": 20, "quality": 6},
+    "avocado": {"calories": 240, "protein": 3, "quality": 9},
+    "nuts": {"calories": 170, "protein": 6, "quality": 8},
+    "peanut butter": {"calories": 190, "protein": 8, "quality": 6},
+    "fruit": {"calories": 80, "protein": 1, "quality": 9},
+    "berries": {"calories": 70, "protein": 1, "quality": 10},
+    "smoothie": {"calories": 250, "protein": 5, "quality": 7},
+    "protein shake": {"calories": 200, "protein": 25, "quality": 7},
+    "chips": {"calories": 160, "protein": 2, "quality": 1},
+    "cookie": {"calories": 150, "protein": 2, "quality": 1},
+    "cake": {"calories": 350, "protein": 4, "quality": 1},
+    "donut": {"calories": 260, "protein": 3, "quality": 1},
+    "chocolate": {"calories": 230, "protein": 3, "quality": 2},
+    "ice cream": {"calories": 270, "protein": 5, "quality": 1},
+    "soda": {"calories": 150, "protein": 0, "quality": 0},
+    "energy drink": {"calories": 110, "protein": 0, "quality": 1},
+    "beer": {"calories": 155, "protein": 2, "quality": 1},
+    "wine": {"calories": 125, "protein": 0, "quality": 2},
+}
+
+# Categories for the added foods, merged with FOOD_DATABASE["food_categories"]
+EXTRA_FOOD_CATEGORIES: Dict[str, List[str]] = {
+    "protein": ["turkey", "pork", "steak", "salmon", "tuna", "shrimp", "tofu", "beans", "lentils",
+                "boiled egg", "hard boiled egg", "fried egg", "scrambled egg", "omelet", "protein shake"],
+    "vegetables": ["vegetables", "sweet potato", "potato"],
+    "fruits": ["fruit", "berries", "avocado", "smoothie"],
+    "grains": ["oatmeal", "cereal", "granola", "toast", "bagel", "noodles", "quinoa"],
+    "dairy": ["yogurt"],
+}
+
+# Grams (or millilitres for drinks) in one FOOD_NUTRITION portion, to scale amounts given by weight or volume
+PORTION_GRAMS: Dict[str, float] = {
+    "pizza": 107, "burger": 220, "pasta": 220, "rice": 160, "chicken": 140, "beef": 100, "fish": 150,
+    "salad": 200, "sandwich": 150, "soup": 250, "bread": 30, "cheese": 28, "eggs": 50, "apple": 180,
+    "banana": 120, "orange": 130, "grapes": 150, "strawberry": 150, "coffee": 240, "tea": 240, "milk": 244,
+    "water": 250, "juice": 250, "boiled egg": 50, "hard boiled egg": 50, "fried egg": 46, "scrambled egg": 61,
+    "omelet": 120, "carrots": 120, "broccoli": 150, "spinach": 180, "vegetables": 150, "potato": 170,
+    "sweet potato": 130, "fries": 117, "yogurt": 170, "oatmeal": 240, "cereal": 55, "granola": 65, "toast": 30,
+    "bagel": 105, "pancake": 77, "waffle": 75, "noodles": 160, "ramen": 300, "quinoa": 185, "tofu": 125,
+    "beans": 170, "lentils": 200, "turkey": 140, "pork": 115, "steak": 180, "salmon": 150, "tuna": 150,
+    "shrimp": 85, "sushi": 200, "burrito": 250, "taco": 100, "curry": 300, "avocado": 150, "nuts": 28,
+    "peanut butter": 32, "fruit": 150, "berries": 150, "smoothie": 300, "protein shake": 300, "chips": 28,
+    "cookie": 35, "cake": 100, "donut": 60, "chocolate": 45, "ice cream": 130, "soda": 355,
+    "energy drink": 250, "beer": 355, "wine": 150,
+}
+DEFAULT_PORTION_GRAMS = 150
+
+# Weight and volume units in grams (millilitres count as grams)
+UNIT_GRAMS: Dict[str, float] = {
+    "g": 1, "gr": 1, "gram": 1, "grams": 1, "kg": 1000, "kilo": 1000, "kilos": 1000, "ml": 1, "cl": 10,
+    "l": 1000, "liter": 1000, "liters": 1000, "litre": 1000, "litres": 1000, "oz": 28.35, "ounce": 28.35,
+    "ounces": 28.35, "lb": 453.6, "lbs": 453.6, "pound": 453.6, "pounds": 453.6, "cup": 240, "cups": 240,
+    "glass": 250, "glasses": 250, "tbsp": 15, "tablespoon": 15, "tablespoons": 15, "tsp": 5, "teaspoon": 5,
+    "teaspoons": 5,
+}
+# Units that count portions
+PORTION_UNITS = ("slice", "slices", "piece", "pieces", "serving", "servings", "portion", "portions",
+                 "bowl", "bowls", "plate", "plates")
+
+# Alternative spellings mapped onto FOOD_NUTRITION keys
+FOOD_SYNONYMS: Dict[str, str] = {
+    "egg": "eggs", "omelette": "omelet", "hamburger": "burger", "cheeseburger": "burger",
+    "spaghetti": "pasta", "veggies": "vegetables", "veg": "vegetables", "greens": "salad",
+    "oats": "oatmeal", "porridge": "oatmeal", "french fries": "fries", "crisps": "chips",
+    "doughnut": "donut", "coke": "soda", "pop": "soda", "latte": "milk", "cappuccino": "milk",
+    "strawberries": "strawberry", "blueberries": "berries", "raspberries": "berries",
+    "almonds": "nuts", "walnuts": "nuts", "peanuts": "nuts", "chickpeas": "beans",
+}
+
+# Metabolic equivalents (MET) for common activities
+EXERCISE_METS: Dict[str, float] = {
+    "running": 9.8, "jogging": 7.0, "sprint": 12.0, "walking": 3.5, "hiking": 6.0,
+    "cycling": 7.5, "swimming": 8.0, "rowing": 7.0, "jump rope": 12.3, "hiit": 8.0,
+    "push-ups": 8.0, "pull-ups": 8.0, "sit-ups": 8.0, "squats": 5.0, "burpees": 8.0,
+    "plank": 3.8, "weightlifting": 5.0, "gym": 5.0, "strength training": 5.0,
+    "yoga": 2.5, "pilates": 3.0, "stretching": 2.3, "dancing": 5.0, "climbing": 8.0,
+    "basketball": 6.5, "soccer": 7.0, "football": 8.0, "tennis": 7.3, "badminton": 5.5,
+    "volleyball": 4.0, "skating": 7.0, "boxing": 9.0, "martial arts": 10.0, "elliptical": 5.0,
+}
+
+EXERCISE_SYNONYMS: Dict[str, str] = {
+    "run": "running", "ran": "running", "jog": "jogging", "walk": "walking", "walked": "walking",
+    "hike": "hiking", "bike": "cycling", "biking": "cycling", "cycle": "cycling", "swim": "swimming",
+    "swam": "swimming", "pushups": "push-ups", "push ups": "push-ups", "pushup": "push-ups",
+    "pullups": "pull-ups", "pull ups": "pull-ups", "situps": "sit-ups", "sit ups": "sit-ups",
+    "crunches": "sit-ups", "squat": "squats", "lifting": "weightlifting", "weights": "weightlifting",
+    "workout": "gym", "dance": "dancing", "skipping": "jump rope", "karate": "martial arts",
+}
+
+# Minutes per kilometre used when an activity is given as a distance
+DISTANCE_PACE = {"running": 6.0, "jogging": 7.0, "walking": 12.0, "hiking": 15.0, "cycling": 3.0, "swimming": 25.0}
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12, "half": 0.5, "couple": 2, "few": 3,
+}
+FRACTION_CHARACTERS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3}
+
+DEFAULT_FOOD = {"calories": 250, "protein": 8, "quality": 5}
+DEFAULT_EXERCISE_MET = 5.0
+DEFAULT_EXERCISE_MINUTES = 30
+DEFAULT_WEIGHT_KG = 70.0
+SECONDS_PER_REP = 3
+DEFAULT_REPS_PER_SET = 10
+
+_ITEM_SPLIT = re.compile(r",|;|\+|&|\band\b|\bwith\b|\bplus\b")
+_MEAL_LABEL = re.compile(r"^\s*(breakfast|lunch|dinner|snack|brunch|supper)\s*[:\-]\s*")
+# "2", "1.5", "1/2", "1 1/2", "½" or a number word, then an optional unit: "250 ml", "2 slices of", "3x"
+_AMOUNT = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?|[" + "".join(FRACTION_CHARACTERS) + r"]|(?:" + "|".join(NUMBER_WORDS) + r")\b"
+_UNITS = "|".join(sorted(list(UNIT_GRAMS) + list(PORTION_UNITS), key=len, reverse=True))
+_QUANTITY = re.compile(r"^\s*(" + _AMOUNT + r")\s*(?:x\s*|(" + _UNITS + r")\.?\b\s*(?:of\s+)?)?")
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*(hours?|hrs?|h|minutes?|mins?|m)\b")
+_DISTANCE = re.compile(r"(\d+(?:\.\d+)?)\s*(km|k|kilometers?|kilometres?|miles?|mi)\b")
+_SETS = re.compile(r"(\d+)\s*(?:sets?\s*(?:of\s*)?(?:(\d+)\s*(?:reps?\s*(?:of\s*)?)?)?|x\s*(\d+))")
+_REPS = re.compile(r"(\d+)\s*(?:reps?\s*(?:of\s*)?)?(?=\s*[a-z])")
+
+class ScoringEngine:
+    def __init__(self):
+        self.food_categories = self._build_food_categories()
+        self.food_pattern = self._compile_names(set(FOOD_NUTRITION) | set(FOOD_SYNONYMS))
+        self.exercise_pattern = self._compile_names(set(EXERCISE_METS) | set(EXERCISE_SYNONYMS))
+
+    def _compile_names(self, names) -> re.Pattern:
+        """Build one whole-word matcher, longest names first so multi-word foods win"""
+        alternatives = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+        return re.compile(r"\b(" + alternatives + r")(?:e?s)?\b")
+
+    def _build_food_categories(self) -> Dict[str, str]:
+        """Map each food to its category, starting from the shared food database"""
+        categories = {}
+        for source in (FOOD_DATABASE["food_categories"], EXTRA_FOOD_CATEGORIES):
+            for category, foods in source.items():
+                for food in foods:
+                    categories.setdefault(food, category)
+        return categories
+
+    def estimate_meals(self, meals: List[str]) -> Dict[str, Any]:
+        """Estimate calories, protein and a 0-10 nutrition score for the day's meals"""
+        items = []
+        for meal in meals:
+            text = _MEAL_LABEL.sub("", meal.lower())
+            for part in _ITEM_SPLIT.split(text):
+                if part.strip():
+                    items.extend(self._match_foods(part))
+
+        if not items:
+            return {"calories": 0, "protein": 0.0, "nutrition_score": 0.0, "categories": [], "items": []}
+
+        calories = sum(item["calories"] for item in items)
+        protein = sum(item["protein"] for item in items)
+
+        # Calorie-weighted quality, so a soda doesn't count as much as a meal
+        weights = [max(item["calories"], 20) for item in items]
+        quality = sum(item["quality"] * weight for item, weight in zip(items, weights)) / sum(weights)
+
+        categories = sorted({item["category"] for item in items if item["category"]})
+        variety_bonus = 0.4 * max(0, len(categories) - 1)
+        nutrition_score = min(10.0, max(0.0, quality + variety_bonus))
+
+        return {
+            "calories": int(round(calories)),
+            "protein": round(protein, 1),
+            "nutrition_score": round(nutrition_score, 1),
+            "categories": categories,
+            "items": items
+        }
+
+    def _match_foods(self, text: str) -> List[Dict[str, Any]]:
+        """Match one meal component against the food table; a leading amount applies to the first food"""
+        amount, unit, rest = self._parse_quantity(text)
+        names = [match.group(1) for match in self.food_pattern.finditer(rest)]
+        if not names:
+            return [self._food_item(rest.strip(), DEFAULT_FOOD, None, self._portions(amount, unit, DEFAULT_PORTION_GRAMS))]
+
+        items = []
+        for index, name in enumerate(names):
+            name = FOOD_SYNONYMS.get(name, name)
+            quantity = self._portions(amount, unit, PORTION_GRAMS.get(name, DEFAULT_PORTION_GRAMS)) if index == 0 else 1.0
+            items.append(self._food_item(name, FOOD_NUTRITION[name], self.food_categories.get(name), quantity))
+        return items
+
+    def _portions(self, amount: float, unit: Optional[str], portion_grams: float) -> float:
+        """Portions in an amount: weights and volumes are divided by the portion size, counts are taken as is"""
+        if unit in UNIT_GRAMS:
+            return amount * UNIT_GRAMS[unit] / portion_grams
+        return amount
+
+    def _food_item(self, name: str, food: Dict[str, float], category: Optional[str], quantity: float) -> Dict[str, Any]:
+        """Scale a food table row by its quantity"""
+        return {
+            "name": name,
+            "quantity": quantity,
+            "calories": food["calories"] * quantity,
+            "protein": food["protein"] * quantity,
+            "quality": food["quality"],
+            "category": category
+        }
+
+    def estimate_exercises(self, exercises: List[str], weight_kg: Optional[float] = None) -> Dict[str, Any]:
+        """Estimate calories burned from exercise descriptions using MET values"""
+        weight_kg = weight_kg or DEFAULT_WEIGHT_KG
+        items = [self._match_exercise(exercise.lower(), weight_kg) for exercise in exercises if exercise.strip()]
+
+        return {
+            "calories_burned": int(round(sum(item["calories_burned"] for item in items))),
+            "active_minutes": int(round(sum(item["minutes"] for item in items))),
+            "items": items
+        }
+
+    def _match_exercise(self, text: str, weight_kg: float) -> Dict[str, Any]:
+        """Match one exercise description and estimate its duration and energy cost"""
+        name = self._find_name(text, self.exercise_pattern)
+        name = EXERCISE_SYNONYMS.get(name, name)
+        met = EXERCISE_METS.get(name, DEFAULT_EXERCISE_MET)
+
+        minutes = self._parse_minutes(text, name)
+        calories_burned = met * weight_kg * minutes / 60
+
+        return {"name": name or text.strip(), "met": met, "minutes": minutes, "calories_burned": calories_burned}
+
+    def _parse_minutes(self, text: str, name: Optional[str]) -> float:
+        """Read a duration, distance or rep count from an exercise description"""
+        duration = _DURATION.search(text)
+        if duration:
+            value, unit = float(duration.group(1)), duration.group(2)
+            return value * 60 if unit.startswith("h") else value
+
+        distance = _DISTANCE.search(text)
+        if distance:
+            kilometres = float(distance.group(1))
+            if distance.group(2).startswith("mi"):
+                kilometres *= 1.609
+            return kilometres * DISTANCE_PACE.get(name, 8.0)
+
+        sets = _SETS.search(text)
+        if sets:
+            # Sets and reps count repetitions, they are not minutes
+            reps_per_set = sets.group(2) or sets.group(3)
+            return int(sets.group(1)) * int(reps_per_set or DEFAULT_REPS_PER_SET) * SECONDS_PER_REP / 60
+
+        reps = _REPS.search(text)
+        if reps:
+            return int(reps.group(1)) * SECONDS_PER_REP / 60
+
+        return DEFAULT_EXERCISE_MINUTES
+
+    def wellness_score(self, lifestyle_data: Dict[str, Any]) -> float:
+        """Score sleep, screen time and stress on a 0-10 scale"""
+        sleep_hours = self._number(lifestyle_data.get("sleep_hours"), 8)
+        screen_time = self._number(lifestyle_data.get("screen_time"), 2)
+        stress_level = self._number(lifestyle_data.get("stress_level"), 5)
+
+        sleep_score = min(10, sleep_hours * 1.25)  # Optimal is 8 hours
+        screen_score = max(0, 10 - (screen_time * 1.5))  # Less screen time is better
+        stress_score = max(0, 10 - stress_level)  # Lower stress is better
+
+        return round((sleep_score + screen_score + stress_score) / 3, 1)
+
+    def overall_health_score(self, nutrition_score: float, calories_burned: int, wellness_score: float) -> float:
+        """Combine the three agent scores into the overall 0-10 health score"""
+        exercise_score = min(10, calories_burned / 50)  # Convert to 0-10 scale
+        return round((nutrition_score + exercise_score + wellness_score) / 3, 1)
+
+    def _parse_quantity(self, text: str) -> Tuple[float, Optional[str], str]:
+        """Split a leading amount such as '2', 'two', '1/2 cup' or '250 ml' (value, unit) from the rest of the text"""
+        match = _QUANTITY.match(text)
+        if not match:
+            return 1.0, None, text
+        return self._amount(match.group(1)), match.group(2), text[match.end():]
+
+    def _amount(self, token: str) -> float:
+        """Value of a number, number word, fraction or mixed number"""
+        if token in NUMBER_WORDS:
+            return float(NUMBER_WORDS[token])
+        if token in FRACTION_CHARACTERS:
+            return FRACTION_CHARACTERS[token]
+        whole, _, fraction = token.rpartition(" ")
+        if "/" in fraction:
+            numerator, denominator = fraction.split("/")
+            value = int(numerator) / int(denominator) if int(denominator) else 0.0
+            return (float(whole) if whole.strip() else 0.0) + value
+        return float(token)
+
+    def _find_name(self, text: str, pattern: re.Pattern) -> Optional[str]:
+        """Find the first table name that appears as whole words in the text"""
+        match = pattern.search(text)
+        return match.group(1) if match else None
+
+    def _number(self, value: Any, default: float) -> float:
+        """Coerce a lifestyle value to a float, falling back to a default"""
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return default
+
+# Global instance
+scoring_engine = ScoringEngine()
@@ -0,0 +1,102 @@
+"""
+Session Tokens
+Signed session tokens (JWT, HS256) issued at login and signup. A token carries
+only the user id and its lifetime, so a request can be tied to an existing user
+without a MongoDB lookup; handlers that need the profile or goal still read it.
+Verification is one HMAC-SHA256 over the token and a JSON decode.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import time
+from typing import Any, Dict, Optional
+from schemas.user import User
+from services.metrics_service import metrics_service
+
+# Without SESSION_SECRET a random key is used: tokens then end with the process, and with
+# several workers they are only shared when the app is preloaded in the master (gunicorn.conf.py
+# refuses to start several workers without preloading, and SESSION_REQUIRED refuses a random key)
+SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_MINUTES", "60")) * 60
+# When true, user endpoints reject requests without a valid token instead of trusting the raw user_id
+SESSION_REQUIRED = os.getenv("SESSION_REQUIRED", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+class InvalidSessionToken(ValueError):
+    """A token that is malformed, not signed by this deployment, or expired"""
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+_HEADER = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+class SessionTokens:
+    def __init__(self, secret: str = SESSION_SECRET, ttl_seconds: int = SESSION_TTL_SECONDS,
+                 required: bool = SESSION_REQUIRED):
+        if not secret:
+            if required:
+                # Every restart would log every user out
+                raise RuntimeError("SESSION_REQUIRED is set but SESSION_SECRET is not")
+            logger.warning("SESSION_SECRET is not set, signing session tokens with a per-process random key")
+            secret = secrets.token_urlsafe(32)
+        self._key = secret.encode()
+        self.ttl_seconds = ttl_seconds
+
+    def issue(self, user: User) -> str:
+        """Token for a user, valid for ttl_seconds"""
+        now = int(time.time())
+        claims = {
+            "sub": user.id,
+            "iat": now,
+            "exp": now + self.ttl_seconds,
+        }
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        return f"{_HEADER}.{payload}.{self._sign(_HEADER, payload)}"
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Claims of a valid token; raises InvalidSessionToken otherwise"""
+        try:
+            header, payload, signature = token.split(".")
+        except ValueError:
+            raise InvalidSessionToken("malformed")
+        # Only our own header is accepted, which rules out alg=none and algorithm confusion
+        if header != _HEADER or not hmac.compare_digest(signature, self._sign(header, payload)):
+            raise InvalidSessionToken("bad signature")
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            raise InvalidSessionToken("malformed")
+        if not isinstance(claims, dict) or not isinstance(claims.get("exp"), int) or "sub" not in claims:
+            raise InvalidSessionToken("malformed")
+        if claims["exp"] < time.time():
+            raise InvalidSessionToken("expired")
+        return claims
+
+    def authenticate(self, authorization: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Claims from an Authorization: Bearer header, None when there is none; raises InvalidSessionToken"""
+        if not authorization:
+            return None
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token.strip():
+            return None
+        try:
+            claims = self.verify(token.strip())
+        except InvalidSessionToken as e:
+            metrics_service.session_tokens.inc(1, "expired" if str(e) == "expired" else "invalid")
+            raise
+        metrics_service.session_tokens.inc(1, "valid")
+        return claims
+
+    def _sign(self, header: str, payload: str) -> str:
+        return _b64encode(hmac.new(self._key, f"{header}.{payload}".encode(), hashlib.sha256).digest())
+
+# Global instance
+session_tokens = SessionTokens()
@@ -0,0 +1,180 @@
+"""
+Similarity Cache
+Reuses an agent's written analysis for meal or exercise lists that say the
+same thing in other words ("2 eggs and toast" / "toast, two eggs"). Text is
+normalised locally (number words, synonyms from the scoring tables, plurals,
+filler and unit words, word order) into a set of word and character-trigram
+shingles; MinHash/LSH finds candidates and the exact Jaccard similarity of the
+shingle sets decides. Numbers are always recomputed by the scoring engine for
+the current input, so a hit only reuses the text, and only while the quantity
+(calories or active minutes) is within SIMILARITY_MAX_SCALE of the cached one.
+"""
+import hashlib
+import os
+import random
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from services.metrics_service import metrics_service
+from services.scoring_engine import FOOD_SYNONYMS, EXERCISE_SYNONYMS, NUMBER_WORDS
+
+SIMILARITY_CACHE_ENABLED = os.getenv("SIMILARITY_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SIMILARITY_CACHE_SIZE = int(os.getenv("SIMILARITY_CACHE_SIZE", "5000"))
+SIMILARITY_MAX_SCALE = float(os.getenv("SIMILARITY_MAX_SCALE", "1.5"))
+THRESHOLDS = {
+    "food": float(os.getenv("FOOD_SIMILARITY_THRESHOLD", "0.8")),
+    "exercise": float(os.getenv("EXERCISE_SIMILARITY_THRESHOLD", "0.85")),
+}
+SYNONYMS = {"food": FOOD_SYNONYMS, "exercise": EXERCISE_SYNONYMS}
+
+# 64 hash functions in 16 bands of 4: pairs above ~0.5 similarity usually share a band
+NUM_PERMUTATIONS = 64
+BAND_ROWS = 4
+_PRIME = (1 << 61) - 1
+_rng = random.Random(46)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+# Words that do not change what was eaten or done
+FILLER_WORDS = {
+    "a", "an", "the", "of", "and", "with", "some", "my", "i", "had", "ate", "have", "did", "went", "for",
+    "in", "on", "at", "to", "plus", "x", "about", "around", "then", "also", "breakfast", "lunch", "dinner",
+    "snack", "brunch", "supper", "slice", "piece", "cup", "bowl", "glass", "plate", "serving", "portion",
+    "g", "gram", "kg", "ml", "oz", "minute", "min", "hour", "hr", "h", "m", "km", "k", "mile", "mi", "rep", "set",
+}
+
+_WORD = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+
+class _Entry:
+    def __init__(self, shingles: FrozenSet[str], bands: List[Tuple[int, ...]], amount: float, result: Dict[str, Any]):
+        self.shingles = shingles
+        self.bands = bands
+        self.amount = amount
+        self.result = result
+
+class _Index:
+    """LRU of entries for one kind, with the LSH band buckets pointing into it"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries: "OrderedDict[FrozenSet[str], _Entry]" = OrderedDict()
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], set] = {}
+
+    def candidates(self, shingles: FrozenSet[str], bands: List[Tuple[int, ...]]) -> List[_Entry]:
+        exact = self.entries.get(shingles)
+        if exact is not None:
+            return [exact]
+        keys = set()
+        for index, band in enumerate(bands):
+            keys |= self.buckets.get((index, band), set())
+        return [self.entries[key] for key in keys]
+
+    def add(self, entry: _Entry):
+        if entry.shingles in self.entries:
+            self._remove(entry.shingles)
+        self.entries[entry.shingles] = entry
+        for index, band in enumerate(entry.bands):
+            self.buckets.setdefault((index, band), set()).add(entry.shingles)
+        while len(self.entries) > self.capacity:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, key: FrozenSet[str]):
+        entry = self.entries.pop(key)
+        for index, band in enumerate(entry.bands):
+            bucket = self.buckets.get((index, band))
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[(index, band)]
+
+class SimilarityCache:
+    def __init__(self, enabled: bool = SIMILARITY_CACHE_ENABLED, capacity: int = SIMILARITY_CACHE_SIZE):
+        self.enabled = enabled
+        self._indexes = {kind: _Index(capacity) for kind in THRESHOLDS}
+        self._lock = threading.Lock()
+
+    def lookup(self, kind: str, texts: List[str], amount: float) -> Optional[Dict[str, Any]]:
+        """A cached analysis for near-identical texts with a comparable quantity, or None"""
+        if not self.enabled:
+            return None
+        shingles = self.shingles(kind, texts)
+        if not shingles:
+            return None
+        bands = _bands(_signature(shingles))
+        best, best_similarity = None, 0.0
+        with self._lock:
+            index = self._indexes[kind]
+            for entry in index.candidates(shingles, bands):
+                similarity = len(shingles & entry.shingles) / len(shingles | entry.shingles)
+                if similarity > best_similarity:
+                    best, best_similarity = entry, similarity
+            if best is not None and best_similarity >= THRESHOLDS[kind]:
+                index.entries.move_to_end(best.shingles)
+
+        if best is None or best_similarity < THRESHOLDS[kind]:
+            self._count(kind, "miss")
+            return None
+        if not _comparable(amount, best.amount):
+            self._count(kind, "scale_mismatch")
+            return None
+        self._count(kind, "exact" if best_similarity == 1.0 else "near")
+        if metrics_service.enabled:
+            metrics_service.similarity_cache_score.observe(best_similarity, kind)
+        return dict(best.result)
+
+    def store(self, kind: str, texts: List[str], amount: float, result: Dict[str, Any]):
+        """Remember the LLM-written part of an analysis for these texts"""
+        if not self.enabled:
+            return
+        shingles = self.shingles(kind, texts)
+        if not shingles:
+            return
+        entry = _Entry(shingles, _bands(_signature(shingles)), amount, dict(result))
+        with self._lock:
+            self._indexes[kind].add(entry)
+
+    def shingles(self, kind: str, texts: List[str]) -> FrozenSet[str]:
+        """Order-insensitive word and character-trigram shingles of the normalised texts"""
+        words = set()
+        for text in texts:
+            text = text.lower()
+            for phrase, canonical in SYNONYMS[kind].items():
+                if " " in phrase and phrase in text:
+                    text = text.replace(phrase, canonical)
+            for word in _WORD.findall(text):
+                if word[0].isdigit() or word in NUMBER_WORDS:
+                    # Quantities are compared separately, through the recomputed amount
+                    continue
+                word = _singular(SYNONYMS[kind].get(word, word))
+                if word not in FILLER_WORDS:
+                    words.add(word)
+        shingles = set(words)
+        for word in words:
+            padded = f"^{word}$"
+            shingles.update(padded[i:i + 3] for i in range(len(padded) - 2))
+        return frozenset(shingles)
+
+    def _count(self, kind: str, result: str):
+        metrics_service.similarity_cache.inc(1, kind, result)
+
+def _singular(word: str) -> str:
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+def _signature(shingles: FrozenSet[str]) -> List[int]:
+    """MinHash signature: the minimum of each permuted hash over the shingles"""
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big") for shingle in shingles]
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+def _bands(signature: List[int]) -> List[Tuple[int, ...]]:
+    return [tuple(signature[i:i + BAND_ROWS]) for i in range(0, len(signature), BAND_ROWS)]
+
+def _comparable(amount: float, cached_amount: float) -> bool:
+    """Whether two quantities are within SIMILARITY_MAX_SCALE of each other"""
+    if amount <= 0 or cached_amount <= 0:
+        return amount == cached_amount
+    return max(amount, cached_amount) / min(amount, cached_amount) <= SIMILARITY_MAX_SCALE
+
+# Global instance
+similarity_cache = SimilarityCache()
@@ -1,27 +1,109 @@
 from typing import Optional, List, Dict, Any
-from datetime import datetime
-from pymongo import MongoClient
+from datetime import datetime, date, timedelta, timezone
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from bson import ObjectId
+from bson.errors import InvalidId
+import base64
+import hashlib
+import json
+import logging
 import os
 from dotenv import load_dotenv
 from schemas.user import User, UserCredentials, UserProfile, UserGoal, UserProgress, DailyEntry, GoalType, ActivityLevel, Gender
 from agents.goal_generator import GoalGenerator
+from agents.personalization_generator import PersonalizationGenerator
+from services.goal_template_service import GoalTemplateStore
+from services.metrics_service import metrics_service
+from services.nickname_pool import NicknamePool
+from services.password_hasher import password_hasher, is_hashed
+from services.rollup_service import RollupStore, entry_buckets, bucket_keys
+from services.scoring_engine import scoring_engine
+from services.user_change_tracker import user_change_tracker, version_filter, ConcurrentUpdateError
 import uuid
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# How long a response is replayed for a retried Idempotency-Key
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24")) * 3600
+
+# Entry fields a history query may project; date is always returned
+ENTRY_FIELDS = ("meals", "exercises", "lifestyle", "created_at")
+
 class SyncMongoDBUserService:
+    # Number of read-modify-write attempts before giving up on a contended user
+    MAX_UPDATE_RETRIES = 3
+    # Upper bound on entries returned by one history page
+    MAX_PAGE_SIZE = 366
+    
     def __init__(self):
+        self._connect()
+        self.goal_generator = GoalGenerator(self.goal_templates)
+        self.personalization_generator = PersonalizationGenerator(self.nickname_pool)
+        # Users whose documents this process has already checked for embedded entries
+        self._entries_split = set()
+    
+    def _connect(self):
+        """Open a client and connection pool for the current process"""
         mongodb_url = os.getenv("MONGODB_URL")
         # Use connection string as-is, let MongoDB handle TLS automatically
         self.client = MongoClient(mongodb_url)
         self.db = self.client.mindscroll
         self.users_collection = self.db.users
-        self.goal_generator = GoalGenerator()
+        # One document per daily entry so history reads are indexed range scans
+        self.entries_collection = self.db.daily_entries
+        self.entries_collection.create_index(
+            [("user_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)],
+            name="user_date"
+        )
+        self._create_day_index()
+        self.rollups = RollupStore(self.db)
+        # Responses keyed by Idempotency-Key, expired by a TTL index
+        self.idempotency_collection = self.db.idempotency_keys
+        self.idempotency_collection.create_index(
+            "created_at", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS, name="idempotency_ttl"
+        )
+        # LLM tokens per user per day; the index lists a day's most expensive users first
+        self.llm_usage_collection = self.db.llm_usage
+        self.llm_usage_collection.create_index(
+            [("date", DESCENDING), ("total_tokens", DESCENDING)],
+            name="date_total_tokens"
+        )
+        # Goal skeletons per profile bucket, shared by every worker
+        self.goal_templates = GoalTemplateStore(self.db)
+        # Signup nicknames and avatars, claimed once each
+        self.nickname_pool = NicknamePool(self.db)
+    
+    def _create_day_index(self):
+        """At most one entry per user and day; resubmissions replace it"""
+        try:
+            self.entries_collection.create_index(
+                [("user_id", ASCENDING), ("date", ASCENDING)],
+                unique=True,
+                name="user_day_unique"
+            )
+        except OperationFailure as e:
+            # Older data may hold several entries for a day until merge_duplicate_entries() runs
+            logger.warning("daily_entries has duplicate days, unique index not created: %s", e)
+    
+    def reconnect(self):
+        """Replace a client inherited through fork; MongoClient is not fork-safe"""
+        # The inherited client is dropped rather than closed: closing it would
+        # touch sockets and monitor state that still belong to the parent
+        self._connect()
+        self.goal_generator.templates = self.goal_templates
+        self.personalization_generator.pool = self.nickname_pool
     
     def create_user(self, credentials: UserCredentials, profile: UserProfile) -> User:
         """Create a new user with AI-generated goal"""
         user_id = str(uuid.uuid4())
         
+        # Only the password hash is stored; callers on the event loop hash beforehand in the password pool
+        if not is_hashed(credentials.password):
+            credentials = credentials.model_copy(update={"password": password_hasher.hash(credentials.password)})
+        
         # Generate AI goal based on profile
         goal = self.goal_generator.generate_goal(profile)
         
@@ -42,12 +124,14 @@ class SyncMongoDBUserService:
             "goal": goal.model_dump(mode='json'),
             "progress": progress.model_dump(mode='json'),
             "is_active": True,
+            "version": 0,
             "created_at": datetime.now().isoformat(),
             "updated_at": datetime.now().isoformat()
         }
         
         # Insert into MongoDB
-        result = self.users_collection.insert_one(user_dict)
+        with metrics_service.timed("db_write", "mongodb"):
+            result = self.users_collection.insert_one(user_dict)
         
         # Return User object
         user = User(
@@ -58,122 +142,445 @@ class SyncMongoDBUserService:
             progress=progress
         )
         
-        return user
+        return user_change_tracker.track(user)
     
-    def get_user_by_id(self, user_id: str) -> Optional[User]:
-        """Get user by user_id"""
-        user_data = self.users_collection.find_one({"user_id": user_id})
+    def _find_user(self, query: Dict[str, Any], include_entries: bool = False) -> Optional[User]:
+        """Load a tracked User, by default leaving the entries history on the server"""
+        projection = None if include_entries else {"progress.entries": 0}
+        with metrics_service.timed("db_read", "mongodb"):
+            user_data = self.users_collection.find_one(query, projection)
         if user_data:
             # Remove MongoDB _id field
             user_data.pop('_id', None)
             # Reconstruct User from dict data
-            return User.model_validate(user_data)
+            user = User.model_validate(user_data)
+            if include_entries:
+                # Entries not yet moved out of the user document come first
+                user.progress.entries.extend(self._find_entries({"user_id": user.id}, sort=ASCENDING))
+                # Loaded before tracking so they are part of the baseline, and never written back by save_user
+                user._stored_entries = len(user.progress.entries)
+            return user_change_tracker.track(user)
         return None
     
-    def get_user_by_email(self, email: str) -> Optional[User]:
+    def _find_entries(self, query: Dict[str, Any], sort: int = DESCENDING, limit: int = 0) -> List[DailyEntry]:
+        """Read entries from the daily_entries collection in date order"""
+        with metrics_service.timed("db_read", "mongodb"):
+            cursor = self.entries_collection.find(query, {"_id": 0, "user_id": 0, "analysis": 0}).sort(
+                [("date", sort), ("_id", sort)]
+            ).limit(limit)
+            return [DailyEntry.model_validate(doc) for doc in cursor]
+    
+    def get_user_by_id(self, user_id: str, include_entries: bool = False) -> Optional[User]:
+        """Get user by user_id"""
+        return self._find_user({"user_id": user_id}, include_entries)
+    
+    def get_user_by_email(self, email: str, include_entries: bool = False) -> Optional[User]:
         """Get user by email"""
-        user_data = self.users_collection.find_one({"credentials.email": email})
-        if user_data:
-            # Remove MongoDB _id field
-            user_data.pop('_id', None)
-            # Reconstruct User from dict data
-            return User.model_validate(user_data)
-        return None
+        return self._find_user({"credentials.email": email}, include_entries)
     
     def authenticate_user(self, email: str, password: str) -> Optional[User]:
-        """Authenticate user with email and password"""
-        user = self.get_user_by_email(email)
-        if user and user.credentials.password == password:
-            return user
-        return None
+        """Authenticate user with email and password; hashes CPU-heavily, so the login endpoint splits it up"""
+        user = self.get_user_by_email(email, include_entries=False)
+        stored = user.credentials.password if user else None
+        if not password_hasher.verify(stored, password):
+            return None
+        if password_hasher.needs_rehash(stored):
+            # Plaintext or outdated hash: replace it now that the password is known
+            self.update_password_hash(user.id, stored, password_hasher.hash(password))
+        return user
+    
+    def update_password_hash(self, user_id: str, stored: str, password_hash: str):
+        """Replace a user's stored password with a new hash, unless it changed since it was read"""
+        with metrics_service.timed("db_write", "mongodb"):
+            self.users_collection.update_one(
+                {"user_id": user_id, "credentials.password": stored},
+                {"$set": {"credentials.password": password_hash}, "$inc": {"version": 1}}
+            )
     
     def update_user_profile(self, user_id: str, update_data: Dict[str, Any]) -> Optional[User]:
         """Update user profile with new data"""
-        user = self.get_user_by_id(user_id)
-        if not user:
-            return None
+        def apply(user: User):
+            for key, value in update_data.items():
+                if key == 'email' and hasattr(user.credentials, 'email'):
+                    # Update email in credentials
+                    user.credentials.email = value
+                elif hasattr(user.profile, key) and value is not None:
+                    # Update profile fields
+                    setattr(user.profile, key, value)
         
-        # Update profile fields
-        for key, value in update_data.items():
-            if key == 'email' and hasattr(user.credentials, 'email'):
-                # Update email in credentials
-                user.credentials.email = value
-            elif hasattr(user.profile, key) and value is not None:
-                # Update profile fields
-                setattr(user.profile, key, value)
-        
-        # Save updated user
-        self.save_user(user)
-        return user
+        return self._update_user(user_id, apply)
     
-    def save_user(self, user: User):
-        """Save user to MongoDB"""
-        # Use Pydantic v2 model_dump() method
-        user_dict = user.model_dump(mode='json')
-        user_dict['user_id'] = user.id if hasattr(user, 'id') else user_dict.get('id')
-        
-        self.users_collection.replace_one(
-            {"user_id": user_dict['user_id']},
-            user_dict,
-            upsert=True
-        )
+    def update_user_goal(self, user_id: str, goal: UserGoal) -> bool:
+        """Update only the user's goal with a partial $set write"""
+        with metrics_service.timed("db_write", "mongodb"):
+            result = self.users_collection.update_one(
+                {"user_id": user_id},
+                {
+                    "$set": {
+                        "goal": goal.model_dump(mode='json'),
+                        "updated_at": datetime.now().isoformat()
+                    },
+                    "$inc": {"version": 1}
+                }
+            )
+        return result.matched_count > 0
     
-    def add_daily_entry(self, user_id: str, entry: DailyEntry) -> Optional[User]:
-        """Add a daily entry for a user"""
-        user = self.get_user_by_id(user_id)
-        if not user:
-            return None
+    def update_goal_description(self, user_id: str, expected_description: str, description: str) -> bool:
+        """Replace a template goal's description, unless the goal has been changed since it was served"""
+        with metrics_service.timed("db_write", "mongodb"):
+            result = self.users_collection.update_one(
+                {"user_id": user_id, "goal.goal_description": expected_description, "goal.ai_generated": False},
+                {
+                    "$set": {
+                        "goal.goal_description": description,
+                        "goal.ai_generated": True,
+                        "updated_at": datetime.now().isoformat()
+                    },
+                    "$inc": {"version": 1}
+                }
+            )
+        return result.matched_count > 0
+    
+    def save_user(self, user: User):
+        """Save user to MongoDB, sending only the fields changed since it was loaded"""
+        if not user_change_tracker.is_tracked(user):
+            # Users built in memory have no baseline and are written in full
+            user_dict = user.model_dump(mode='json')
+            user_dict['user_id'] = user.id if hasattr(user, 'id') else user_dict.get('id')
+            with metrics_service.timed("db_write", "mongodb"):
+                self.users_collection.replace_one(
+                    {"user_id": user_dict['user_id']},
+                    user_dict,
+                    upsert=True
+                )
+            user_change_tracker.track(user)
+            return
+        
+        if user._stored_entries is not None and len(user.progress.entries) != user._stored_entries:
+            # History lives in daily_entries; a user loaded with it must not push it into its document
+            raise ValueError(f"Entries of user {user.id} are written with add_daily_entry, not save_user")
         
-        # Add entry to user's progress
-        user.progress.entries.append(entry)
-        user.progress.total_entries = len(user.progress.entries)
+        update = user_change_tracker.build_update(user)
+        if not update:
+            return
         
-        # Update streak
-        self._update_streak(user)
+        with metrics_service.timed("db_write", "mongodb"):
+            result = self.users_collection.update_one(
+                {"user_id": user.id, "version": version_filter(user.version)},
+                update
+            )
+        if result.matched_count == 0:
+            raise ConcurrentUpdateError(f"User {user.id} was modified concurrently")
         
-        # Save updated user with proper dict conversion (Pydantic v2)
-        user_dict = user.model_dump(mode='json')
-        user_dict['user_id'] = user.id if hasattr(user, 'id') else user_dict.get('id')
-        self.users_collection.replace_one({"user_id": user.user_id}, user_dict, upsert=True)
-        return user
+        user.version += 1
+        user_change_tracker.track(user)
     
-    def _update_streak(self, user: User):
-        """Update user's current streak"""
-        if not user.progress.entries:
-            user.progress.current_streak = 0
-            return
+    def add_daily_entry(self, user_id: str, meals: List[str], exercises: List[str], lifestyle: Dict[str, Any]) -> bool:
+        """Upsert the user's entry for today; resubmitting the same inputs changes nothing"""
+        today = date.today()
+        entry = DailyEntry(
+            date=today.strftime("%Y-%m-%d"),
+            meals=meals,
+            exercises=exercises,
+            lifestyle=lifestyle
+        )
         
-        # Sort entries by date
-        sorted_entries = sorted(user.progress.entries, key=lambda x: x.date, reverse=True)
+        def apply(user: User):
+            # Update streak before moving the last entry date forward
+            self._update_streak(user, today)
+            
+            user.progress.total_entries += 1
+            user.progress.last_entry_date = entry.date
         
-        # Calculate streak
-        streak = 0
-        current_date = datetime.now().date()
+        key = entry_key(entry)
+        for _ in range(self.MAX_UPDATE_RETRIES):
+            with metrics_service.timed("db_read", "mongodb"):
+                existing = self.entries_collection.find_one(
+                    {"user_id": user_id, "date": entry.date}, sort=[("_id", DESCENDING)]
+                )
+            
+            if existing is None:
+                document = self._entry_document(user_id, entry)
+                try:
+                    with metrics_service.timed("db_write", "mongodb"):
+                        self.entries_collection.insert_one(document)
+                except DuplicateKeyError:
+                    # Another request created today's entry first; replace it instead
+                    continue
+                if self._update_user(user_id, apply) is None:
+                    self.entries_collection.delete_one({"_id": document["_id"]})
+                    return False
+                with metrics_service.timed("db_write", "mongodb"):
+                    self.rollups.record_entry(user_id, entry, document["exercise_minutes"])
+                return True
+            
+            if existing.get("entry_key") == key:
+                # A retry of the same submission
+                return True
+            
+            # New inputs for the day: replace the entry and drop the analysis of the old inputs
+            document = self._entry_document(user_id, entry)
+            with metrics_service.timed("db_write", "mongodb"):
+                result = self.entries_collection.update_one(
+                    {"_id": existing["_id"], "entry_key": existing.get("entry_key")},
+                    {"$set": document, "$unset": {"analysis": ""}}
+                )
+                if result.matched_count == 0:
+                    continue
+                self.rollups.record_entry(user_id, DailyEntry.model_validate(existing), existing.get("exercise_minutes", 0), sign=-1)
+                if existing.get("analysis"):
+                    self.rollups.record_scores(user_id, entry.date, summary_scores(existing["analysis"]["summary"]), sign=-1)
+                self.rollups.record_entry(user_id, entry, document["exercise_minutes"])
+            return True
         
-        for entry in sorted_entries:
-            entry_date = entry.date.date()
-            days_diff = (current_date - entry_date).days
+        raise ConcurrentUpdateError(f"Entry for {entry.date} of user {user_id} was modified concurrently")
+    
+    def _entry_document(self, user_id: str, entry: DailyEntry) -> Dict[str, Any]:
+        """daily_entries document: the entry plus the keys and totals rollups group on"""
+        return {
+            "user_id": user_id,
+            **entry.model_dump(mode='json'),
+            **entry_buckets(entry.date),
+            "exercise_minutes": scoring_engine.estimate_exercises(entry.exercises)["active_minutes"],
+            "entry_key": entry_key(entry)
+        }
+    
+    def _update_user(self, user_id: str, apply) -> Optional[User]:
+        """Read a user without its history, mutate it and write the diff, retrying on conflicts"""
+        for _ in range(self.MAX_UPDATE_RETRIES):
+            user = self.get_user_by_id(user_id, include_entries=False)
+            if not user:
+                return None
             
-            if days_diff == streak:
-                streak += 1
-            else:
-                break
+            apply(user)
+            try:
+                self.save_user(user)
+                return user
+            except ConcurrentUpdateError:
+                continue
+        
+        raise ConcurrentUpdateError(f"Gave up updating user {user_id} after {self.MAX_UPDATE_RETRIES} conflicts")
+    
+    def _update_streak(self, user: User, entry_date: date):
+        """Update user's current streak from the previous entry date"""
+        last_entry_date = user.progress.last_entry_date
         
-        user.progress.current_streak = streak
+        if last_entry_date == entry_date.strftime("%Y-%m-%d"):
+            # Another entry on the same day keeps the streak
+            user.progress.current_streak = max(1, user.progress.current_streak)
+        elif last_entry_date == (entry_date - timedelta(days=1)).strftime("%Y-%m-%d"):
+            user.progress.current_streak += 1
+        else:
+            user.progress.current_streak = 1
     
     def get_recent_entries(self, user_id: str, days: int = 7) -> List[DailyEntry]:
-        """Get user's recent entries"""
-        user = self.get_user_by_id(user_id)
-        if not user:
-            return []
+        """Get user's most recent entries, newest first"""
+        self._split_entries_once(user_id)
+        return self._find_entries({"user_id": user_id}, limit=days)
+    
+    def get_entries_page(self, user_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                         limit: int = 30, cursor: Optional[str] = None,
+                         fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """One page of history, newest first, with an opaque cursor for the next page"""
+        limit = max(1, min(limit, self.MAX_PAGE_SIZE))
+        self._split_entries_once(user_id)
+        query: Dict[str, Any] = {"user_id": user_id}
+        
+        date_range = {}
+        if start_date:
+            date_range["$gte"] = start_date
+        if end_date:
+            date_range["$lte"] = end_date
+        if date_range:
+            query["date"] = date_range
+        
+        if cursor:
+            # Resume strictly after the last (date, _id) already returned
+            after_date, after_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"date": {"$lt": after_date}},
+                {"date": after_date, "_id": {"$lt": after_id}}
+            ]
         
-        # Sort entries by date and get recent ones
-        sorted_entries = sorted(user.progress.entries, key=lambda x: x.date, reverse=True)
-        return sorted_entries[:days]
+        projection = {"_id": 1, "date": 1}
+        for field in fields or ENTRY_FIELDS:
+            if field not in ENTRY_FIELDS:
+                raise ValueError(f"Unknown entry field: {field}")
+            projection[field] = 1
+        
+        with metrics_service.timed("db_read", "mongodb"):
+            # Fetch one extra document to learn whether another page exists
+            documents = list(
+                self.entries_collection.find(query, projection)
+                .sort([("date", DESCENDING), ("_id", DESCENDING)])
+                .limit(limit + 1)
+            )
+        
+        next_cursor = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = encode_cursor(documents[-1]["date"], documents[-1]["_id"])
+        for document in documents:
+            document.pop("_id")
+        
+        return {"entries": documents, "next_cursor": next_cursor}
+    
+    def get_aggregates(self, user_id: str, period: str = "week", start_date: Optional[str] = None,
+                       end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Daily, weekly or monthly rollups read from user_rollups, O(buckets) rather than O(entries)"""
+        self._ensure_rollups(user_id)
+        start_bucket = bucket_keys(start_date)[period] if start_date else None
+        end_bucket = bucket_keys(end_date)[period] if end_date else None
+        with metrics_service.timed("db_read", "mongodb"):
+            return self.rollups.get_buckets(user_id, period, start_bucket, end_bucket)
+    
+    def get_rolling_windows(self, user_id: str, end_date: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Precomputed 7- and 30-day windows ending today (or end_date)"""
+        self._ensure_rollups(user_id)
+        with metrics_service.timed("db_read", "mongodb"):
+            return self.rollups.get_windows(user_id, end_date or date.today().strftime("%Y-%m-%d"))
+    
+    def get_entry_analysis(self, user_id: str, entry_date: str,
+                           user_data: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Latest entry on a date with its stored analysis; given user_data, the latest analysed entry with those inputs"""
+        query: Dict[str, Any] = {"user_id": user_id, "date": entry_date}
+        if user_data is not None:
+            query["entry_key"] = entry_key(DailyEntry(date=entry_date, **user_data))
+            query["analysis"] = {"$exists": True}
+        with metrics_service.timed("db_read", "mongodb"):
+            document = next(iter(
+                self.entries_collection.find(query, {"meals": 1, "exercises": 1, "lifestyle": 1, "analysis": 1})
+                .sort("_id", DESCENDING)
+                .limit(1)
+            ), None)
+        if document:
+            document["entry_id"] = str(document.pop("_id"))
+        return document
+    
+    def save_entry_analysis(self, user_id: str, entry_date: str, user_data: Dict[str, Any],
+                            summary: Dict[str, Any], stamp: Dict[str, str], entry_id: Optional[str] = None):
+        """Store agent outputs and their version stamp with the entry, and keep the rollup scores in step"""
+        key = entry_key(DailyEntry(date=entry_date, **user_data))
+        query: Dict[str, Any] = {"_id": ObjectId(entry_id)} if entry_id else {"user_id": user_id, "date": entry_date, "entry_key": key}
+        analysis = {**stamp, "summary": summary, "created_at": datetime.now(timezone.utc)}
+        with metrics_service.timed("db_write", "mongodb"):
+            # entry_key is (re)set so entries written before it existed can be matched later
+            previous = self.entries_collection.find_one_and_update(
+                query,
+                {"$set": {"analysis": analysis, "entry_key": key}},
+                projection={"analysis.summary": 1},
+                return_document=ReturnDocument.BEFORE
+            )
+            if previous is None:
+                # The day's inputs were replaced while this summary was computed
+                return
+            if previous.get("analysis"):
+                self.rollups.record_scores(user_id, entry_date, summary_scores(previous["analysis"]["summary"]), sign=-1)
+            self.rollups.record_scores(user_id, entry_date, summary_scores(summary))
+    
+    def get_idempotent_response(self, key: str) -> Optional[Dict[str, Any]]:
+        """Stored response for an idempotency key, with the fingerprint of the request that produced it"""
+        with metrics_service.timed("db_read", "mongodb"):
+            return self.idempotency_collection.find_one({"_id": key})
+    
+    def save_idempotent_response(self, key: str, fingerprint: str, response: Any):
+        """Remember the response for an idempotency key; the first writer wins"""
+        try:
+            with metrics_service.timed("db_write", "mongodb"):
+                self.idempotency_collection.insert_one({
+                    "_id": key,
+                    "fingerprint": fingerprint,
+                    "response": response,
+                    "created_at": datetime.now(timezone.utc)
+                })
+        except DuplicateKeyError:
+            pass
+    
+    def record_llm_usage(self, user_id: str, prompt_tokens: int, completion_tokens: int, llm_calls: int):
+        """Add one request's LLM tokens to the user's total for today"""
+        today = date.today().isoformat()
+        with metrics_service.timed("db_write", "mongodb"):
+            self.llm_usage_collection.update_one(
+                {"_id": f"{user_id}:{today}"},
+                {
+                    "$setOnInsert": {"user_id": user_id, "date": today},
+                    "$inc": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                        "llm_calls": llm_calls,
+                        "requests": 1
+                    }
+                },
+                upsert=True
+            )
+    
+    def _ensure_rollups(self, user_id: str):
+        """Users whose entries predate the rollups get them built once"""
+        self._split_entries_once(user_id)
+        if not self.rollups.has_rollups(user_id):
+            self.rollups.rebuild(self.entries_collection, user_id)
+    
+    def _split_entries_once(self, user_id: str):
+        """History reads only see daily_entries, so a user not yet split by the migration is split on first read"""
+        if user_id not in self._entries_split:
+            self.move_embedded_entries(user_id)
+            self._entries_split.add(user_id)
+    
+    def move_embedded_entries(self, only_user_id: Optional[str] = None) -> int:
+        """Move entries still stored inside user documents (all, or one user's) into daily_entries. Returns users migrated"""
+        query: Dict[str, Any] = {"progress.entries.0": {"$exists": True}}
+        if only_user_id:
+            query["user_id"] = only_user_id
+        moved_users = 0
+        for user_data in self.users_collection.find(
+            query,
+            {"user_id": 1, "id": 1, "progress.entries": 1}
+        ):
+            user_id = user_data.get("user_id") or user_data.get("id")
+            embedded = user_data["progress"]["entries"]
+            # One entry per day: the last one logged for a date wins
+            latest = {entry["date"]: entry for entry in embedded}
+            entries = [
+                self._entry_document(user_id, DailyEntry.model_validate(entry))
+                for entry in latest.values()
+            ]
+            try:
+                self.entries_collection.insert_many(entries, ordered=False)
+            except BulkWriteError as e:
+                # Days already present in daily_entries keep the stored entry
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+            # Only clear the array if nobody pushed to it in the meantime
+            self.users_collection.update_one(
+                {"_id": user_data["_id"], "progress.entries": {"$size": len(embedded)}},
+                {"$set": {"progress.entries": []}, "$inc": {"version": 1}}
+            )
+            self.rollups.rebuild(self.entries_collection, user_id)
+            moved_users += 1
+        return moved_users
+    
+    def merge_duplicate_entries(self) -> int:
+        """Keep only the latest entry per user and day, then create the unique index. Returns entries removed"""
+        removed = 0
+        users = set()
+        for group in self.entries_collection.aggregate([
+            {"$sort": {"_id": DESCENDING}},
+            {"$group": {"_id": {"user_id": "$user_id", "date": "$date"}, "ids": {"$push": "$_id"}}},
+            {"$match": {"ids.1": {"$exists": True}}},
+        ], allowDiskUse=True):
+            stale = group["ids"][1:]
+            self.entries_collection.delete_many({"_id": {"$in": stale}})
+            removed += len(stale)
+            users.add(group["_id"]["user_id"])
+        for user_id in users:
+            self.rollups.rebuild(self.entries_collection, user_id)
+        self._create_day_index()
+        return removed
     
     def get_user_progress_summary(self, user_id: str) -> Dict[str, Any]:
         """Get user's progress summary"""
-        user = self.get_user_by_id(user_id)
+        user = self.get_user_by_id(user_id, include_entries=False)
         if not user:
             return {}
         
@@ -184,3 +591,30 @@ class SyncMongoDBUserService:
             "goal": user.goal.model_dump(mode='json'),
             "profile": user.profile.model_dump(mode='json')
         }
+
+def summary_scores(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Agent scores of a personalized summary that the rollups average"""
+    return {
+        "calories": summary.get("food_agent", {}).get("calories"),
+        "nutrition_score": summary.get("food_agent", {}).get("nutrition_score"),
+        "calories_burned": summary.get("exercise_agent", {}).get("calories_burned"),
+        "wellness_score": summary.get("lifestyle_agent", {}).get("wellness_score"),
+        "overall_health_score": summary.get("orchestrator_summary", {}).get("overall_health_score"),
+    }
+
+def entry_key(entry: DailyEntry) -> str:
+    """Fingerprint of an entry's inputs, used to find the analysis stored for them"""
+    inputs = entry.model_dump(mode='json', include={"meals", "exercises", "lifestyle"})
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+def encode_cursor(entry_date: str, entry_id: ObjectId) -> str:
+    """Pack the position of the last returned entry into an opaque token"""
+    return base64.urlsafe_b64encode(f"{entry_date}|{entry_id}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError for tokens we did not issue"""
+    try:
+        entry_date, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return entry_date, ObjectId(entry_id)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
@@ -0,0 +1,157 @@
+"""
+Token Budget
+Measures prompts with the model's tokenizer (tiktoken; about 4 characters per
+token when its encoding cannot be loaded), trims oversized user text before it
+reaches a prompt, holds the per-agent output caps, and totals the tokens each
+request spends so the expensive requests and users can be found.
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, List, Optional
+from services.metrics_service import metrics_service, token_usage
+
+# User text limits, in tokens: one meal/exercise line, a whole list, and a free-text field
+LLM_MAX_ITEM_TOKENS = int(os.getenv("LLM_MAX_ITEM_TOKENS", "60"))
+LLM_MAX_LIST_TOKENS = int(os.getenv("LLM_MAX_LIST_TOKENS", "300"))
+LLM_MAX_TEXT_TOKENS = int(os.getenv("LLM_MAX_TEXT_TOKENS", "150"))
+
+# Completion caps per agent, overridable with LLM_MAX_TOKENS_<COMPONENT>
+MAX_OUTPUT_TOKENS = {
+    "food_agent": 150,
+    "exercise_agent": 150,
+    "lifestyle_agent": 150,
+    "orchestrator": 400,
+    "enhanced_orchestrator": 500,
+    "goal_generator": 400,
+    "goal_personalizer": 150,
+    "personalization_generator": 60,
+    "personalization_batch": 800,
+}
+
+TOKENIZER_MODEL = "gpt-4o-mini"
+TRUNCATION_MARK = "…"
+
+logger = logging.getLogger(__name__)
+
+class RequestUsage:
+    def __init__(self):
+        self.user_id: Optional[str] = None
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.calls = 0
+        self.llm_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, prompt_tokens: int, completion_tokens: int, seconds: float):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.calls += 1
+            self.llm_seconds += seconds
+
+_usage_var: ContextVar[Optional[RequestUsage]] = ContextVar("llm_usage", default=None)
+
+class TokenBudget:
+    def __init__(self):
+        self._encoding: Any = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _tokenizer(self):
+        """tiktoken encoding, loaded on first use; None when unavailable (e.g. no network for the BPE file)"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    try:
+                        import tiktoken
+                        self._encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+                    except Exception as e:
+                        logger.warning("Tokenizer unavailable, estimating tokens from length: %s", e)
+                    self._loaded = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        encoding = self._tokenizer()
+        if encoding is None:
+            return (len(text) + 3) // 4
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def count_messages(self, messages: List[Any]) -> int:
+        """Prompt tokens for chat messages, including the few tokens of per-message framing"""
+        return sum(self.count(str(getattr(message, "content", message))) + 4 for message in messages)
+
+    def truncate(self, text: str, max_tokens: int = LLM_MAX_TEXT_TOKENS) -> str:
+        """text cut to max_tokens, marked with an ellipsis when anything was dropped"""
+        if not text or self.count(text) <= max_tokens:
+            return text
+        encoding = self._tokenizer()
+        if encoding is None:
+            return text[:max_tokens * 4].rstrip() + TRUNCATION_MARK
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens]).rstrip() + TRUNCATION_MARK
+
+    def fit_list(self, items: List[str], item_tokens: int = LLM_MAX_ITEM_TOKENS,
+                 list_tokens: int = LLM_MAX_LIST_TOKENS) -> List[str]:
+        """Trim each item, then keep items while the list fits; the rest are summarised as a count"""
+        fitted: List[str] = []
+        used = 0
+        for index, item in enumerate(items):
+            item = self.truncate(item, item_tokens)
+            used += self.count(item)
+            if used > list_tokens and fitted:
+                fitted.append(f"and {len(items) - index} more")
+                break
+            fitted.append(item)
+        return fitted
+
+    def output_cap(self, component: str) -> int:
+        """max_tokens for an agent's model"""
+        return int(os.getenv(f"LLM_MAX_TOKENS_{component.upper()}", MAX_OUTPUT_TOKENS[component]))
+
+    @contextmanager
+    def track(self, user_id: Optional[str] = None):
+        """Total the LLM tokens spent by the enclosed work (including tasks it starts)"""
+        usage = RequestUsage()
+        usage.user_id = user_id
+        token = _usage_var.set(usage)
+        try:
+            yield usage
+        finally:
+            _usage_var.reset(token)
+
+    def attribute(self, user_id: str):
+        """Charge the current request's LLM usage to a user"""
+        usage = _usage_var.get()
+        if usage is not None:
+            usage.user_id = user_id
+
+    def record(self, component: str, prompt_tokens: int, response: Any, seconds: float):
+        """Add one call to the current request's total; prompt_tokens is the local count, used when the provider reports none"""
+        reported_prompt, completion_tokens = token_usage(response)
+        if metrics_service.enabled:
+            metrics_service.llm_prompt_tokens.observe(reported_prompt or prompt_tokens, component)
+        usage = _usage_var.get()
+        if usage is not None:
+            usage.add(reported_prompt or prompt_tokens, completion_tokens, seconds)
+
+    def report(self, usage: RequestUsage, route: str):
+        """Publish one request's LLM usage: histograms per route and a log line for finding expensive requests"""
+        if metrics_service.enabled:
+            metrics_service.llm_request_tokens.observe(usage.prompt_tokens, route, "prompt")
+            metrics_service.llm_request_tokens.observe(usage.completion_tokens, route, "completion")
+        logger.info(
+            "LLM usage",
+            extra={
+                "route": route,
+                "user_id": usage.user_id,
+                "llm_calls": usage.calls,
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "llm_seconds": round(usage.llm_seconds, 3),
+            }
+        )
+
+# Global instance
+token_budget = TokenBudget()
@@ -0,0 +1,82 @@
+"""
+User Change Tracker
+Field-level dirty tracking for User documents so writes only send what changed
+"""
+from datetime import datetime
+from typing import Dict, Any
+from schemas.user import User
+
+class ConcurrentUpdateError(Exception):
+    """Raised when a user document was modified by another writer since it was read"""
+
+# Entries are append-only and tracked by count, so they never enter the snapshot
+SNAPSHOT_EXCLUDE = {"version": True, "updated_at": True, "progress": {"entries"}}
+
+class UserChangeTracker:
+    def track(self, user: User) -> User:
+        """Record the current state of a user as its clean baseline"""
+        user._snapshot = {
+            "document": user.model_dump(mode='json', exclude=SNAPSHOT_EXCLUDE),
+            "entry_count": len(user.progress.entries)
+        }
+        return user
+
+    def is_tracked(self, user: User) -> bool:
+        """Check whether the user was loaded or saved through the tracker"""
+        return user._snapshot is not None
+
+    def build_update(self, user: User) -> Dict[str, Any]:
+        """Build a minimal MongoDB update document for everything changed since track()"""
+        snapshot = user._snapshot
+        current = user.model_dump(mode='json', exclude=SNAPSHOT_EXCLUDE)
+
+        set_ops: Dict[str, Any] = {}
+        unset_ops: Dict[str, Any] = {}
+        self._diff(snapshot["document"], current, "", set_ops, unset_ops)
+
+        update: Dict[str, Any] = {}
+        entries = user.progress.entries
+        entry_count = snapshot["entry_count"]
+        if len(entries) > entry_count:
+            update["$push"] = {
+                "progress.entries": {
+                    "$each": [entry.model_dump(mode='json') for entry in entries[entry_count:]]
+                }
+            }
+        elif len(entries) < entry_count:
+            # Entries were removed in memory; the array can only be rewritten whole
+            set_ops["progress.entries"] = [entry.model_dump(mode='json') for entry in entries]
+
+        if not set_ops and not unset_ops and not update:
+            return {}
+
+        set_ops["updated_at"] = datetime.now().isoformat()
+        update["$set"] = set_ops
+        if unset_ops:
+            update["$unset"] = unset_ops
+        update["$inc"] = {"version": 1}
+        return update
+
+    def _diff(self, old: Dict[str, Any], new: Dict[str, Any], prefix: str, set_ops: Dict[str, Any], unset_ops: Dict[str, Any]):
+        """Collect dotted paths of changed leaves; lists are compared as a whole"""
+        for key, value in new.items():
+            path = f"{prefix}{key}"
+            if key not in old:
+                set_ops[path] = value
+            elif isinstance(value, dict) and isinstance(old[key], dict):
+                self._diff(old[key], value, f"{path}.", set_ops, unset_ops)
+            elif old[key] != value:
+                set_ops[path] = value
+
+        for key in old:
+            if key not in new:
+                unset_ops[f"{prefix}{key}"] = ""
+
+def version_filter(version: int) -> Any:
+    """Match a document version; documents written before versioning have no field"""
+    if version == 0:
+        return {"$in": [0, None]}
+    return version
+
+# Global instance
+user_change_tracker = UserChangeTracker()
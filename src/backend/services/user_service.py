@@ -1,41 +1,132 @@
+import base64
 import json
+import logging
 import os
+import sqlite3
+import threading
 import uuid
 from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 from schemas.user import User, UserCredentials, UserProfile, UserGoal, DailyEntry, UserProgress, GoalType, ActivityLevel, Gender
 from agents.goal_generator import GoalGenerator
+from services.metrics_service import metrics_service
+from services.password_hasher import password_hasher, is_hashed
+
+logger = logging.getLogger(__name__)
+
+# Entries live in their own table, so user records never carry the history
+USER_RECORD_EXCLUDE = {"progress": {"entries"}}
+
+# Entry fields a history query may project; date is always returned
+ENTRY_FIELDS = ("meals", "exercises", "lifestyle", "created_at")
+MAX_PAGE_SIZE = 366
 
 class UserService:
+    """Local/offline user storage backed by an embedded SQLite database"""
+    
     def __init__(self):
         self.data_dir = os.path.join(os.path.dirname(__file__), "..", "data")
         self.users_file = os.path.join(self.data_dir, "users.json")
+        self.db_file = os.path.join(self.data_dir, "users.db")
         self.goal_generator = GoalGenerator()
+        self._lock = threading.RLock()
         self._ensure_data_directory()
-        self._load_users()
+        self._connect()
+        self._import_legacy_json()
     
     def _ensure_data_directory(self):
         """Ensure data directory exists"""
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
     
-    def _load_users(self):
-        """Load users from JSON file"""
-        if os.path.exists(self.users_file):
-            with open(self.users_file, 'r') as f:
-                self.users = json.load(f)
-        else:
-            self.users = {}
+    def _connect(self):
+        """Open the database and create tables and indexes"""
+        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        # WAL keeps readers unblocked while a write commits
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    id TEXT PRIMARY KEY,
+                    email TEXT NOT NULL,
+                    record TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users (email)")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL REFERENCES users (id),
+                    date TEXT NOT NULL,
+                    record TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_user_date ON entries (user_id, date)")
+    
+    def _import_legacy_json(self):
+        """One-time import of users.json written by earlier versions"""
+        if not os.path.exists(self.users_file) or os.path.getsize(self.users_file) == 0:
+            return
+        if self.conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+            return
+        
+        with open(self.users_file, 'r') as f:
+            legacy_users = json.load(f)
+        
+        imported = set()
+        skipped = 0
+        with self._lock, self.conn:
+            for user_data in legacy_users.values():
+                user = User(**user_data)
+                # Emails are unique here; like the MongoDB migration, the first record for an email wins
+                if user.credentials.email in imported:
+                    logger.warning("Skipping duplicate user %s for %s in users.json", user.id, user.credentials.email)
+                    skipped += 1
+                    continue
+                imported.add(user.credentials.email)
+                self._write_user(user)
+                self.conn.executemany(
+                    "INSERT INTO entries (user_id, date, record) VALUES (?, ?, ?)",
+                    [(user.id, entry.date, entry.model_dump_json()) for entry in user.progress.entries]
+                )
+        logger.info("Imported %d users from users.json, skipped %d duplicates", len(imported), skipped)
     
-    def _save_users(self):
-        """Save users to JSON file"""
-        with open(self.users_file, 'w') as f:
-            json.dump(self.users, f, indent=2, default=str)
+    def _write_user(self, user: User):
+        """Upsert one user record (caller holds the transaction)"""
+        with metrics_service.timed("db_write", "sqlite"):
+            self.conn.execute(
+                """
+                INSERT INTO users (id, email, record, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET email = excluded.email, record = excluded.record, updated_at = excluded.updated_at
+                """,
+                (user.id, user.credentials.email, user.model_dump_json(exclude=USER_RECORD_EXCLUDE), datetime.now().isoformat())
+            )
+    
+    def _read_user(self, row: Optional[tuple], include_entries: bool) -> Optional[User]:
+        """Rebuild a User from its record and, optionally, its entries"""
+        if not row:
+            return None
+        
+        user = User.model_validate_json(row[1])
+        if include_entries:
+            entry_rows = self.conn.execute(
+                "SELECT record FROM entries WHERE user_id = ? ORDER BY id", (row[0],)
+            ).fetchall()
+            user.progress.entries = [DailyEntry.model_validate_json(record) for (record,) in entry_rows]
+        # Everything loaded is already stored; save_user inserts only what is appended after this
+        user._stored_entries = len(user.progress.entries)
+        return user
     
     def create_user(self, credentials: UserCredentials, profile: UserProfile) -> User:
         """Create a new user with AI-generated goal"""
         user_id = str(uuid.uuid4())
         
+        # Only the password hash is stored
+        if not is_hashed(credentials.password):
+            credentials = credentials.model_copy(update={"password": password_hasher.hash(credentials.password)})
+        
         # Generate AI goal based on profile
         goal = self.goal_generator.generate_goal(profile)
         
@@ -57,86 +148,98 @@ class UserService:
         )
         
         # Store user
-        self.users[user_id] = user.dict()
-        self._save_users()
+        with self._lock, self.conn:
+            self._write_user(user)
         
         return user
     
-    def get_user_by_email(self, email: str) -> Optional[User]:
+    def get_user_by_email(self, email: str, include_entries: bool = True) -> Optional[User]:
         """Get user by email"""
-        for user_data in self.users.values():
-            if user_data['credentials']['email'] == email:
-                return User(**user_data)
-        return None
+        with self._lock, metrics_service.timed("db_read", "sqlite"):
+            row = self.conn.execute("SELECT id, record FROM users WHERE email = ?", (email,)).fetchone()
+            return self._read_user(row, include_entries)
     
-    def get_user_by_id(self, user_id: str) -> Optional[User]:
+    def get_user_by_id(self, user_id: str, include_entries: bool = True) -> Optional[User]:
         """Get user by ID"""
-        if user_id in self.users:
-            return User(**self.users[user_id])
-        return None
+        with self._lock, metrics_service.timed("db_read", "sqlite"):
+            row = self.conn.execute("SELECT id, record FROM users WHERE id = ?", (user_id,)).fetchone()
+            return self._read_user(row, include_entries)
     
     def authenticate_user(self, email: str, password: str) -> Optional[User]:
         """Authenticate user with email and password"""
-        user = self.get_user_by_email(email)
-        if user and user.credentials.password == password:
-            return user
-        return None
+        user = self.get_user_by_email(email, include_entries=False)
+        stored = user.credentials.password if user else None
+        if not password_hasher.verify(stored, password):
+            return None
+        if password_hasher.needs_rehash(stored):
+            # Plaintext or outdated hash: replace it now that the password is known
+            self.update_password_hash(user.id, stored, password_hasher.hash(password))
+        return user
+    
+    def update_password_hash(self, user_id: str, stored: str, password_hash: str):
+        """Replace a user's stored password with a new hash, unless it changed since it was read"""
+        with self._lock:
+            user = self.get_user_by_id(user_id, include_entries=False)
+            if user and user.credentials.password == stored:
+                user.credentials.password = password_hash
+                with self.conn:
+                    self._write_user(user)
     
     def add_daily_entry(self, user_id: str, meals: List[str], exercises: List[str], lifestyle: Dict[str, Any]) -> bool:
         """Add a daily entry for a user"""
-        user = self.get_user_by_id(user_id)
-        if not user:
-            return False
-        
-        # Create daily entry
-        today = date.today().strftime("%Y-%m-%d")
-        entry = DailyEntry(
-            date=today,
-            meals=meals,
-            exercises=exercises,
-            lifestyle=lifestyle
-        )
+        with self._lock:
+            user = self.get_user_by_id(user_id, include_entries=False)
+            if not user:
+                return False
+        
+            # Create daily entry
+            today = date.today().strftime("%Y-%m-%d")
+            entry = DailyEntry(
+                date=today,
+                meals=meals,
+                exercises=exercises,
+                lifestyle=lifestyle
+            )
         
-        # Update user progress
-        user.progress.entries.append(entry)
-        user.progress.total_entries += 1
-        user.progress.last_entry_date = today
+            # Update streak before moving the last entry date forward
+            self._update_streak(user, today)
         
-        # Update streak
-        self._update_streak(user)
+            # Update user progress
+            user.progress.total_entries += 1
+            user.progress.last_entry_date = today
         
-        # Save updated user
-        self.users[user_id] = user.dict()
-        self._save_users()
+            # Append the entry and update the user record in one transaction
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO entries (user_id, date, record) VALUES (?, ?, ?)",
+                    (user_id, entry.date, entry.model_dump_json())
+                )
+                self._write_user(user)
         
         return True
     
-    def _update_streak(self, user: User):
-        """Update user's current streak"""
-        if not user.progress.entries:
-            user.progress.current_streak = 0
+    def _update_streak(self, user: User, entry_date: str):
+        """Update user's current streak from the previous entry date"""
+        last_entry_date = user.progress.last_entry_date
+        if last_entry_date == entry_date:
+            user.progress.current_streak = max(1, user.progress.current_streak)
             return
         
-        # Sort entries by date
-        sorted_entries = sorted(user.progress.entries, key=lambda x: x.date, reverse=True)
-        
-        streak = 0
-        current_date = datetime.now().date()
+        days_diff = None
+        if last_entry_date:
+            days_diff = (
+                datetime.strptime(entry_date, "%Y-%m-%d").date()
+                - datetime.strptime(last_entry_date, "%Y-%m-%d").date()
+            ).days
         
-        for entry in sorted_entries:
-            entry_date = datetime.strptime(entry.date, "%Y-%m-%d").date()
-            days_diff = (current_date - entry_date).days
-            
-            if days_diff == streak:
-                streak += 1
-            else:
-                break
-        
-        user.progress.current_streak = streak
+        if days_diff == 1:
+            user.progress.current_streak += 1
+        else:
+            user.progress.current_streak = 1
     
     def get_user_progress_summary(self, user_id: str) -> Dict[str, Any]:
         """Get user's progress summary"""
-        user = self.get_user_by_id(user_id)
+        user = self.get_user_by_id(user_id, include_entries=False)
         if not user:
             return {}
         
@@ -150,34 +253,106 @@ class UserService:
     
     def get_recent_entries(self, user_id: str, days: int = 7) -> List[DailyEntry]:
         """Get user's recent entries"""
-        user = self.get_user_by_id(user_id)
-        if not user:
-            return []
+        with self._lock, metrics_service.timed("db_read", "sqlite"):
+            rows = self.conn.execute(
+                "SELECT record FROM entries WHERE user_id = ? ORDER BY date DESC, id DESC LIMIT ?",
+                (user_id, days)
+            ).fetchall()
+        return [DailyEntry.model_validate_json(record) for (record,) in rows]
+        
+    def get_entries_page(self, user_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                         limit: int = 30, cursor: Optional[str] = None,
+                         fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """One page of history, newest first, with an opaque cursor for the next page"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        for field in fields or ENTRY_FIELDS:
+            if field not in ENTRY_FIELDS:
+                raise ValueError(f"Unknown entry field: {field}")
+        
+        sql = "SELECT id, date, record FROM entries WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if start_date:
+            sql += " AND date >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND date <= ?"
+            params.append(end_date)
+        if cursor:
+            # Resume strictly after the last (date, id) already returned
+            after_date, after_id = decode_cursor(cursor)
+            sql += " AND (date < ? OR (date = ? AND id < ?))"
+            params.extend([after_date, after_date, after_id])
+        sql += " ORDER BY date DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        
+        with self._lock, metrics_service.timed("db_read", "sqlite"):
+            rows = self.conn.execute(sql, params).fetchall()
         
-        # Sort entries by date and get recent ones
-        sorted_entries = sorted(user.progress.entries, key=lambda x: x.date, reverse=True)
-        return sorted_entries[:days]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+        
+        selected = ("date", *(fields or ENTRY_FIELDS))
+        entries = []
+        for _, _, record in rows:
+            entry = json.loads(record)
+            entries.append({field: entry.get(field) for field in selected})
+        return {"entries": entries, "next_cursor": next_cursor}
     
     def update_user_profile(self, user_id: str, update_data: Dict[str, Any]) -> Optional[User]:
         """Update user profile with new data"""
-        user = self.get_user_by_id(user_id)
-        if not user:
-            return None
+        with self._lock:
+            user = self.get_user_by_id(user_id, include_entries=False)
+            if not user:
+                return None
         
-        # Update profile fields
-        for key, value in update_data.items():
-            if key == 'email' and hasattr(user.credentials, 'email'):
-                # Update email in credentials
-                user.credentials.email = value
-            elif hasattr(user.profile, key) and value is not None:
-                # Update profile fields
-                setattr(user.profile, key, value)
-        
-        # Save updated user
-        self.save_user(user)
+            # Update profile fields
+            for key, value in update_data.items():
+                if key == 'email' and hasattr(user.credentials, 'email'):
+                    # Update email in credentials
+                    user.credentials.email = value
+                elif hasattr(user.profile, key) and value is not None:
+                    # Update profile fields
+                    setattr(user.profile, key, value)
+        
+            # Save updated user record only; entries are untouched
+            with self.conn:
+                self._write_user(user)
         return user
     
+    def update_user_goal(self, user_id: str, goal: UserGoal) -> bool:
+        """Update only the user's goal"""
+        with self._lock:
+            user = self.get_user_by_id(user_id, include_entries=False)
+            if not user:
+                return False
+        
+            user.goal = goal
+            with self.conn:
+                self._write_user(user)
+        return True
+    
     def save_user(self, user: User):
         """Save user to storage"""
-        self.users[user.id] = user.dict()
-        self._save_users()
+        with self._lock, self.conn:
+            self._write_user(user)
+            # Persist entries appended in memory since the user was loaded (all of them for a user built in memory)
+            new_entries = user.progress.entries[user._stored_entries or 0:]
+            self.conn.executemany(
+                "INSERT INTO entries (user_id, date, record) VALUES (?, ?, ?)",
+                [(user.id, entry.date, entry.model_dump_json()) for entry in new_entries]
+            )
+            user._stored_entries = len(user.progress.entries)
+
+def encode_cursor(entry_date: str, entry_id: int) -> str:
+    """Pack the position of the last returned entry into an opaque token"""
+    return base64.urlsafe_b64encode(f"{entry_date}|{entry_id}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor; raises ValueError for tokens we did not issue"""
+    try:
+        entry_date, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return entry_date, int(entry_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
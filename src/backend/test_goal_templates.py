@@ -0,0 +1,78 @@
+"""
+Quick test of goal bucketing and of which LLM goals are stored as templates
+"""
+from dotenv import load_dotenv
+from schemas.user import UserProfile, UserGoal, Gender, ActivityLevel, GoalType
+from services.goal_template_service import normalize_goal, profile_features, template_key
+
+load_dotenv()
+
+def check(label: str, ok: bool):
+    if ok:
+        print(f"  [OK] {label}")
+    else:
+        print(f"  [ERROR] {label}")
+        exit(1)
+
+def make_profile(primary_health_goal: str) -> UserProfile:
+    return UserProfile(
+        name="Test User",
+        age=25,
+        gender=Gender.FEMALE,
+        weight=64.0,
+        height=168.0,
+        activity_level=ActivityLevel.LIGHTLY_ACTIVE,
+        primary_health_goal=primary_health_goal,
+        intellectual_interests=["Science"],
+        learning_style="visual",
+        time_availability="1-2 hours daily"
+    )
+
+print("=" * 60)
+print("  TESTING GOAL TEMPLATES")
+print("=" * 60)
+
+# Test 1: Whole words only
+print("\n[Test 1] Bucketing goals that only contain a keyword inside a longer word...")
+for text, expected in (
+    ("Reduce fatigue", "better_sleep"),
+    ("Cutting down on stress", "stress_reduction"),
+    ("Improve my fitness", "endurance"),
+    ("Learn about nutrition", "general_health"),
+):
+    check(f"{text!r} -> {normalize_goal(text)}", normalize_goal(text) == expected)
+
+# Test 2: Keyword scoring
+print("\n[Test 2] Bucketing goals that mention several buckets...")
+for text, expected in (
+    ("Lose weight", "weight_loss"),
+    ("Build lean muscle", "muscle_gain"),
+    ("Gain muscle", "muscle_gain"),
+    ("Gain weight", "weight_gain"),
+    ("Get stronger and run a marathon, running is my thing", "endurance"),
+    ("Lose fat and build muscle", "weight_loss"),
+    ("Sleep better and feel less tired", "better_sleep"),
+):
+    check(f"{text!r} -> {normalize_goal(text)}", normalize_goal(text) == expected)
+
+# Test 3: Only goals of the bucket's type are stored
+print("\n[Test 3] Storing LLM goals as templates...")
+from services.sync_mongodb_user_service import SyncMongoDBUserService
+
+store = SyncMongoDBUserService().goal_templates
+profile = make_profile("Build muscle")
+key = template_key(profile_features(profile))
+store.collection.delete_one({"_id": key})
+try:
+    mismatched = UserGoal(goal_type=GoalType.WEIGHT_LOSS, target_calories_per_day=1800, goal_description="Lose weight")
+    check("Goal of another type is not stored", not store.save(profile, mismatched) and store.collection.find_one({"_id": key}) is None)
+    matching = UserGoal(goal_type=GoalType.MUSCLE_GAIN, target_calories_per_day=2400, target_protein_per_day=128, goal_description="Build muscle")
+    check("Goal of the bucket's type is stored", store.save(profile, matching) and store.collection.find_one({"_id": key})["goal_type"] == "muscle_gain")
+    served = store.goal_for(make_profile("Get stronger"))
+    check(f"Served to another profile in the bucket as {served.goal_type.value}", served.goal_type == GoalType.MUSCLE_GAIN)
+finally:
+    store.collection.delete_one({"_id": key})
+
+print("\n" + "=" * 60)
+print("  ALL TESTS PASSED!")
+print("=" * 60)
@@ -0,0 +1,89 @@
+"""
+Quick test of Idempotency-Key replay and coalescing of identical concurrent requests
+"""
+import asyncio
+import uuid
+from dotenv import load_dotenv
+from fastapi.testclient import TestClient
+from schemas.user import User, UserCredentials, UserProfile, UserGoal, UserProgress, Gender, ActivityLevel, GoalType
+from services.request_coalescer import RequestCoalescer
+
+load_dotenv()
+
+def check(label: str, ok: bool):
+    if ok:
+        print(f"  [OK] {label}")
+    else:
+        print(f"  [ERROR] {label}")
+        exit(1)
+
+print("=" * 60)
+print("  TESTING IDEMPOTENT REQUESTS")
+print("=" * 60)
+
+# Test 1: Coalescing
+print("\n[Test 1] Running three identical computations at once...")
+coalescer = RequestCoalescer()
+calls = []
+
+async def compute():
+    calls.append(1)
+    await asyncio.sleep(0.05)
+    return {"calls": len(calls)}
+
+async def run_together():
+    return await asyncio.gather(*(coalescer.run("same-key", compute) for _ in range(3)), coalescer.run("other-key", compute))
+
+results = asyncio.run(run_together())
+check("Identical requests share one computation", results[:3] == [results[0]] * 3)
+check("A different key computes separately", len(calls) == 2)
+check("Nothing left in flight", not coalescer.is_inflight("same-key"))
+
+async def run_failing():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+    return await asyncio.gather(*(coalescer.run("failing-key", fail) for _ in range(2)), return_exceptions=True)
+
+check("Followers receive the leader's error", [str(e) for e in asyncio.run(run_failing())] == ["boom", "boom"])
+
+# Test 2: Replay through the API
+print("\n[Test 2] Retrying /daily-entry with an Idempotency-Key...")
+from main import app, user_service
+
+user_id = f"idempotency-test-{uuid.uuid4()}"
+user_service.save_user(User(
+    id=user_id,
+    credentials=UserCredentials(email=f"{user_id}@example.com", password="test123"),
+    profile=UserProfile(
+        name="Test User", age=25, gender=Gender.MALE, weight=70.0, height=175.0,
+        activity_level=ActivityLevel.MODERATELY_ACTIVE, primary_health_goal="Stay healthy and fit",
+        intellectual_interests=["Science"], learning_style="visual", time_availability="1-2 hours daily"
+    ),
+    goal=UserGoal(goal_type=GoalType.GENERAL_HEALTH, goal_description="Stay healthy"),
+    progress=UserProgress()
+))
+client = TestClient(app)
+body = {"user_id": user_id, "meals": ["eggs"], "exercises": ["30 min run"], "lifestyle": {"sleep_hours": 7}}
+headers = {"Idempotency-Key": str(uuid.uuid4())}
+try:
+    first = client.post("/daily-entry", json=body, headers=headers)
+    retry = client.post("/daily-entry", json=body, headers=headers)
+    check(f"First request stored ({first.status_code})", first.status_code == 200)
+    check("Retry replays the stored response", retry.status_code == 200 and retry.json() == first.json())
+    check("Entry counted once", user_service.get_user_by_id(user_id).progress.total_entries == 1)
+
+    # Test 3: Same key, different body
+    print("\n[Test 3] Reusing the key for a different request...")
+    mismatched = client.post("/daily-entry", json={**body, "meals": ["toast"]}, headers=headers)
+    check(f"Rejected with {mismatched.status_code}: {mismatched.json().get('detail')}", mismatched.status_code == 422)
+    check("Stored entry unchanged", user_service.get_recent_entries(user_id, 1)[0].meals == ["eggs"])
+finally:
+    user_service.users_collection.delete_one({"user_id": user_id})
+    user_service.entries_collection.delete_many({"user_id": user_id})
+    user_service.rollups.collection.delete_many({"user_id": user_id})
+    user_service.idempotency_collection.delete_one({"_id": f"daily-entry:{user_id}:{headers['Idempotency-Key']}"})
+
+print("\n" + "=" * 60)
+print("  ALL TESTS PASSED!")
+print("=" * 60)
@@ -0,0 +1,69 @@
+"""
+Quick test of recovering the JSON object from LLM replies that are not bare JSON
+"""
+from services.json_extractor import JSONExtractor, extract_json
+
+def check(label: str, ok: bool):
+    if ok:
+        print(f"  [OK] {label}")
+    else:
+        print(f"  [ERROR] {label}")
+        exit(1)
+
+def rejects(text: str) -> bool:
+    try:
+        extract_json(text)
+    except ValueError:
+        return True
+    return False
+
+print("=" * 60)
+print("  TESTING JSON EXTRACTOR")
+print("=" * 60)
+
+# Test 1: Bare and fenced replies
+print("\n[Test 1] Reading bare and fenced replies...")
+check("Bare object", extract_json('{"comment": "Eat more greens"}') == {"comment": "Eat more greens"})
+check("Markdown fence", extract_json('```json\n{"note": "Nice run"}\n```') == {"note": "Nice run"})
+check("Nested object and array", extract_json('```\n{"a": {"b": [1, {"c": 2}]}}\n```') == {"a": {"b": [1, {"c": 2}]}})
+
+# Test 2: Prose around the object
+print("\n[Test 2] Skipping prose around the object...")
+check("Prose before and after", extract_json('Here is the analysis: {"advice": "Sleep more"} Hope it helps!') == {"advice": "Sleep more"})
+check("Braces inside strings", extract_json('{"comment": "Use {curly} braces] freely"}') == {"comment": "Use {curly} braces] freely"})
+check("Escaped quote inside a string", extract_json('{"comment": "Say \\"hi\\" {"}') == {"comment": 'Say "hi" {'})
+check("Braces in prose before the object", extract_json('Use a {template} like: {"note": "ok"}') == {"note": "ok"})
+
+# Test 3: Truncated replies
+print("\n[Test 3] Closing replies cut off mid-object...")
+check("Cut inside a string", extract_json('{"comment": "Eat more gre') == {"comment": "Eat more gre"})
+check("Cut after a comma", extract_json('{"a": 1, "b": [2, 3],') == {"a": 1, "b": [2, 3]})
+check("Cut after a key", extract_json('{"a": 1, "b":') == {"a": 1, "b": None})
+check("Cut inside a nested array", extract_json('{"items": [{"name": "eggs"}, {"name": "to') == {"items": [{"name": "eggs"}, {"name": "to"}]})
+
+# Test 4: Mismatched and invalid replies
+print("\n[Test 4] Rejecting mismatched and invalid replies...")
+check("Mismatched bracket, then a valid object", extract_json('{"a": [1} then {"b": 2}') == {"b": 2})
+check("No object at all", rejects("I cannot help with that."))
+check("Array is not an object", rejects("[1, 2, 3]"))
+check("Deeply nested invalid candidate", rejects("{" * 500 + "x" + "}" * 500))
+check("Many rejected candidates before the object", extract_json("{" * 60 + "x" + "}" * 60 + ' {"a": 1}') == {"a": 1})
+check("Object at the nesting limit", extract_json('{"a":' * 63 + "1" + "}" * 63) is not None)
+check("Reply nested past the limit", rejects('{"a":' * 100000 + "1" + "}" * 100000))
+
+# Test 5: Streaming
+print("\n[Test 5] Feeding the reply in chunks...")
+extractor = JSONExtractor()
+chunks = ['Sure! ```json\n{"comm', 'ent": "Great ', 'job"}', ' extra {"ignored": true}']
+results = [extractor.feed(chunk) for chunk in chunks]
+check("Nothing before the closing brace", results[:2] == [None, None])
+check("Object returned once complete", results[2] == {"comment": "Great job"})
+check("Later objects ignored", extractor.finish() == {"comment": "Great job"})
+extractor = JSONExtractor()
+for chunk in ["{x} {", '"a": ', "1}"]:
+    extractor.feed(chunk)
+check("Rejected candidate spanning chunks", extractor.finish() == {"a": 1})
+
+print("\n" + "=" * 60)
+print("  ALL TESTS PASSED!")
+print("=" * 60)
@@ -0,0 +1,59 @@
+"""
+Quick test of nickname pool bucketing and refill bookkeeping
+"""
+from dotenv import load_dotenv
+from services.nickname_pool import interest_cluster
+
+load_dotenv()
+
+def check(label: str, ok: bool):
+    if ok:
+        print(f"  [OK] {label}")
+    else:
+        print(f"  [ERROR] {label}")
+        exit(1)
+
+print("=" * 60)
+print("  TESTING NICKNAME POOL")
+print("=" * 60)
+
+# Test 1: Whole words only
+print("\n[Test 1] Clustering interests by whole words...")
+for interests, expected in (
+    (["Artificial Intelligence"], "stem"),
+    (["Martial arts"], "arts"),
+    (["Partying"], "general"),
+    (["Technology"], "stem"),
+    (["Languages"], "humanities"),
+    (["Sports"], "sports"),
+    (["Cooking", "Music"], "arts"),
+    ([], "general"),
+):
+    check(f"{interests} -> {interest_cluster(interests)}", interest_cluster(interests) == expected)
+
+# Test 2: Refill bookkeeping
+print("\n[Test 2] Starting refills...")
+from services.sync_mongodb_user_service import SyncMongoDBUserService
+
+pool = SyncMongoDBUserService().nickname_pool
+bucket = "better_sleep|test-cluster"
+
+def failing_count(*args, **kwargs):
+    raise RuntimeError("count failed")
+
+pool.unclaimed = failing_count
+try:
+    pool.start_refill(bucket)
+    check("Count error is raised", False)
+except RuntimeError:
+    check("Count error is raised", True)
+check("Bucket released after the failed count", bucket not in pool._refilling)
+del pool.unclaimed
+
+check("Empty bucket starts a refill", pool.start_refill(bucket))
+check("Second signup does not start another", not pool.start_refill(bucket))
+pool._refilling.discard(bucket)
+
+print("\n" + "=" * 60)
+print("  ALL TESTS PASSED!")
+print("=" * 60)
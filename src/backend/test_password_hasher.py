@@ -0,0 +1,65 @@
+"""
+Quick test of password hashing, verification and rehash decisions
+"""
+import asyncio
+from services.password_hasher import PasswordHasher, password_hasher, is_hashed
+
+PASSWORD = "test123"
+
+def check(label: str, ok: bool):
+    if ok:
+        print(f"  [OK] {label}")
+    else:
+        print(f"  [ERROR] {label}")
+        exit(1)
+
+print("=" * 60)
+print("  TESTING PASSWORD HASHER")
+print("=" * 60)
+
+# Test 1: Current hashes
+print("\n[Test 1] Hashing with the current cost parameters...")
+stored = password_hasher.hash(PASSWORD)
+check(f"Stored as {stored.split('$')[0]} with n={password_hasher.n} r={password_hasher.r} p={password_hasher.p}", is_hashed(stored))
+check("Same password salted differently each time", password_hasher.hash(PASSWORD) != stored)
+check("Correct password verifies", password_hasher.verify(stored, PASSWORD))
+check("No rehash needed", not password_hasher.needs_rehash(stored))
+
+# Test 2: Wrong password
+print("\n[Test 2] Verifying a wrong password...")
+check("Wrong password rejected", not password_hasher.verify(stored, "wrong-password"))
+check("Empty password rejected", not password_hasher.verify(stored, ""))
+
+# Test 3: Legacy plaintext records
+print("\n[Test 3] Verifying a legacy plaintext record...")
+check("Plaintext is not treated as a hash", not is_hashed(PASSWORD))
+check("Matching plaintext verifies", password_hasher.verify(PASSWORD, PASSWORD))
+check("Different plaintext rejected", not password_hasher.verify(PASSWORD, "wrong-password"))
+check("Plaintext needs a rehash", password_hasher.needs_rehash(PASSWORD))
+
+# Test 4: Outdated cost parameters
+print("\n[Test 4] Verifying a hash made with older cost parameters...")
+outdated = PasswordHasher(n=2 ** 10, r=8, p=1, workers=1).hash(PASSWORD)
+check("Outdated hash still verifies", password_hasher.verify(outdated, PASSWORD))
+check("Outdated hash needs a rehash", password_hasher.needs_rehash(outdated))
+check("Wrong password rejected against it", not password_hasher.verify(outdated, "wrong-password"))
+
+# Test 5: Unknown email
+print("\n[Test 5] Verifying against a missing account...")
+check("No stored password is rejected", not password_hasher.verify(None, PASSWORD))
+check("Corrupt hash is rejected", not password_hasher.verify("scrypt$16384$8$1$not-a-hash", PASSWORD))
+
+# Test 6: Bounded pool
+print("\n[Test 6] Verifying in the password pool...")
+
+async def verify_in_pool():
+    return await asyncio.gather(
+        password_hasher.run(password_hasher.verify, stored, PASSWORD),
+        password_hasher.run(password_hasher.verify, stored, "wrong-password"),
+    )
+
+check("Pool returns the same results", asyncio.run(verify_in_pool()) == [True, False])
+
+print("\n" + "=" * 60)
+print("  ALL TESTS PASSED!")
+print("=" * 60)
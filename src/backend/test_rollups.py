@@ -0,0 +1,91 @@
+"""
+Quick test of the per-user rollups: incremental updates must match a full rebuild
+"""
+import uuid
+from dotenv import load_dotenv
+from schemas.user import DailyEntry
+from services.sync_mongodb_user_service import SyncMongoDBUserService
+
+load_dotenv()
+
+def check(label: str, ok: bool):
+    if ok:
+        print(f"  [OK] {label}")
+    else:
+        print(f"  [ERROR] {label}")
+        exit(1)
+
+def snapshot(service, user_id):
+    """Rollup counters by (period, bucket), without agent scores"""
+    return {
+        (document["period"], document["bucket"]): {key: document.get(key) for key in (
+            "entries", "meal_count", "exercise_count", "exercise_minutes", "first_date", "last_date", "metrics"
+        )}
+        for document in service.rollups.collection.find({"user_id": user_id})
+    }
+
+def log_entry(service, user_id, entry, previous=None):
+    """Write an entry document and fold it into the rollups, as add_daily_entry does"""
+    document = service._entry_document(user_id, entry)
+    if previous:
+        service.entries_collection.replace_one({"_id": previous["_id"]}, document)
+        service.rollups.record_entry(user_id, DailyEntry.model_validate(previous), previous["exercise_minutes"], sign=-1)
+    else:
+        service.entries_collection.insert_one(document)
+    service.rollups.record_entry(user_id, entry, document["exercise_minutes"])
+
+print("=" * 60)
+print("  TESTING ROLLUPS")
+print("=" * 60)
+
+service = SyncMongoDBUserService()
+user_id = f"rollup-test-{uuid.uuid4()}"
+
+try:
+    # Test 1: Incremental updates
+    print("\n[Test 1] Logging three days across two weeks...")
+    log_entry(service, user_id, DailyEntry(date="2026-01-05", meals=["eggs", "toast"], exercises=["30 min run"],
+                                           lifestyle={"sleep_hours": 7, "stress_level": 4}))
+    log_entry(service, user_id, DailyEntry(date="2026-01-06", meals=["salad"], exercises=[],
+                                           lifestyle={"sleep_hours": 8, "mood": "good"}))
+    log_entry(service, user_id, DailyEntry(date="2026-01-12", meals=["rice"], exercises=["45 min swim"],
+                                           lifestyle={"sleep_hours": 6}))
+    buckets = snapshot(service, user_id)
+    week = buckets[("week", "2026-W02")]
+    check("Week 2 holds two entries and three meals", week["entries"] == 2 and week["meal_count"] == 3)
+    check("Numeric lifestyle values are summed, text ignored",
+          week["metrics"] == {"sleep_hours": {"sum": 15, "count": 2}, "stress_level": {"sum": 4, "count": 1}})
+    check("Month spans all three days", buckets[("month", "2026-01")]["entries"] == 3
+          and buckets[("month", "2026-01")]["first_date"] == "2026-01-05"
+          and buckets[("month", "2026-01")]["last_date"] == "2026-01-12")
+
+    # Test 2: Replacing a day's entry
+    print("\n[Test 2] Replacing the second day's entry...")
+    previous = service.entries_collection.find_one({"user_id": user_id, "date": "2026-01-06"})
+    log_entry(service, user_id, DailyEntry(date="2026-01-06", meals=["salad", "soup"], exercises=["20 min walk"],
+                                           lifestyle={"sleep_hours": 9}), previous)
+    week = snapshot(service, user_id)[("week", "2026-W02")]
+    check("Old entry taken back out", week["entries"] == 2 and week["meal_count"] == 4 and week["exercise_count"] == 2)
+    check("Old metrics replaced", week["metrics"]["sleep_hours"] == {"sum": 16, "count": 2})
+
+    # Test 3: Rebuild parity
+    print("\n[Test 3] Rebuilding from daily_entries...")
+    incremental = snapshot(service, user_id)
+    service.rollups.collection.delete_many({"user_id": user_id})
+    written = service.rollups.rebuild(service.entries_collection, user_id)
+    rebuilt = snapshot(service, user_id)
+    check(f"Rebuild wrote {written} buckets", written == len(incremental))
+    # Metrics taken to zero by a replacement stay behind as empty sums in the incremental rollup
+    for values in incremental.values():
+        values["metrics"] = {key: metric for key, metric in (values["metrics"] or {}).items() if metric["count"]}
+    for key in sorted(incremental):
+        if incremental[key] != rebuilt.get(key):
+            print(f"    {key}: incremental={incremental[key]} rebuilt={rebuilt.get(key)}")
+    check("Rebuilt buckets match the incremental ones", rebuilt == incremental)
+finally:
+    service.entries_collection.delete_many({"user_id": user_id})
+    service.rollups.collection.delete_many({"user_id": user_id})
+
+print("\n" + "=" * 60)
+print("  ALL TESTS PASSED!")
+print("=" * 60)
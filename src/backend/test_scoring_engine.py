@@ -0,0 +1,66 @@
+"""
+Quick test of the local scoring engine's quantity, unit and exercise parsing
+"""
+from services.scoring_engine import scoring_engine
+
+def check(label: str, value: float, low: float, high: float):
+    if low <= value <= high:
+        print(f"  [OK] {label}: {value}")
+    else:
+        print(f"  [ERROR] {label}: {value}, expected {low}-{high}")
+        exit(1)
+
+def meal_calories(meal: str) -> int:
+    return scoring_engine.estimate_meals([meal])["calories"]
+
+def exercise(text: str):
+    result = scoring_engine.estimate_exercises([text])
+    return result["calories_burned"], result["items"][0]["minutes"]
+
+print("=" * 60)
+print("  TESTING SCORING ENGINE")
+print("=" * 60)
+
+# Test 1: Portion counts
+print("\n[Test 1] Counting portions...")
+check("2 eggs", meal_calories("2 eggs"), 150, 160)
+check("a banana", meal_calories("a banana"), 100, 110)
+check("two apples", meal_calories("two apples"), 185, 195)
+check("2 slices of pizza", meal_calories("2 slices of pizza"), 560, 580)
+check("3x toast", meal_calories("3x toast"), 230, 250)
+
+# Test 2: Weights and volumes
+print("\n[Test 2] Scaling weights and volumes by portion size...")
+check("250 ml milk", meal_calories("250 ml milk"), 140, 170)
+check("200 g chicken breast", meal_calories("200 g chicken breast"), 300, 360)
+check("200g chicken", meal_calories("200g chicken"), 300, 360)
+check("1 l water", meal_calories("1 l water"), 0, 0)
+check("a glass of milk", meal_calories("a glass of milk"), 140, 170)
+check("100 g unknown food", meal_calories("100 g mystery stew"), 150, 180)
+
+# Test 3: Fractions
+print("\n[Test 3] Reading fractions...")
+check("1/2 cup rice", meal_calories("1/2 cup rice"), 100, 160)
+check("1 1/2 cups of rice", meal_calories("1 1/2 cups of rice"), 300, 480)
+check("half avocado (unicode)", meal_calories("½ avocado"), 115, 125)
+check("1/2 banana", meal_calories("1/2 banana"), 50, 55)
+
+# Test 4: Sets and reps
+print("\n[Test 4] Counting sets and reps...")
+calories, minutes = exercise("3 sets of 10 squats")
+check("3 sets of 10 squats (minutes)", minutes, 1.4, 1.6)
+check("3 sets of 10 squats (kcal)", calories, 5, 15)
+check("3x10 squats (minutes)", exercise("3x10 squats")[1], 1.4, 1.6)
+check("3 x 12 push-ups (minutes)", exercise("3 x 12 push-ups")[1], 1.7, 1.9)
+check("4 sets of squats (minutes)", exercise("4 sets of squats")[1], 1.9, 2.1)
+check("20 push-ups (minutes)", exercise("20 push-ups")[1], 0.9, 1.1)
+
+# Test 5: Durations and distances
+print("\n[Test 5] Reading durations and distances...")
+check("30 min run (minutes)", exercise("30 min run")[1], 30, 30)
+check("1 hour yoga (minutes)", exercise("1 hour yoga")[1], 60, 60)
+check("5 km run (minutes)", exercise("5 km run")[1], 30, 30)
+
+print("\n" + "=" * 60)
+print("  ALL TESTS PASSED!")
+print("=" * 60)
@@ -0,0 +1,121 @@
+"""
+Quick test of session token signing and the per-user check in main.py
+"""
+import base64
+import json
+from types import SimpleNamespace
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from schemas.user import User, UserCredentials, UserProfile, UserGoal, UserProgress, Gender, ActivityLevel, GoalType
+from services.session_tokens import SessionTokens, InvalidSessionToken
+
+load_dotenv()
+
+def make_user(user_id: str) -> User:
+    return User(
+        id=user_id,
+        credentials=UserCredentials(email=f"{user_id}@example.com", password="test123"),
+        profile=UserProfile(
+            name="Test User",
+            age=25,
+            gender=Gender.MALE,
+            weight=70.0,
+            height=175.0,
+            activity_level=ActivityLevel.MODERATELY_ACTIVE,
+            primary_health_goal="Stay healthy and fit",
+            intellectual_interests=["Technology", "Science"],
+            learning_style="visual",
+            time_availability="1-2 hours daily"
+        ),
+        goal=UserGoal(goal_type=GoalType.GENERAL_HEALTH, target_calories_per_day=2200, goal_description="Stay healthy"),
+        progress=UserProgress()
+    )
+
+def expect_invalid(tokens: SessionTokens, token: str, reason: str):
+    try:
+        tokens.verify(token)
+    except InvalidSessionToken as e:
+        if str(e) != reason:
+            print(f"  [ERROR] Rejected as '{e}', expected '{reason}'")
+            exit(1)
+        print(f"  [OK] Rejected: {e}")
+        return
+    print("  [ERROR] Token was accepted")
+    exit(1)
+
+def encode(part: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(part, separators=(",", ":")).encode()).rstrip(b"=").decode("ascii")
+
+print("=" * 60)
+print("  TESTING SESSION TOKENS")
+print("=" * 60)
+
+tokens = SessionTokens(secret="test-secret", ttl_seconds=3600, required=False)
+user = make_user("user-a")
+token = tokens.issue(user)
+header, payload, signature = token.split(".")
+
+# Test 1: Round trip
+print("\n[Test 1] Issuing and verifying a token...")
+claims = tokens.verify(token)
+if claims["sub"] == user.id and set(claims) == {"sub", "iat", "exp"}:
+    print(f"  [OK] Claims for {claims['sub']}")
+else:
+    print(f"  [ERROR] Unexpected claims: {claims}")
+    exit(1)
+if tokens.authenticate(f"Bearer {token}")["sub"] == user.id and tokens.authenticate(None) is None:
+    print("  [OK] Authorization header parsed")
+else:
+    print("  [ERROR] Authorization header not parsed")
+    exit(1)
+
+# Test 2: Tampered payload
+print("\n[Test 2] Changing the user id in the payload...")
+forged = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+forged["sub"] = "user-b"
+expect_invalid(tokens, f"{header}.{encode(forged)}.{signature}", "bad signature")
+
+# Test 3: Swapped header
+print("\n[Test 3] Sending an unsigned alg=none token...")
+expect_invalid(tokens, f"{encode({'alg': 'none', 'typ': 'JWT'})}.{payload}.", "bad signature")
+expect_invalid(tokens, f"{encode({'alg': 'none', 'typ': 'JWT'})}.{payload}.{signature}", "bad signature")
+
+# Test 4: Other deployment's key
+print("\n[Test 4] Verifying with a different secret...")
+expect_invalid(SessionTokens(secret="other-secret", required=False), token, "bad signature")
+
+# Test 5: Expiry
+print("\n[Test 5] Verifying an expired token...")
+expect_invalid(tokens, SessionTokens(secret="test-secret", ttl_seconds=-1, required=False).issue(user), "expired")
+
+# Test 6: Another user's token through main._session_for
+print("\n[Test 6] Using user-a's token for user-b...")
+from main import _session_for, SESSION_REQUIRED
+
+def request_with(session, session_error=None):
+    return SimpleNamespace(state=SimpleNamespace(session=session, session_error=session_error))
+
+if _session_for(request_with(claims), user.id)["sub"] == user.id:
+    print("  [OK] Own token accepted")
+try:
+    _session_for(request_with(claims), "user-b")
+    print("  [ERROR] Another user's token was accepted")
+    exit(1)
+except HTTPException as e:
+    if e.status_code != 403:
+        print(f"  [ERROR] Expected 403, got {e.status_code}")
+        exit(1)
+    print(f"  [OK] {e.status_code}: {e.detail}")
+
+# Test 7: Expired token while tokens are optional
+if not SESSION_REQUIRED:
+    print("\n[Test 7] Sending an expired token with SESSION_REQUIRED off...")
+    if _session_for(request_with(None, "expired"), user.id) is None:
+        print("  [OK] Treated as no token, the endpoint checks the user itself")
+    else:
+        print("  [ERROR] Expired token was not ignored")
+        exit(1)
+
+print("\n" + "=" * 60)
+print("  ALL TESTS PASSED!")
+print("=" * 60)
@@ -0,0 +1,102 @@
+"""
+Quick test of field-level user updates and the optimistic version check
+"""
+import uuid
+from dotenv import load_dotenv
+from schemas.user import User, UserCredentials, UserProfile, UserGoal, UserProgress, DailyEntry, Gender, ActivityLevel, GoalType
+from services.user_change_tracker import user_change_tracker, version_filter, ConcurrentUpdateError
+
+load_dotenv()
+
+def check(label: str, ok: bool):
+    if ok:
+        print(f"  [OK] {label}")
+    else:
+        print(f"  [ERROR] {label}")
+        exit(1)
+
+def make_user(user_id: str) -> User:
+    return User(
+        id=user_id,
+        credentials=UserCredentials(email=f"{user_id}@example.com", password="test123"),
+        profile=UserProfile(
+            name="Test User",
+            age=25,
+            gender=Gender.MALE,
+            weight=70.0,
+            height=175.0,
+            activity_level=ActivityLevel.MODERATELY_ACTIVE,
+            primary_health_goal="Stay healthy and fit",
+            intellectual_interests=["Technology", "Science"],
+            learning_style="visual",
+            time_availability="1-2 hours daily"
+        ),
+        goal=UserGoal(goal_type=GoalType.GENERAL_HEALTH, target_calories_per_day=2200, goal_description="Stay healthy"),
+        progress=UserProgress()
+    )
+
+print("=" * 60)
+print("  TESTING USER CHANGE TRACKER")
+print("=" * 60)
+
+# Test 1: Nothing changed
+print("\n[Test 1] Building an update for an unchanged user...")
+user = user_change_tracker.track(make_user("tracker-user"))
+check("No update document", user_change_tracker.build_update(user) == {})
+
+# Test 2: $set of changed leaves
+print("\n[Test 2] Changing the nickname and a goal target...")
+user.profile.nickname = "Test Hero"
+user.goal.target_calories_per_day = 2000
+update = user_change_tracker.build_update(user)
+check("Only the changed paths are set",
+      set(update["$set"]) == {"profile.nickname", "goal.target_calories_per_day", "updated_at"})
+check("New values are sent", update["$set"]["profile.nickname"] == "Test Hero" and update["$set"]["goal.target_calories_per_day"] == 2000)
+check("Version is incremented", update["$inc"] == {"version": 1})
+check("Nothing is pushed", "$push" not in update)
+user_change_tracker.track(user)
+user.profile.intellectual_interests.append("History")
+check("Lists are replaced whole", user_change_tracker.build_update(user)["$set"]["profile.intellectual_interests"]
+      == ["Technology", "Science", "History"])
+
+# Test 3: $push of new entries
+print("\n[Test 3] Appending a daily entry...")
+user = user_change_tracker.track(make_user("tracker-user"))
+user.progress.entries.append(DailyEntry(date="2026-01-01", meals=["eggs"], exercises=["30 min run"], lifestyle={}))
+user.progress.total_entries += 1
+update = user_change_tracker.build_update(user)
+check("Entry pushed with $each", [entry["meals"] for entry in update["$push"]["progress.entries"]["$each"]] == [["eggs"]])
+check("Counter set alongside", update["$set"]["progress.total_entries"] == 1)
+check("Entries are not in $set", "progress.entries" not in update["$set"])
+
+# Test 4: Version filter
+print("\n[Test 4] Matching document versions...")
+check("Version 0 also matches documents without one", version_filter(0) == {"$in": [0, None]})
+check("Later versions match exactly", version_filter(3) == 3)
+
+# Test 5: Concurrent writers against MongoDB
+print("\n[Test 5] Saving two copies of the same user...")
+from services.sync_mongodb_user_service import SyncMongoDBUserService
+
+service = SyncMongoDBUserService()
+user_id = f"tracker-test-{uuid.uuid4()}"
+service.save_user(make_user(user_id))
+try:
+    first = service.get_user_by_id(user_id)
+    second = service.get_user_by_id(user_id)
+    first.profile.nickname = "First Writer"
+    service.save_user(first)
+    check("First save bumps the version", first.version == 1)
+    second.profile.nickname = "Second Writer"
+    try:
+        service.save_user(second)
+        check("Stale copy is rejected", False)
+    except ConcurrentUpdateError as e:
+        check(f"Stale copy is rejected: {e}", True)
+    check("First writer's change is kept", service.get_user_by_id(user_id).profile.nickname == "First Writer")
+finally:
+    service.users_collection.delete_one({"user_id": user_id})
+
+print("\n" + "=" * 60)
+print("  ALL TESTS PASSED!")
+print("=" * 60)
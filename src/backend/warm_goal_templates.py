@@ -0,0 +1,115 @@
+"""
+Warm the goal template cache
+Generates an LLM goal for a representative profile of every template bucket
+(age band x BMI band x gender x activity level x goal x diet) and stores it in
+goal_templates, so signups are served from a template from the first request.
+Buckets that already have a template are skipped unless --refresh is given.
+
+Usage:
+    python warm_goal_templates.py [--limit 100] [--refresh]
+"""
+import argparse
+import itertools
+import time
+from typing import Iterator
+from dotenv import load_dotenv
+from schemas.user import UserProfile, Gender, ActivityLevel
+from services.goal_template_service import template_key, profile_features
+from services.llm_scheduler import llm_scheduler, BACKGROUND
+from services.sync_mongodb_user_service import SyncMongoDBUserService
+
+load_dotenv()
+
+# One value inside each band of goal_template_service
+REPRESENTATIVE_AGES = (17, 20, 23, 28, 35)
+REPRESENTATIVE_BMIS = (17.5, 22.0, 27.5, 33.0)
+REPRESENTATIVE_HEIGHT_CM = 170.0
+REPRESENTATIVE_GOALS = (
+    "Lose weight",
+    "Gain weight",
+    "Build muscle",
+    "Improve endurance",
+    "Improve overall health",
+    "Reduce stress",
+    "Sleep better",
+)
+REPRESENTATIVE_DIETS = ([], ["vegetarian"], ["vegan"])
+
+def representative_profiles() -> Iterator[UserProfile]:
+    """One profile per template bucket"""
+    for age, bmi, gender, activity, goal, diet in itertools.product(
+        REPRESENTATIVE_AGES, REPRESENTATIVE_BMIS, Gender, ActivityLevel, REPRESENTATIVE_GOALS, REPRESENTATIVE_DIETS
+    ):
+        yield UserProfile(
+            name="Student",
+            age=age,
+            gender=gender,
+            weight=round(bmi * (REPRESENTATIVE_HEIGHT_CM / 100) ** 2, 1),
+            height=REPRESENTATIVE_HEIGHT_CM,
+            activity_level=activity,
+            medical_conditions=[],
+            dietary_restrictions=list(diet),
+            primary_health_goal=goal,
+            intellectual_interests=[],
+            learning_style="mixed",
+            time_availability="moderate"
+        )
+
+def warm_templates(limit: int = 0, refresh: bool = False):
+    """Generate and store templates for buckets that have none"""
+    print("=" * 60)
+    print("  WARMING GOAL TEMPLATES")
+    print("=" * 60)
+
+    try:
+        user_service = SyncMongoDBUserService()
+        print("[SUCCESS] Connected to MongoDB")
+    except Exception as e:
+        print(f"[ERROR] Failed to connect to MongoDB: {e}")
+        print("Make sure MONGODB_URL is set in your .env file")
+        return
+
+    store = user_service.goal_templates
+    generator = user_service.goal_generator
+    existing = set() if refresh else set(store.collection.distinct("_id"))
+    print(f"[INFO] {len(existing)} templates already stored")
+
+    generated = skipped = mismatched = failed = 0
+    started = time.time()
+    # Yield to interactive traffic when run against a live deployment's quota
+    with llm_scheduler.priority(BACKGROUND):
+        for profile in representative_profiles():
+            if limit and generated + mismatched + failed >= limit:
+                break
+            key = template_key(profile_features(profile))
+            if key in existing:
+                skipped += 1
+                continue
+            goal = generator._ask_model(profile)
+            if goal is None:
+                failed += 1
+                print(f"[ERROR] No goal generated for {key}")
+                continue
+            if not store.save(profile, goal, source="warm"):
+                mismatched += 1
+                print(f"[WARNING] Model answered {goal.goal_type.value} for {key}, not stored")
+                continue
+            existing.add(key)
+            generated += 1
+            if generated % 50 == 0:
+                print(f"[PROGRESS] {generated} templates generated ({generated / (time.time() - started):.1f}/sec)")
+
+    print("\n" + "=" * 60)
+    print("  WARMING COMPLETE")
+    print("=" * 60)
+    print(f"Generated: {generated} templates")
+    print(f"Skipped: {skipped} buckets (already warm)")
+    print(f"Mismatched: {mismatched} buckets (goal type differs from the bucket's)")
+    print(f"Errors: {failed} buckets")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute goal templates for every profile bucket")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many LLM calls (0 for no limit)")
+    parser.add_argument("--refresh", action="store_true", help="Regenerate buckets that already have a template")
+    args = parser.parse_args()
+    warm_templates(args.limit, args.refresh)
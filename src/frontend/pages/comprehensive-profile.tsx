@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useRouter } from 'next/router';
 import Navbar from '../components/Navbar';
+import { clearExpiredSession } from '../utils/api';
 
 const ComprehensiveProfile: React.FC = () => {
   const router = useRouter();
@@ -193,6 +194,7 @@ const ComprehensiveProfile: React.FC = () => {
         method: 'PUT',
         headers: {
           'Content-Type': 'application/json',
+          ...(user.session_token ? { Authorization: `Bearer ${user.session_token}` } : {}),
         },
         body: JSON.stringify({
           user_id: user.user_id,
@@ -213,6 +215,12 @@ const ComprehensiveProfile: React.FC = () => {
         }),
       });
 
+      if (response.status === 401) {
+        clearExpiredSession();
+        router.push('/login');
+        return;
+      }
+
       if (response.ok) {
         const result = await response.json();
         
@@ -236,7 +244,8 @@ const ComprehensiveProfile: React.FC = () => {
             learning_style: formData.learning_style,
             time_availability: formData.time_availability
           },
-          goal: result.goal
+          goal: result.goal,
+          session_token: result.session_token ?? user.session_token
         };
         
         localStorage.setItem('user', JSON.stringify(updatedUser));
@@ -3,7 +3,7 @@ import { useRouter } from 'next/router';
 import Navbar from '../components/Navbar';
 import SummaryCard from '../components/SummaryCard';
 import AgentOutput from '../components/AgentOutput';
-import { fetchSummaryFromUserData, DailySummary } from '../utils/api';
+import { fetchSummaryFromUserData, clearExpiredSession, DailySummary } from '../utils/api';
 
 const Dashboard: React.FC = () => {
   const router = useRouter();
@@ -56,6 +56,7 @@ const Dashboard: React.FC = () => {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
+            ...(userData.session_token ? { Authorization: `Bearer ${userData.session_token}` } : {}),
           },
           body: JSON.stringify({
             user_id: userData.user_id,
@@ -65,6 +66,12 @@ const Dashboard: React.FC = () => {
           }),
         });
         
+        if (response.status === 401) {
+          clearExpiredSession();
+          router.push('/login');
+          return;
+        }
+        
         if (response.ok) {
           const data = await response.json();
           console.log('API Response:', data); // Debug log
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useRouter } from 'next/router';
 import Navbar from '../components/Navbar';
+import { clearExpiredSession } from '../utils/api';
 
 interface User {
   user_id: string;
@@ -8,6 +9,7 @@ interface User {
   nickname?: string;
   avatar?: string;
   goal: any;
+  session_token?: string;
 }
 
 const DataEntry: React.FC = () => {
@@ -253,6 +255,7 @@ const DataEntry: React.FC = () => {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(user?.session_token ? { Authorization: `Bearer ${user?.session_token}` } : {}),
         },
         body: JSON.stringify({
           user_id: user?.user_id,
@@ -262,6 +265,12 @@ const DataEntry: React.FC = () => {
         }),
       });
 
+      if (response.status === 401) {
+        clearExpiredSession();
+        router.push('/login');
+        return;
+      }
+
       if (response.ok) {
         const data = await response.json();
         console.log('AI Analysis Complete:', data);
@@ -30,6 +30,11 @@ export interface DailySummary {
 // Railway Backend URL
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "https://mind-scroll-production.up.railway.app";
 
+// The backend answers 401 once a session token has expired or been rejected; log in again for a new one
+export function clearExpiredSession(): void {
+  localStorage.removeItem('user');
+}
+
 export async function fetchSummary(): Promise<DailySummary> {
   try {
     const res = await fetch(`${API_BASE_URL}/generate-summary`);
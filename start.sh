@@ -5,18 +5,18 @@ echo "🚀 Starting Mindscroll deployment on Railway..."
 
 # Set environment variables
 export PORT=${PORT:-8000}
-export PYTHONPATH="${PYTHONPATH}:$(pwd)/backend"
+export PYTHONPATH="${PYTHONPATH}:$(pwd)/src/backend"
 
 # Navigate to backend directory
-cd backend
+cd src/backend
 
 # Install Python dependencies
 echo "📦 Installing Python dependencies..."
 pip install -r requirements.txt
 
-# Start the FastAPI backend
+# Start the FastAPI backend (multi-worker; see gunicorn.conf.py)
 echo "🔧 Starting FastAPI backend on port $PORT..."
-uvicorn main:app --host 0.0.0.0 --port $PORT --reload &
+gunicorn -c gunicorn.conf.py main:app &
 
 # Wait for backend to start
 sleep 5